@@ -8,6 +8,13 @@ from dotenv import load_dotenv
 from db.database import Base
 from models.user import User
 from models.media import Media
+from models.blob import Blob
+from models.upload_session import UploadSession
+from models.media_tag import MediaTag, WorkspaceTagCount
+from models.workspace_usage import WorkspaceUsage
+from models.pending_deletion import PendingDeletion, PendingWorkspacePurge
+from models.integrity import BlobIntegrityFailure, ScrubState
+from models.refresh_token import RefreshToken
 # Import all models so Alembic can see referenced tables (ForeignKey resolution)
 from models.workspace import Workspace, WorkspaceMember
 from models.document import Document
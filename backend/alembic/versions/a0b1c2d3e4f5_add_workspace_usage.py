@@ -0,0 +1,42 @@
+"""add workspace_usage counters, backfilled from media
+
+Revision ID: a0b1c2d3e4f5
+Revises: f9a0b1c2d3e4
+Create Date: 2026-01-30 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a0b1c2d3e4f5'
+down_revision = 'f9a0b1c2d3e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'workspace_usage',
+        sa.Column('workspace_id', sa.Integer(), nullable=False),
+        sa.Column('file_count', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('bytes_used', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('quota_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('quota_files', sa.BigInteger(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('workspace_id'),
+    )
+    op.execute(
+        """
+        INSERT INTO workspace_usage (workspace_id, file_count, bytes_used)
+        SELECT w.id, count(m.id), coalesce(sum(m.size_bytes), 0)
+        FROM workspaces w
+        LEFT JOIN media m ON m.workspace_id = w.id
+        GROUP BY w.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workspace_usage')
@@ -0,0 +1,56 @@
+"""store blob locations as backend + key instead of absolute paths
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-01-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a3b4c5d6e7f8'
+down_revision = 'f2a3b4c5d6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing blobs stay where they are (flat in FILES_DIR) and are read through
+    # the "legacy" backend until the storage migrator moves them.
+    op.add_column('blobs', sa.Column('backend', sa.String(length=20), nullable=False, server_default='legacy'))
+    op.add_column('blobs', sa.Column('storage_key', sa.String(length=500), nullable=True))
+    op.execute("UPDATE blobs SET storage_key = stored_filename")
+    op.alter_column('blobs', 'storage_key', existing_type=sa.String(length=500), nullable=False)
+    op.alter_column('blobs', 'backend', existing_type=sa.String(length=20), server_default=None)
+    op.create_unique_constraint('uq_blobs_backend_key', 'blobs', ['backend', 'storage_key'])
+
+    op.drop_constraint('uq_blobs_stored_filename', 'blobs', type_='unique')
+    op.drop_constraint('uq_blobs_stored_path', 'blobs', type_='unique')
+    op.drop_column('blobs', 'stored_path')
+    op.drop_column('blobs', 'stored_filename')
+
+    op.alter_column('media', 'stored_filename', existing_type=sa.String(length=255), nullable=True)
+    op.alter_column('media', 'stored_path', existing_type=sa.String(length=500), nullable=True)
+
+
+def downgrade() -> None:
+    # Only valid while every blob is still on the legacy backend.
+    op.add_column('blobs', sa.Column('stored_filename', sa.String(length=255), nullable=True))
+    op.add_column('blobs', sa.Column('stored_path', sa.String(length=500), nullable=True))
+    from core.config import FILES_DIR
+
+    op.get_bind().execute(
+        sa.text("UPDATE blobs SET stored_filename = storage_key, stored_path = :root || '/' || storage_key"),
+        {"root": FILES_DIR},
+    )
+    op.alter_column('blobs', 'stored_filename', existing_type=sa.String(length=255), nullable=False)
+    op.alter_column('blobs', 'stored_path', existing_type=sa.String(length=500), nullable=False)
+    op.create_unique_constraint('uq_blobs_stored_filename', 'blobs', ['stored_filename'])
+    op.create_unique_constraint('uq_blobs_stored_path', 'blobs', ['stored_path'])
+    op.drop_constraint('uq_blobs_backend_key', 'blobs', type_='unique')
+    op.drop_column('blobs', 'storage_key')
+    op.drop_column('blobs', 'backend')
+
+    op.alter_column('media', 'stored_path', existing_type=sa.String(length=500), nullable=False)
+    op.alter_column('media', 'stored_filename', existing_type=sa.String(length=255), nullable=False)
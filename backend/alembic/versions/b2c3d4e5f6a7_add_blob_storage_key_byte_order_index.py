@@ -0,0 +1,26 @@
+"""add byte-ordered index on blob storage keys for the storage reconciler
+
+Revision ID: b2c3d4e5f6a7
+Revises: a0b1c2d3e4f5
+Create Date: 2026-02-02 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b2c3d4e5f6a7'
+down_revision = 'a0b1c2d3e4f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Backends list keys in byte order; the reconciler walks the table in the
+    # same order ("C" collation) to merge the two streams batch by batch.
+    op.execute(
+        'CREATE INDEX ix_blobs_backend_key_bytes ON blobs (backend, storage_key COLLATE "C")'
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_blobs_backend_key_bytes")
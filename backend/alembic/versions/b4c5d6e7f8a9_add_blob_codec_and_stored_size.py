@@ -0,0 +1,27 @@
+"""add codec and stored_size to blobs
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-01-21 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b4c5d6e7f8a9'
+down_revision = 'a3b4c5d6e7f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing blobs were stored uncompressed
+    op.add_column('blobs', sa.Column('codec', sa.String(length=20), nullable=False, server_default='identity'))
+    op.alter_column('blobs', 'codec', existing_type=sa.String(length=20), server_default=None)
+    op.add_column('blobs', sa.Column('stored_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('blobs', 'stored_size')
+    op.drop_column('blobs', 'codec')
@@ -0,0 +1,29 @@
+"""add completion state to upload_sessions
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-02-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b8c9d0e1f2a3'
+down_revision = 'a7b8c9d0e1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('upload_sessions', sa.Column('completing_until', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('upload_sessions', sa.Column('media_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'upload_sessions_media_id_fkey', 'upload_sessions', 'media', ['media_id'], ['id'], ondelete='CASCADE'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('upload_sessions_media_id_fkey', 'upload_sessions', type_='foreignkey')
+    op.drop_column('upload_sessions', 'media_id')
+    op.drop_column('upload_sessions', 'completing_until')
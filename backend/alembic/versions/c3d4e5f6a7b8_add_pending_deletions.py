@@ -0,0 +1,52 @@
+"""add pending_deletions queue for deferred blob removal
+
+Revision ID: c3d4e5f6a7b8
+Revises: b2c3d4e5f6a7
+Create Date: 2026-02-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3d4e5f6a7b8'
+down_revision = 'b2c3d4e5f6a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pending_deletions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('backend', sa.String(length=20), nullable=False),
+        sa.Column('storage_key', sa.String(length=500), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_pending_deletions_next_attempt_at', 'pending_deletions', ['next_attempt_at'], unique=False)
+
+    # Files made redundant by the blob backfill (f2a3b4c5d6e7) still sit in
+    # FILES_DIR; the deletion worker removes them once this has committed.
+    op.execute(
+        "INSERT INTO pending_deletions (backend, storage_key) "
+        "SELECT 'legacy', stored_filename FROM duplicate_media_files"
+    )
+    op.drop_table('duplicate_media_files')
+
+
+def downgrade() -> None:
+    op.create_table(
+        'duplicate_media_files',
+        sa.Column('stored_filename', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('stored_filename'),
+    )
+    op.execute(
+        "INSERT INTO duplicate_media_files (stored_filename) "
+        "SELECT DISTINCT storage_key FROM pending_deletions WHERE backend = 'legacy'"
+    )
+    op.drop_index('ix_pending_deletions_next_attempt_at', table_name='pending_deletions')
+    op.drop_table('pending_deletions')
@@ -0,0 +1,27 @@
+"""add key_id to blobs for encryption key rotation
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-02-04 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd4e5f6a7b8c9'
+down_revision = 'c3d4e5f6a7b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing blobs stay NULL (key unknown); readers try every configured key
+    # and key rotation re-encrypts them onto the current one.
+    op.add_column('blobs', sa.Column('key_id', sa.String(length=16), nullable=True))
+    op.create_index('ix_blobs_key_id', 'blobs', ['key_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_blobs_key_id', table_name='blobs')
+    op.drop_column('blobs', 'key_id')
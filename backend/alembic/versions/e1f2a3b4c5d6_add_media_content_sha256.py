@@ -0,0 +1,26 @@
+"""add media content_sha256 and widen size_bytes
+
+Revision ID: e1f2a3b4c5d6
+Revises: ab223c24c71f
+Create Date: 2026-01-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e1f2a3b4c5d6'
+down_revision = 'ab223c24c71f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('media', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    # Streaming uploads lift the practical size limit past what INTEGER holds.
+    op.alter_column('media', 'size_bytes', type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('media', 'size_bytes', type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=False)
+    op.drop_column('media', 'content_sha256')
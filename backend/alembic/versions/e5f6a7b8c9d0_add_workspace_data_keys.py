@@ -0,0 +1,44 @@
+"""add per-workspace data keys and workspace-scoped blobs
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-02-05 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e5f6a7b8c9d0'
+down_revision = 'd4e5f6a7b8c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keys are created on a workspace's first upload; existing blobs keep
+    # workspace_id NULL (sealed with the master key, shared across workspaces).
+    op.add_column('workspaces', sa.Column('data_key', sa.Text(), nullable=True))
+    op.add_column('workspaces', sa.Column('data_key_master_id', sa.String(length=16), nullable=True))
+
+    op.add_column('blobs', sa.Column('workspace_id', sa.Integer(), nullable=True))
+    # Deduplication is now per workspace. The old blobs all have a NULL
+    # workspace and so stay distinct under the new constraint.
+    op.drop_index('ix_blobs_sha256', table_name='blobs')
+    op.create_unique_constraint('uq_blobs_workspace_sha256', 'blobs', ['workspace_id', 'sha256'])
+
+    op.create_table(
+        'pending_workspace_purges',
+        sa.Column('workspace_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('workspace_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('pending_workspace_purges')
+    op.drop_constraint('uq_blobs_workspace_sha256', 'blobs', type_='unique')
+    op.create_index('ix_blobs_sha256', 'blobs', ['sha256'], unique=True)
+    op.drop_column('blobs', 'workspace_id')
+    op.drop_column('workspaces', 'data_key_master_id')
+    op.drop_column('workspaces', 'data_key')
@@ -0,0 +1,46 @@
+"""add trigram and full-text search indexes on media
+
+Revision ID: e8f9a0b1c2d3
+Revises: d7e8f9a0b1c2
+Create Date: 2026-01-28 11:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e8f9a0b1c2d3'
+down_revision = 'd7e8f9a0b1c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Trigram index for fuzzy filename matches; it also serves the
+    # ILIKE '%x%' filename filter of list_media.
+    op.execute(
+        "CREATE INDEX ix_media_filename_trgm ON media "
+        "USING gin (original_filename gin_trgm_ops)"
+    )
+
+    # Weighted document for ranked prefix search: filename (A), tags (B),
+    # description (C). Punctuation is folded to spaces first so that
+    # "q3_report-final.pdf" yields the words q3, report, final and pdf.
+    op.execute(
+        """
+        ALTER TABLE media ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', regexp_replace(coalesce(original_filename, ''), '[^[:alnum:]]+', ' ', 'g')), 'A')
+            || setweight(to_tsvector('simple', regexp_replace(coalesce(tags, ''), '[^[:alnum:]]+', ' ', 'g')), 'B')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+        ) STORED
+        """
+    )
+    op.execute("CREATE INDEX ix_media_search_vector ON media USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_media_search_vector")
+    op.execute("ALTER TABLE media DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP INDEX IF EXISTS ix_media_filename_trgm")
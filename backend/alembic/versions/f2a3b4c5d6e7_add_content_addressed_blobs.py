@@ -0,0 +1,186 @@
+"""add content-addressed blobs and collapse duplicate media files
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-01-14 10:00:00.000000
+
+"""
+import base64
+import hashlib
+import os
+import struct
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# revision identifiers, used by Alembic.
+revision = 'f2a3b4c5d6e7'
+down_revision = 'e1f2a3b4c5d6'
+branch_labels = None
+depends_on = None
+
+# The stored file formats, copied from core.blob_crypto so later
+# changes to the app code cannot change what this migration reads: a single
+# Fernet token (legacy), or "ACCB" | version (1) | segment_size (4)
+# [| key_id (4), version 2] | salt (16) | nonce_prefix (7) followed by
+# AES-GCM segments.
+_MAGIC = b"ACCB"
+_LEAD_SIZE = len(_MAGIC) + 1 + 4
+_HEADER_SIZES = {1: _LEAD_SIZE + 16 + 7, 2: _LEAD_SIZE + 4 + 16 + 7}
+_TAG_SIZE = 16
+
+
+def _segment_key(master_key: bytes, salt: bytes) -> AESGCM:
+    return AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b"acc-media-blob-v1").derive(master_key))
+
+
+def _hash_segmented(f, lead: bytes, keys: list[str]) -> tuple[str, int] | None:
+    version, segment_size = struct.unpack(">BI", lead[len(_MAGIC):])
+    if version not in _HEADER_SIZES or segment_size <= 0:
+        return None
+    header = lead + f.read(_HEADER_SIZES[version] - _LEAD_SIZE)
+    salt = header[-(16 + 7):-7]
+    prefix = header[-7:]
+    sealed_size = segment_size + _TAG_SIZE
+    body = f.seek(0, os.SEEK_END) - len(header)
+    count = max(1, -(-body // sealed_size))
+
+    # Version 2 names its key, but trying each configured key covers both.
+    for encoded in keys:
+        aead = _segment_key(base64.urlsafe_b64decode(encoded.encode()), salt)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for index in range(count):
+                f.seek(len(header) + index * sealed_size)
+                nonce = prefix + struct.pack(">I?", index, index == count - 1)
+                plain = aead.decrypt(nonce, f.read(sealed_size), header)
+                digest.update(plain)
+                size += len(plain)
+        except InvalidTag:
+            if index == 0:
+                continue
+            return None
+        return digest.hexdigest(), size
+    return None
+
+
+def _hash_blob(path: str) -> tuple[str, int] | None:
+    """Plaintext SHA-256 and size of a stored file, or None if it is unreadable."""
+    from core.config import FILE_ENCRYPTION_KEYS
+
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        lead = f.read(_LEAD_SIZE)
+        if len(lead) == _LEAD_SIZE and lead.startswith(_MAGIC):
+            return _hash_segmented(f, lead, FILE_ENCRYPTION_KEYS)
+        fernet = MultiFernet([Fernet(key.encode()) for key in FILE_ENCRYPTION_KEYS])
+        try:
+            plain = fernet.decrypt(lead + f.read())
+        except InvalidToken:
+            return None
+    return hashlib.sha256(plain).hexdigest(), len(plain)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('stored_filename', sa.String(length=255), nullable=False),
+        sa.Column('stored_path', sa.String(length=500), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('stored_filename', name='uq_blobs_stored_filename'),
+        sa.UniqueConstraint('stored_path', name='uq_blobs_stored_path'),
+    )
+    op.create_index('ix_blobs_sha256', 'blobs', ['sha256'], unique=True)
+
+    op.add_column('media', sa.Column('blob_id', sa.Integer(), nullable=True))
+    op.create_index('ix_media_blob_id', 'media', ['blob_id'], unique=False)
+    op.create_foreign_key('media_blob_id_fkey', 'media', 'blobs', ['blob_id'], ['id'], ondelete='RESTRICT')
+
+    # Media rows now share stored files, so the paths are no longer unique.
+    op.drop_constraint('uq_media_stored_filename', 'media', type_='unique')
+    op.drop_constraint('uq_media_stored_path', 'media', type_='unique')
+
+    # Backfill: hash every stored file (legacy rows have no digest yet) and
+    # point all rows with the same content at a single blob.
+    conn = op.get_bind()
+    rows = conn.execute(text(
+        "SELECT id, stored_filename, stored_path, content_sha256, size_bytes FROM media ORDER BY id"
+    )).fetchall()
+
+    groups: dict[str, list] = {}
+    sizes: dict[str, int] = {}
+    for row in rows:
+        sha, size = row.content_sha256, row.size_bytes
+        if sha is None:
+            hashed = _hash_blob(row.stored_path)
+            if hashed is None:
+                # missing or unreadable file: leave the row as a legacy owner
+                continue
+            sha, size = hashed
+            conn.execute(
+                text("UPDATE media SET content_sha256 = :sha, size_bytes = :size WHERE id = :id"),
+                {"sha": sha, "size": size, "id": row.id},
+            )
+        groups.setdefault(sha, []).append(row)
+        sizes[sha] = size
+
+    surplus = set()
+    for sha, members in groups.items():
+        # Rows that already had a digest were never opened, so their file may
+        # be gone; the copy that is kept must be one that exists.
+        present = [m for m in members if m.stored_path and os.path.exists(m.stored_path)]
+        keep = present[0] if present else members[0]
+        blob_id = conn.execute(
+            text(
+                "INSERT INTO blobs (sha256, stored_filename, stored_path, size_bytes, ref_count) "
+                "VALUES (:sha, :fn, :path, :size, :refs) RETURNING id"
+            ),
+            {"sha": sha, "fn": keep.stored_filename, "path": keep.stored_path, "size": sizes[sha], "refs": len(members)},
+        ).scalar()
+        conn.execute(
+            text(
+                "UPDATE media SET blob_id = :bid, stored_filename = :fn, stored_path = :path "
+                "WHERE id = ANY(:ids)"
+            ),
+            {"bid": blob_id, "fn": keep.stored_filename, "path": keep.stored_path, "ids": [m.id for m in members]},
+        )
+        surplus.update(m.stored_filename for m in present if m.stored_filename != keep.stored_filename)
+
+    # Nothing is unlinked here: the whole upgrade chain runs in one transaction
+    # and a later failure would roll these rows back onto deleted files. The
+    # redundant files are recorded instead and handed to the deletion queue by
+    # c3d4e5f6a7b8, which the deletion worker drains after the commit.
+    op.create_table(
+        'duplicate_media_files',
+        sa.Column('stored_filename', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('stored_filename'),
+    )
+    if surplus:
+        conn.execute(
+            text("INSERT INTO duplicate_media_files (stored_filename) VALUES (:fn)"),
+            [{"fn": fn} for fn in sorted(surplus)],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('duplicate_media_files')
+    # Collapsed duplicates are not restored; rows keep sharing a file, so the
+    # old uniqueness constraints on stored_filename/stored_path stay dropped.
+    op.drop_constraint('media_blob_id_fkey', 'media', type_='foreignkey')
+    op.drop_index('ix_media_blob_id', table_name='media')
+    op.drop_column('media', 'blob_id')
+    op.drop_index('ix_blobs_sha256', table_name='blobs')
+    op.drop_table('blobs')
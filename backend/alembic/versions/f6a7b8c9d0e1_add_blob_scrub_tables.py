@@ -0,0 +1,49 @@
+"""add blob_integrity_failures and scrub_state for integrity scrubbing
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-02-06 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f6a7b8c9d0e1'
+down_revision = 'e5f6a7b8c9d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blob_integrity_failures',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('blob_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('detail', sa.Text(), nullable=True),
+        sa.Column('first_detected_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_checked_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['blob_id'], ['blobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('blob_id'),
+    )
+    op.create_index('ix_blob_integrity_failures_kind', 'blob_integrity_failures', ['kind'], unique=False)
+
+    op.create_table(
+        'scrub_state',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('cursor', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('checked_in_pass', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('pass_started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_pass_completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('passes_completed', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scrub_state')
+    op.drop_index('ix_blob_integrity_failures_kind', table_name='blob_integrity_failures')
+    op.drop_table('blob_integrity_failures')
@@ -0,0 +1,71 @@
+"""add media_tags and workspace_tag_counts, backfilled from media.tags
+
+Revision ID: f9a0b1c2d3e4
+Revises: e8f9a0b1c2d3
+Create Date: 2026-01-29 10:00:00.000000
+
+media.tags is left as it is; the rows in media_tags keep each tag's spelling.
+
+API note: from this revision on, uploads, upload sessions and tag updates
+return 400 for a tag longer than 100 characters ("Tags are limited to 100
+characters") and for tags whose comma-joined form exceeds the 255 characters
+of media.tags ("Too many tags"); the latter used to fail in the database.
+Existing tags longer than 100 characters stay in media.tags but get no
+media_tags row, so tag filters and facets do not see them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f9a0b1c2d3e4'
+down_revision = 'e8f9a0b1c2d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'media_tags',
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('tag', sa.String(length=100), nullable=False),
+        sa.Column('workspace_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['media_id'], ['media.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('media_id', 'tag'),
+    )
+    op.create_index('ix_media_tags_workspace_tag', 'media_tags', ['workspace_id', 'tag', 'media_id'], unique=False)
+
+    op.create_table(
+        'workspace_tag_counts',
+        sa.Column('workspace_id', sa.Integer(), nullable=False),
+        sa.Column('tag', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.ForeignKeyConstraint(['workspace_id'], ['workspaces.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('workspace_id', 'tag'),
+    )
+
+    # Backfill from the comma-joined strings, split the way
+    # services.tag_service.normalize_tags does (trimmed, unique).
+    op.execute(
+        """
+        INSERT INTO media_tags (media_id, tag, workspace_id)
+        SELECT DISTINCT m.id, btrim(t.tag), m.workspace_id
+        FROM media m
+        CROSS JOIN LATERAL unnest(string_to_array(m.tags, ',')) AS t(tag)
+        WHERE btrim(t.tag) <> '' AND length(btrim(t.tag)) <= 100
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO workspace_tag_counts (workspace_id, tag, count)
+        SELECT workspace_id, tag, count(*)
+        FROM media_tags
+        GROUP BY workspace_id, tag
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('workspace_tag_counts')
+    op.drop_index('ix_media_tags_workspace_tag', table_name='media_tags')
+    op.drop_table('media_tags')
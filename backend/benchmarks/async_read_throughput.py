@@ -0,0 +1,119 @@
+"""Throughput of the workspace read endpoints under high concurrency.
+
+Media listing and download, documents, comments and members are served
+from async sessions (``db.database.get_async_db``), so concurrent requests
+wait on the database without each holding a thread-pool slot. Run against a
+live server, checked out once at the revision before the port and once
+after, with the same database. Requires httpx (``pip install httpx``):
+
+    uvicorn main:app --workers 4
+    python benchmarks/async_read_throughput.py --url http://localhost:8000 \\
+        --requests 5000 --concurrency 64
+
+The script registers the user if needed, creates a workspace with
+``--media`` small files, a document and a comment, then sends ``--requests``
+GETs to each endpoint with ``--concurrency`` requests in flight and prints
+p50/p99 latency and throughput per endpoint; requests the server dropped
+count as ``error``. Measured results are in benchmarks/README.md.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(client: httpx.AsyncClient, path: str, headers: dict, total: int, concurrency: int) -> tuple[list[float], dict[int | str, int], float]:
+    latencies = []
+    statuses: dict[int | str, int] = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = (await client.get(path, headers=headers)).status_code
+            except httpx.TransportError:
+                # the server dropped the connection, e.g. after a pool timeout
+                status = "error"
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def setup(client: httpx.AsyncClient, args) -> tuple[dict, int, int]:
+    """Log in and create a populated workspace; returns headers, workspace and media id."""
+    await client.post("/auth/", json={"username": args.username, "email": f"{args.username}@bench.local", "password": args.password})
+    resp = await client.post("/auth/token", data={"username": args.username, "password": args.password})
+    resp.raise_for_status()
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    resp = await client.post("/workspaces", json={"name": "async-read-bench"}, headers=headers)
+    resp.raise_for_status()
+    workspace_id = resp.json()["id"]
+    media_id = None
+    for i in range(args.media):
+        resp = await client.post(
+            f"/workspaces/{workspace_id}/media/upload",
+            files={"file": (f"bench-{i}.bin", os.urandom(args.size), "application/octet-stream")},
+            headers=headers,
+        )
+        resp.raise_for_status()
+        media_id = resp.json()["id"]
+    await client.post(f"/workspaces/{workspace_id}/documents", json={"title": "bench", "content": "bench"}, headers=headers)
+    await client.post(
+        f"/workspaces/{workspace_id}/comments",
+        json={"target_type": "media", "target_id": media_id, "body": "bench"},
+        headers=headers,
+    )
+    # the workspace is newer than the token, so log in again to carry its role
+    resp = await client.post("/auth/token", data={"username": args.username, "password": args.password})
+    resp.raise_for_status()
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    return headers, workspace_id, media_id
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--media", type=int, default=50)
+    parser.add_argument("--size", type=int, default=16 * 1024, help="bytes per media file")
+    parser.add_argument("--requests", type=int, default=5000, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as client:
+        headers, workspace_id, media_id = await setup(client, args)
+        paths = [
+            f"/workspaces/{workspace_id}/media/?page_size=20",
+            f"/workspaces/{workspace_id}/media/{media_id}/download",
+            f"/workspaces/{workspace_id}/documents",
+            f"/workspaces/{workspace_id}/comments",
+            f"/workspaces/{workspace_id}/members",
+        ]
+        for path in paths:
+            # warm-up, so connection setup is not measured
+            await run(client, path, headers, args.concurrency * 2, args.concurrency)
+            samples, statuses, elapsed = await run(client, path, headers, args.requests, args.concurrency)
+            print(
+                f"{path}: n={len(samples)}  p50={statistics.median(samples):.2f} ms  "
+                f"p99={percentile(samples, 99):.2f} ms  {len(samples) / elapsed:.1f} req/s  "
+                f"status={statuses}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""Authenticated request throughput with and without the principal cache.
+
+Runs against a live server. Requires httpx (``pip install httpx``):
+
+    PRINCIPAL_CACHE_SECONDS=0 uvicorn main:app --workers 4   # without
+    uvicorn main:app --workers 4                              # with
+    python benchmarks/auth_throughput.py --url http://localhost:8000 \\
+        --username bench --password bench --requests 20000 --concurrency 32
+
+The script registers the user if needed, logs in with ``--tokens`` separate
+tokens (clients rarely share one) and sends ``--requests`` authenticated
+``GET --path`` requests spread over those tokens, then prints p50/p99/max
+latency, throughput and the principal cache counters from ``/metrics``
+(they are per worker process, so with several workers they only show the
+worker that answered; start the server with METRICS_ENABLED=1 and pass
+its METRICS_TOKEN). Start the server once per mode and compare.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(client: httpx.AsyncClient, path: str, tokens: list[str], total: int, concurrency: int) -> tuple[list[float], dict[int, int], float]:
+    latencies = []
+    statuses: dict[int, int] = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            start = time.perf_counter()
+            resp = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--path", default="/workspaces")
+    parser.add_argument("--tokens", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN"), help="METRICS_TOKEN of the server")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        await client.post("/auth/", json={"username": args.username, "email": f"{args.username}@bench.local", "password": args.password})
+        tokens = []
+        for _ in range(args.tokens):
+            resp = await client.post("/auth/token", data={"username": args.username, "password": args.password})
+            resp.raise_for_status()
+            tokens.append(resp.json()["access_token"])
+            # tokens are only unique per second of issue time
+            await asyncio.sleep(1.01)
+
+        # warm-up, so connection setup is not measured
+        await run(client, args.path, tokens, len(tokens) * 4, args.concurrency)
+        samples, statuses, elapsed = await run(client, args.path, tokens, args.requests, args.concurrency)
+        print(
+            f"{args.path}: n={len(samples)}  p50={statistics.median(samples):.2f} ms  "
+            f"p99={percentile(samples, 99):.2f} ms  max={max(samples):.2f} ms  "
+            f"{len(samples) / elapsed:.1f} req/s  status={statuses}"
+        )
+        metrics = (await client.get("/metrics", headers={"Authorization": f"Bearer {args.metrics_token}"})).json()
+        print(f"principal cache: {metrics.get('principal_cache')}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Repeated avatar fetches with and without conditional requests.
+
+Runs against a live server. Requires httpx (``pip install httpx``):
+
+    python benchmarks/avatar_fetch.py --url http://localhost:8000 \\
+        --username bench --password bench --requests 2000 --concurrency 16
+
+The script registers the user if needed, uploads an avatar into a scratch
+workspace, points the profile at it with a ``media:<ws>:<id>`` reference and
+resolves the download URL through ``GET /workspaces/{id}/members``, the way
+the frontend does. It then fetches the avatar ``--requests`` times, first
+unconditionally and then revalidating with ``If-None-Match`` as a browser
+with a warm cache would, and prints p50/p99/max latency and throughput for
+both rounds.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def fetch_round(client: httpx.AsyncClient, url: str, headers: dict, total: int, concurrency: int) -> tuple[list[float], dict[int, int], float]:
+    latencies = []
+    statuses: dict[int, int] = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            resp = await client.get(url, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def report(label: str, samples: list[float], statuses: dict[int, int], elapsed: float) -> None:
+    print(
+        f"{label:>12}: n={len(samples):5d}  p50={statistics.median(samples):8.2f} ms  "
+        f"p99={percentile(samples, 99):8.2f} ms  max={max(samples):8.2f} ms  "
+        f"{len(samples) / elapsed:8.1f} req/s  status={statuses}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        await client.post("/auth/", json={"username": args.username, "email": f"{args.username}@bench.local", "password": args.password})
+        token = (await client.post("/auth/token", data={"username": args.username, "password": args.password})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        workspace_id = (await client.post("/workspaces", json={"name": "avatar-fetch-bench"}, headers=headers)).json()["id"]
+
+        avatar = await client.post(
+            f"/workspaces/{workspace_id}/media/upload",
+            files={"file": (f"avatar-{time.time_ns()}.png", os.urandom(args.size_kb * 1024), "image/png")},
+            headers=headers,
+        )
+        avatar.raise_for_status()
+        await client.patch("/users/me", json={"avatar_url": f"media:{workspace_id}:{avatar.json()['id']}"}, headers=headers)
+        members = (await client.get(f"/workspaces/{workspace_id}/members", headers=headers)).json()
+        url = next(m["avatar_url"] for m in members if m.get("username") == args.username)
+
+        first = await client.get(url, headers=headers)
+        first.raise_for_status()
+        print(f"avatar {url}: {len(first.content)} bytes, Cache-Control: {first.headers.get('cache-control')}")
+
+        report("full", *await fetch_round(client, url, headers, args.requests, args.concurrency))
+        etag = first.headers.get("etag")
+        if etag is None:
+            print("no ETag on the response; skipping the conditional round")
+            return
+        conditional = {**headers, "If-None-Match": etag}
+        report("conditional", *await fetch_round(client, url, conditional, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
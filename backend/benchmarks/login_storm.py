@@ -0,0 +1,100 @@
+"""Latency of other endpoints during a login storm.
+
+Runs against a live server. Requires httpx (``pip install httpx``):
+
+    python benchmarks/login_storm.py --url http://localhost:8000 \\
+        --username bench --password bench --logins 400 --concurrency 64
+
+The script registers the user if needed, then probes ``GET /workspaces`` (a
+sync route, served by the same thread pool the login route used to block)
+while ``--logins`` password logins run ``--concurrency`` at a time. It prints
+p50/p99/max latency for the probes idle and during the storm, login latency
+and throughput split by status (503 means the password pool turned the
+request away), and the pool counters from ``/metrics`` (start the server
+with METRICS_ENABLED=1 and pass its METRICS_TOKEN). Tune
+PASSWORD_POOL_WORKERS and PASSWORD_POOL_MAX_QUEUE on the server and compare.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/workspaces", headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient, form: dict, total: int, concurrency: int) -> dict[int, list[float]]:
+    by_status: dict[int, list[float]] = {}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            resp = await client.post("/auth/token", data=form)
+            by_status.setdefault(resp.status_code, []).append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return by_status
+
+
+def report(label: str, samples: list[float]) -> None:
+    print(
+        f"{label:>12}: n={len(samples):5d}  p50={statistics.median(samples):8.2f} ms  "
+        f"p99={percentile(samples, 99):8.2f} ms  max={max(samples):8.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN"), help="METRICS_TOKEN of the server")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 8)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as client:
+        form = {"username": args.username, "password": args.password}
+        await client.post("/auth/", json={"username": args.username, "email": f"{args.username}@bench.local", "password": args.password})
+        token = (await client.post("/auth/token", data=form)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stop = asyncio.Event()
+        idle = asyncio.create_task(probe(client, headers, stop))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        report("idle", await idle)
+
+        stop = asyncio.Event()
+        loaded = asyncio.create_task(probe(client, headers, stop))
+        started = time.perf_counter()
+        logins = await storm(client, form, args.logins, args.concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        report("during storm", await loaded)
+        for code, samples in sorted(logins.items()):
+            report(f"login {code}", samples)
+        print(f"{args.logins} logins in {elapsed:.1f} s ({args.logins / elapsed:.1f}/s)")
+        print((await client.get("/metrics", headers={"Authorization": f"Bearer {args.metrics_token}"})).json()["executors"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
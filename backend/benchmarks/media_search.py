@@ -0,0 +1,141 @@
+"""Filename search at scale: ILIKE substring scan vs. indexed ranked search.
+
+Runs directly against the PostgreSQL database in DATABASE_URL, which must be
+migrated to head (pg_trgm and the media search indexes):
+
+    cd backend && python benchmarks/media_search.py --rows 1000000
+
+The script creates a scratch workspace and fills it with ``--rows`` synthetic
+media rows server-side (generate_series). It then times the ``list_media``
+filename filter (``ILIKE '%x%'``) against ``search_media`` for a few query
+shapes (exact word, prefix, multi-word, typo) and prints p50/p99 per query
+with the top of each plan. The workspace and its rows are removed afterwards
+unless ``--keep`` is given.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import main as _app  # noqa: E402,F401  (configures all mappers)
+from db.database import SessionLocal, engine  # noqa: E402
+from models.media import Media  # noqa: E402
+from routers.files import filter_media_query  # noqa: E402
+from services.search_service import search_media  # noqa: E402
+
+WORDS = [
+    "report", "invoice", "contract", "photo", "holiday", "budget", "design",
+    "draft", "final", "meeting", "notes", "summary", "roadmap", "logo",
+    "banner", "presentation", "quarterly", "annual", "team", "project",
+]
+EXTENSIONS = ["pdf", "png", "jpg", "docx", "xlsx", "txt", "mp4"]
+
+QUERIES = {
+    "word": "roadmap",
+    "prefix": "quart",
+    "two words": "annual budget",
+    "typo": "presentaton",
+}
+
+FILL_SQL = text(
+    """
+    INSERT INTO media (workspace_id, original_filename, mime_type, size_bytes, description, tags, created_at)
+    SELECT
+        :workspace_id,
+        initcap(w1) || '_' || w2 || '_' || g || '.' || ext,
+        'application/octet-stream',
+        1024 + g % 100000,
+        CASE WHEN g % 3 = 0 THEN w2 || ' ' || w3 || ' for ' || w1 END,
+        CASE WHEN g % 2 = 0 THEN w3 || ',' || w1 END,
+        now() - make_interval(secs => g)
+    FROM (
+        SELECT g,
+               (:words)[1 + (hashint4(g) & 2147483647) % :nwords] AS w1,
+               (:words)[1 + (hashint4(g * 7) & 2147483647) % :nwords] AS w2,
+               (:words)[1 + (hashint4(g * 13) & 2147483647) % :nwords] AS w3,
+               (:exts)[1 + g % :nexts] AS ext
+        FROM generate_series(1, :rows) AS g
+    ) AS s
+    """
+)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def plan_head(db, query) -> str:
+    compiled = query.statement.compile(engine)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).scalars().all()
+    return rows[0].strip()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    engine.echo = False
+    db = SessionLocal()
+    workspace_id = db.execute(text("INSERT INTO workspaces (name) VALUES ('media-search-bench') RETURNING id")).scalar_one()
+    db.commit()
+    try:
+        start = time.perf_counter()
+        db.execute(
+            FILL_SQL,
+            {
+                "workspace_id": workspace_id,
+                "rows": args.rows,
+                "words": WORDS,
+                "nwords": len(WORDS),
+                "exts": EXTENSIONS,
+                "nexts": len(EXTENSIONS),
+            },
+        )
+        db.commit()
+        db.execute(text("ANALYZE media"))
+        db.commit()
+        print(f"inserted {args.rows} rows in {time.perf_counter() - start:.1f} s (workspace {workspace_id})")
+
+        for label, q in QUERIES.items():
+            ilike = (
+                filter_media_query(db, workspace_id, q, None)
+                .order_by(Media.created_at.desc())
+                .limit(args.limit)
+            )
+            ranked = search_media(filter_media_query(db, workspace_id, None, None), q).limit(args.limit)
+            for name, query in (("ilike", ilike), ("search", ranked)):
+                hits = len(query.all())
+                samples = timed(query.all, args.repeat)
+                print(
+                    f"{label:>10} {name:>6}: hits={hits:3d}  p50={statistics.median(samples):8.2f} ms  "
+                    f"p99={percentile(samples, 99):8.2f} ms  plan: {plan_head(db, query)}"
+                )
+    finally:
+        if not args.keep:
+            db.rollback()
+            db.execute(text("DELETE FROM workspaces WHERE id = :id"), {"id": workspace_id})
+            db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
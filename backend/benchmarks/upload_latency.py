@@ -0,0 +1,114 @@
+"""Latency of an unrelated endpoint while large uploads are in flight.
+
+Runs against a live server. Requires httpx (``pip install httpx``):
+
+    python benchmarks/upload_latency.py --url http://localhost:8000 \\
+        --username bench --password bench --uploads 8 --size-mb 200
+
+The script registers the user if needed, creates a scratch workspace, then
+hammers ``GET /`` and ``GET /users/me`` while ``--uploads`` parallel uploads
+of ``--size-mb`` run, and prints p50/p99/max latency for the probe requests,
+both idle and under load. Compare runs before and after moving crypto and
+disk I/O off the event loop (run uvicorn with a single worker). The
+counters from ``/metrics`` are printed last; start the server with
+METRICS_ENABLED=1 and pass its METRICS_TOKEN.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        for path in ("/", "/users/me"):
+            start = time.perf_counter()
+            await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def upload_body(size: int, chunk: int = 1024 * 1024):
+    remaining = size
+    while remaining:
+        n = min(chunk, remaining)
+        yield os.urandom(n)
+        remaining -= n
+
+
+async def upload(client: httpx.AsyncClient, headers: dict, workspace_id: int, i: int, size: int) -> None:
+    boundary = "benchboundary"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench-{i}-{time.time_ns()}.bin\"\r\n"
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body():
+        yield head
+        for part in upload_body(size):
+            yield part
+        yield tail
+
+    resp = await client.post(
+        f"/workspaces/{workspace_id}/media/upload",
+        headers={**headers, "Content-Type": f"multipart/form-data; boundary={boundary}"},
+        content=body(),
+    )
+    resp.raise_for_status()
+
+
+def report(label: str, samples: list[float]) -> None:
+    print(
+        f"{label:>12}: n={len(samples):5d}  p50={statistics.median(samples):8.2f} ms  "
+        f"p99={percentile(samples, 99):8.2f} ms  max={max(samples):8.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN"), help="METRICS_TOKEN of the server")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        await client.post("/auth/", json={"username": args.username, "email": f"{args.username}@bench.local", "password": args.password})
+        token = (await client.post("/auth/token", data={"username": args.username, "password": args.password})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        workspace_id = (await client.post("/workspaces", json={"name": "upload-latency-bench"}, headers=headers)).json()["id"]
+
+        stop = asyncio.Event()
+        idle = asyncio.create_task(probe(client, headers, stop))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        report("idle", await idle)
+
+        stop = asyncio.Event()
+        loaded = asyncio.create_task(probe(client, headers, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(client, headers, workspace_id, i, args.size_mb * 1024 * 1024) for i in range(args.uploads)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        report("under load", await loaded)
+        total_mb = args.uploads * args.size_mb
+        print(f"uploaded {total_mb} MB in {elapsed:.1f} s ({total_mb / elapsed:.1f} MB/s)")
+        print((await client.get("/metrics", headers={"Authorization": f"Bearer {args.metrics_token}"})).json())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+def run_periodically(app, name: str, interval_seconds: float, job: Callable[[], None]) -> None:
+    """Run ``job`` in a daemon thread every ``interval_seconds`` while the app is up.
+
+    Jobs are expected to be idempotent and safe to run in several workers at
+    once. An interval of 0 (or less) leaves the job disabled.
+    """
+    if interval_seconds <= 0:
+        return
+    stop = threading.Event()
+
+    def _loop() -> None:
+        while not stop.wait(interval_seconds):
+            try:
+                job()
+            except Exception:
+                logger.exception("Background job %s failed", name)
+
+    @app.on_event("startup")
+    def _start() -> None:
+        threading.Thread(target=_loop, name=name, daemon=True).start()
+
+    @app.on_event("shutdown")
+    def _stop() -> None:
+        stop.set()
@@ -0,0 +1,293 @@
+"""Segmented authenticated encryption for stored media blobs.
+
+Blob layout (integers are big-endian):
+
+    header: MAGIC (4) | version (1) | segment_size (4) | key_id (4) | salt (16) | nonce_prefix (7)
+    body:   segment_0 | segment_1 | ... | segment_n
+
+Every segment carries ``segment_size`` bytes of plaintext (only the last one
+may be shorter) sealed with AES-256-GCM, so on disk it takes
+``segment_size + TAG_SIZE`` bytes. The nonce is
+``nonce_prefix | segment_index (4) | last_flag (1)`` and the header is bound as
+associated data, so segments cannot be reordered, dropped, truncated or moved
+between blobs without failing authentication. The per-blob key is derived from
+the master key with HKDF over the random salt.
+
+``key_id`` names the master key (see ``key_id``), so readers pick the right
+one from FILE_ENCRYPTION_KEYS after a rotation. Version 1 headers predate it
+and lack the field; their key is found by trying each configured key on the
+first segment.
+
+Blobs written before this format existed are a single Fernet token; they carry
+no magic and are decrypted with ``core.config.fernet`` (a MultiFernet over the
+same keys) as a whole.
+"""
+import base64
+import hashlib
+import os
+import struct
+from typing import BinaryIO, Iterator
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from core.config import FILE_ENCRYPTION_KEYS, fernet
+from core.executors import run_crypto_sync
+
+MAGIC = b"ACCB"
+VERSION = 2
+KEY_ID_SIZE = 4
+SALT_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+# magic, version and segment size, common to every version
+_LEAD_SIZE = len(MAGIC) + 1 + 4
+HEADER_SIZES = {
+    1: _LEAD_SIZE + SALT_SIZE + NONCE_PREFIX_SIZE,
+    2: _LEAD_SIZE + KEY_ID_SIZE + SALT_SIZE + NONCE_PREFIX_SIZE,
+}
+HEADER_SIZE = HEADER_SIZES[VERSION]
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+
+_HKDF_INFO = b"acc-media-blob-v1"
+
+
+class BlobDecryptionError(Exception):
+    """Raised when a stored blob is malformed or fails authentication."""
+
+
+def key_id(master_key: bytes) -> str:
+    """Public fingerprint naming a master key: 8 hex digits."""
+    return hashlib.sha256(b"acc-key-id" + master_key).hexdigest()[: KEY_ID_SIZE * 2]
+
+
+# key id -> master key, newest first
+MASTER_KEYS: dict[str, bytes] = {}
+for _encoded in FILE_ENCRYPTION_KEYS:
+    _key = base64.urlsafe_b64decode(_encoded.encode())
+    MASTER_KEYS.setdefault(key_id(_key), _key)
+CURRENT_KEY_ID = next(iter(MASTER_KEYS))
+
+
+def _master_key() -> bytes:
+    return MASTER_KEYS[CURRENT_KEY_ID]
+
+
+def _derive_key(master_key: bytes, salt: bytes) -> bytes:
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=_HKDF_INFO,
+    ).derive(master_key)
+
+
+def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    return prefix + struct.pack(">I?", index, last)
+
+
+def seal_segments(
+    lead: bytes,
+    key: bytes,
+    header: bytes,
+    prefix: bytes,
+    first_index: int,
+    payload: bytes,
+    segment_size: int,
+    last: bool,
+) -> bytes:
+    """Seal ``payload`` as consecutive segments starting at ``first_index``.
+
+    A pure function of its arguments so it can run in a worker process.
+    ``lead`` (the header on the first call) is prepended to the output.
+    """
+    aead = AESGCM(key)
+    out = [lead]
+    count = max(1, -(-len(payload) // segment_size)) if last else len(payload) // segment_size
+    for i in range(count):
+        chunk = payload[i * segment_size: (i + 1) * segment_size]
+        is_last = last and i == count - 1
+        out.append(aead.encrypt(_nonce(prefix, first_index + i, is_last), chunk, header))
+    return b"".join(out)
+
+
+class SegmentEncryptor:
+    """Incrementally encrypts a plaintext stream into the segmented format.
+
+    Feed plaintext with ``update`` and write whatever it returns; ``finalize``
+    seals the trailing segment. At most one segment of plaintext is buffered.
+    ``plan``/``plan_final`` return the ``seal_segments`` arguments instead, for
+    callers that run the sealing elsewhere (see ``core.executors``); jobs must
+    be written out in the order they were planned.
+    """
+
+    def __init__(self, master_key: bytes | None = None, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        master_key = master_key or _master_key()
+        self.segment_size = segment_size
+        self.key_id = key_id(master_key)
+        salt = os.urandom(SALT_SIZE)
+        self._prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self.header = (
+            MAGIC + struct.pack(">BI", VERSION, segment_size) + bytes.fromhex(self.key_id) + salt + self._prefix
+        )
+        self._key = _derive_key(master_key, salt)
+        self._buffer = bytearray()
+        self._index = 0
+        self._header_sent = False
+
+    def _take_header(self) -> bytes:
+        if self._header_sent:
+            return b""
+        self._header_sent = True
+        return self.header
+
+    def plan(self, data: bytes) -> tuple:
+        self._buffer += data
+        # Keep at least one byte buffered: a segment can only be sealed once we
+        # know whether it is the last one.
+        count = (len(self._buffer) - 1) // self.segment_size if self._buffer else 0
+        payload = bytes(self._buffer[: count * self.segment_size])
+        del self._buffer[: count * self.segment_size]
+        job = (self._take_header(), self._key, self.header, self._prefix, self._index, payload, self.segment_size, False)
+        self._index += count
+        return job
+
+    def plan_final(self) -> tuple:
+        payload = bytes(self._buffer)
+        self._buffer.clear()
+        return (self._take_header(), self._key, self.header, self._prefix, self._index, payload, self.segment_size, True)
+
+    def update(self, data: bytes) -> bytes:
+        return seal_segments(*self.plan(data))
+
+    def finalize(self) -> bytes:
+        return seal_segments(*self.plan_final())
+
+
+def is_segmented(prefix: bytes) -> bool:
+    return prefix[: len(MAGIC)] == MAGIC
+
+
+def _header_size(lead: bytes) -> int:
+    """Full header size, given the first ``_LEAD_SIZE`` bytes of a segmented blob."""
+    version, segment_size = struct.unpack(">BI", lead[len(MAGIC): _LEAD_SIZE])
+    if version not in HEADER_SIZES or segment_size <= 0:
+        raise BlobDecryptionError("Unsupported blob version")
+    return HEADER_SIZES[version]
+
+
+def _parse_header(header: bytes) -> tuple[int, str | None, bytes, bytes]:
+    """Segment size, key id (None for version 1), salt and nonce prefix."""
+    if len(header) < _LEAD_SIZE or not is_segmented(header) or len(header) != _header_size(header):
+        raise BlobDecryptionError("Not a segmented blob")
+    segment_size = struct.unpack(">I", header[len(MAGIC) + 1: _LEAD_SIZE])[0]
+    offset = _LEAD_SIZE
+    kid = None
+    if header[len(MAGIC)] >= 2:
+        kid = header[offset: offset + KEY_ID_SIZE].hex()
+        offset += KEY_ID_SIZE
+    salt = header[offset: offset + SALT_SIZE]
+    prefix = header[offset + SALT_SIZE:]
+    return segment_size, kid, salt, prefix
+
+
+def _fernet_decrypt(token: bytes) -> bytes:
+    return fernet.decrypt(token)
+
+
+class BlobReader:
+    """Random-access reader over an open blob.
+
+    Segmented blobs are decrypted lazily: ``iter_range`` seeks straight to the
+    first segment that overlaps the range and authenticates only the segments
+    it needs. Legacy Fernet blobs cannot be addressed piecewise and are
+    decrypted in full on first access. ``key_id`` names the master key the
+    blob is encrypted with (None for Fernet blobs).
+    """
+
+    def __init__(self, f: BinaryIO, master_key: bytes | None = None):
+        self._f = f
+        self._legacy: bytes | None = None
+        self.key_id: str | None = None
+        header = f.read(_LEAD_SIZE)
+        if not is_segmented(header):
+            token = header + f.read()
+            try:
+                # whole-blob decryption of big legacy files goes to the crypto pool
+                self._legacy = run_crypto_sync(_fernet_decrypt, token, size=len(token))
+            except InvalidToken as exc:
+                raise BlobDecryptionError("Legacy blob failed to decrypt") from exc
+            self.size = len(self._legacy)
+            return
+
+        header += f.read(_header_size(header) - _LEAD_SIZE)
+        self._header = header
+        self._header_size = len(header)
+        self.segment_size, kid, salt, self._prefix = _parse_header(header)
+        self._sealed_size = self.segment_size + TAG_SIZE
+
+        body = f.seek(0, os.SEEK_END) - self._header_size
+        # An empty blob still has one (empty) sealed segment.
+        self._segments = max(1, -(-body // self._sealed_size))
+        self.size = body - self._segments * TAG_SIZE
+        if self.size < 0:
+            raise BlobDecryptionError("Blob is truncated")
+
+        if master_key is not None:
+            candidates = {key_id(master_key): master_key}
+        elif kid is not None:
+            if kid not in MASTER_KEYS:
+                raise BlobDecryptionError(f"Blob is encrypted with unknown key {kid}")
+            candidates = {kid: MASTER_KEYS[kid]}
+        else:
+            candidates = MASTER_KEYS
+        for candidate_id, candidate in candidates.items():
+            self._aead = AESGCM(_derive_key(candidate, salt))
+            self.key_id = candidate_id
+            if len(candidates) == 1 or self._authenticates():
+                break
+        else:
+            raise BlobDecryptionError("No configured key decrypts this blob")
+
+    def _authenticates(self) -> bool:
+        try:
+            self._read_segment(0)
+        except BlobDecryptionError:
+            return False
+        return True
+
+    def _read_segment(self, index: int) -> bytes:
+        self._f.seek(self._header_size + index * self._sealed_size)
+        sealed = self._f.read(self._sealed_size)
+        last = index == self._segments - 1
+        try:
+            return self._aead.decrypt(_nonce(self._prefix, index, last), sealed, self._header)
+        except InvalidTag as exc:
+            raise BlobDecryptionError(f"Segment {index} failed authentication") from exc
+
+    def iter_range(self, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        """Yield plaintext bytes ``[start, stop)``, one segment at a time."""
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return
+        if self._legacy is not None:
+            yield self._legacy[start:stop]
+            return
+
+        first = start // self.segment_size
+        last = (stop - 1) // self.segment_size
+        for index in range(first, last + 1):
+            plain = self._read_segment(index)
+            offset = index * self.segment_size
+            yield plain[max(start - offset, 0): stop - offset]
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def iter_decrypt(f: BinaryIO, master_key: bytes | None = None) -> Iterator[bytes]:
+    """Yield the plaintext of an open blob one segment at a time."""
+    yield from BlobReader(f, master_key).iter_range()
@@ -0,0 +1,37 @@
+"""Cache-Control policies for media downloads, chosen by MIME type.
+
+``MEDIA_CACHE_CONTROL`` is a ``;``-separated list of ``pattern=directives``
+rules; a pattern is an exact type (``image/png``), a type wildcard
+(``image/*``) or ``default``. The most specific matching rule wins:
+
+    MEDIA_CACHE_CONTROL="image/*=private, max-age=86400; application/pdf=private, max-age=600; default=private, no-cache"
+"""
+from core.config import MEDIA_CACHE_CONTROL
+
+DEFAULT_POLICY = "private, no-cache"
+
+
+def _parse(spec: str) -> dict[str, str]:
+    rules = {}
+    for rule in spec.split(";"):
+        if not rule.strip():
+            continue
+        pattern, sep, directives = rule.partition("=")
+        if not sep or not pattern.strip() or not directives.strip():
+            raise RuntimeError(f"Malformed MEDIA_CACHE_CONTROL rule: {rule.strip()!r}")
+        rules[pattern.strip().lower()] = directives.strip()
+    return rules
+
+
+_RULES = _parse(MEDIA_CACHE_CONTROL)
+
+
+def cache_control_for(mime_type: str | None) -> str:
+    """The Cache-Control header for a download of ``mime_type``."""
+    mime = (mime_type or "").split(";", 1)[0].strip().lower()
+    if mime in _RULES:
+        return _RULES[mime]
+    wildcard = mime.split("/", 1)[0] + "/*"
+    if mime and wildcard in _RULES:
+        return _RULES[wildcard]
+    return _RULES.get("default", DEFAULT_POLICY)
@@ -0,0 +1,216 @@
+"""Compression applied to media before encryption.
+
+Which codec a blob gets is decided by ``codec_for_mime`` when it is uploaded
+and recorded on the blob; reading goes through ``DecodingReader``, which
+undoes it. Formats that are already compressed (JPEG, MP4, ZIP and the ZIP
+based office formats, ...) are stored as-is.
+"""
+import logging
+import zlib
+from typing import Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional dependency; zlib is used instead
+    zstandard = None
+
+from core.config import COMPRESSION_CODEC, COMPRESSION_LEVEL
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+# Most decompressed bytes produced at a time, however small the input: a few
+# kilobytes of crafted zlib or zstd data can expand to gigabytes.
+DECODE_STEP = 64 * 1024
+
+
+class DecompressionError(ValueError):
+    """Raised when stored content is not a valid stream of its codec."""
+
+
+class DecompressionLimitExceeded(ValueError):
+    """Raised when stored content decompresses to more than its recorded size."""
+
+# Exact types and type prefixes worth compressing.
+_COMPRESSIBLE_PREFIXES = ("text/",)
+_COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/ld+json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+    "application/x-yaml",
+    "application/yaml",
+    "application/sql",
+    "application/rtf",
+    "application/x-tex",
+    "application/postscript",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+    "image/svg+xml",
+    "image/bmp",
+    "image/x-ms-bmp",
+    "image/tiff",
+    "audio/wav",
+    "audio/x-wav",
+}
+
+
+def _configured_codec() -> str:
+    if COMPRESSION_CODEC in {"none", IDENTITY}:
+        return IDENTITY
+    if COMPRESSION_CODEC == ZSTD and zstandard is None:
+        logger.warning("zstandard is not installed, compressing media with zlib instead")
+        return ZLIB
+    if COMPRESSION_CODEC not in {ZLIB, ZSTD}:
+        raise RuntimeError(f"Unknown COMPRESSION_CODEC: {COMPRESSION_CODEC}")
+    return COMPRESSION_CODEC
+
+
+DEFAULT_CODEC = _configured_codec()
+
+
+def codec_for_mime(mime_type: str | None) -> str:
+    """The codec new uploads of ``mime_type`` are stored with."""
+    if not mime_type:
+        return IDENTITY
+    mime = mime_type.split(";", 1)[0].strip().lower()
+    if mime in _COMPRESSIBLE_TYPES or mime.startswith(_COMPRESSIBLE_PREFIXES):
+        return DEFAULT_CODEC
+    return IDENTITY
+
+
+class _Identity:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def compressor(codec: str):
+    """Streaming compressor with ``compress(data)`` and ``flush()``."""
+    if codec == IDENTITY:
+        return _Identity()
+    if codec == ZLIB:
+        return zlib.compressobj(COMPRESSION_LEVEL)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required for zstd-compressed media")
+        return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compressobj()
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+class _ChunkFile:
+    """Minimal ``read()`` over an iterator of byte strings, for zstd's stream reader."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b""
+            self._buffer = chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _iter_zlib(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    d = zlib.decompressobj()
+    try:
+        for data in chunks:
+            while True:
+                plain = d.decompress(data, DECODE_STEP)
+                data = d.unconsumed_tail
+                if plain:
+                    yield plain
+                # a full step may leave output pending inside zlib
+                if not data and len(plain) < DECODE_STEP:
+                    break
+        tail = d.flush()
+    except zlib.error as exc:
+        raise DecompressionError(str(exc)) from exc
+    if tail:
+        yield tail
+
+
+def _iter_zstd(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    if zstandard is None:
+        raise RuntimeError("zstandard is required for zstd-compressed media")
+    with zstandard.ZstdDecompressor().stream_reader(_ChunkFile(chunks), closefd=False) as reader:
+        while True:
+            try:
+                plain = reader.read(DECODE_STEP)
+            except zstandard.ZstdError as exc:
+                raise DecompressionError(str(exc)) from exc
+            if not plain:
+                return
+            yield plain
+
+
+def iter_decompressed(codec: str, chunks: Iterable[bytes], limit: int | None = None) -> Iterator[bytes]:
+    """Decompress ``chunks``, yielding at most DECODE_STEP bytes at a time.
+
+    Raises DecompressionError for corrupt input and DecompressionLimitExceeded
+    as soon as the output passes ``limit``.
+    """
+    if codec == IDENTITY:
+        pieces = iter(chunks)
+    elif codec == ZLIB:
+        pieces = _iter_zlib(chunks)
+    elif codec == ZSTD:
+        pieces = _iter_zstd(chunks)
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    produced = 0
+    for plain in pieces:
+        produced += len(plain)
+        if limit is not None and produced > limit:
+            raise DecompressionLimitExceeded(f"content decompresses to more than {limit} bytes")
+        yield plain
+
+
+class DecodingReader:
+    """Presents a decrypted blob as its original (decompressed) content.
+
+    ``size`` is the logical size. Compressed streams cannot be entered in the
+    middle, so ranges on compressed blobs decode from the start and drop the
+    bytes before ``start``; memory stays bounded by one segment either way,
+    and output beyond the recorded size fails with DecompressionLimitExceeded.
+    """
+
+    def __init__(self, reader, codec: str, size: int | None = None):
+        self._reader = reader
+        self.codec = codec
+        self.size = reader.size if codec == IDENTITY or size is None else size
+
+    def iter_range(self, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return
+        if self.codec == IDENTITY:
+            yield from self._reader.iter_range(start, stop)
+            return
+
+        pos = 0
+        for plain in iter_decompressed(self.codec, self._reader.iter_range(), self.size):
+            if pos + len(plain) > start:
+                yield plain[max(start - pos, 0): stop - pos]
+            pos += len(plain)
+            if pos >= stop:
+                return
+
+    def close(self) -> None:
+        self._reader.close()
@@ -1,10 +1,21 @@
 import os
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path=".env")
-FILE_ENCRYPTION_KEY = os.getenv("FILE_ENCRYPTION_KEY")
-fernet = Fernet(FILE_ENCRYPTION_KEY.encode())
+# Master keys for stored content, comma-separated and newest first. New
+# content is encrypted with the first one; the others stay readable until
+# key rotation (services.key_rotation_service) has moved everything onto the
+# first. FILE_ENCRYPTION_KEY alone is a single-key ring.
+FILE_ENCRYPTION_KEYS = [
+    key.strip()
+    for key in os.getenv("FILE_ENCRYPTION_KEYS", os.getenv("FILE_ENCRYPTION_KEY") or "").split(",")
+    if key.strip()
+]
+if not FILE_ENCRYPTION_KEYS:
+    raise RuntimeError("FILE_ENCRYPTION_KEY is not set")
+FILE_ENCRYPTION_KEY = FILE_ENCRYPTION_KEYS[0]
+fernet = MultiFernet([Fernet(key.encode()) for key in FILE_ENCRYPTION_KEYS])
 _secret_key = os.getenv("SECRET_KEY")
 if _secret_key is None:
     raise RuntimeError("SECRET_KEY is not set")
@@ -13,6 +24,145 @@ SECRET_KEY: str = _secret_key
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 FILES_DIR = os.path.join(BASE_DIR, "files")
 os.makedirs(FILES_DIR, exist_ok=True)
+# Uploads are read from the request in chunks of this size, so memory per
+# upload stays constant regardless of the file size.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Worker pools keeping blocking work off the event loop. Crypto on payloads of
+# at least CRYPTO_PROCESS_THRESHOLD bytes runs in the process pool, smaller
+# payloads share the I/O thread pool.
+IO_POOL_WORKERS = int(os.getenv("IO_POOL_WORKERS", "16"))
+CRYPTO_POOL_WORKERS = int(os.getenv("CRYPTO_POOL_WORKERS", str(os.cpu_count() or 2)))
+CRYPTO_PROCESS_THRESHOLD = int(os.getenv("CRYPTO_PROCESS_THRESHOLD", str(4 * 1024 * 1024)))
+# Password hashing (bcrypt) gets its own process pool so a burst of logins
+# cannot starve other requests. Once PASSWORD_POOL_MAX_QUEUE jobs are waiting,
+# further logins and sign-ups are turned away with 503 instead of queueing.
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", "64"))
+
+# Compress-then-encrypt for compressible MIME types (see core.codecs). The
+# codec is "zstd" (needs the zstandard package) or "zlib"; "none" disables it.
+COMPRESSION_CODEC = os.getenv("COMPRESSION_CODEC", "zstd")
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "3"))
+
+# Resumable uploads: chunks are spooled (encrypted) under the staging dir until
+# the session is finalized; idle sessions expire after the TTL and are swept.
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+UPLOAD_SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv("UPLOAD_SESSION_SWEEP_INTERVAL_SECONDS", "600"))
+UPLOAD_SESSION_MAX_SIZE = int(os.getenv("UPLOAD_SESSION_MAX_SIZE", str(20 * 1024 ** 3)))
+UPLOAD_SESSION_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_SESSION_MAX_CHUNK_SIZE", str(256 * 1024 ** 2)))
+
+# Batch uploads: files per request, and how many of them are streamed to
+# staging at the same time.
+BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "500"))
+BATCH_UPLOAD_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "8"))
+
+# Cache-Control for media downloads by MIME type (syntax in core.cache_control).
+# Media sits behind authentication, so policies should stay "private".
+MEDIA_CACHE_CONTROL = os.getenv(
+    "MEDIA_CACHE_CONTROL",
+    "image/*=private, max-age=86400; default=private, no-cache",
+)
+
+# Decrypted-content cache in front of media downloads (see core.content_cache).
+# Items up to MEDIA_CACHE_MAX_ITEM_BYTES are kept in memory; larger ones up to
+# MEDIA_CACHE_DISK_MAX_ITEM_BYTES go to the encrypted disk tier when
+# MEDIA_CACHE_DISK_DIR is set. A zero budget disables a tier.
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MEDIA_CACHE_MAX_ITEM_BYTES = int(os.getenv("MEDIA_CACHE_MAX_ITEM_BYTES", str(1024 * 1024)))
+MEDIA_CACHE_DISK_DIR = os.getenv("MEDIA_CACHE_DISK_DIR", "")
+MEDIA_CACHE_DISK_MAX_BYTES = int(os.getenv("MEDIA_CACHE_DISK_MAX_BYTES", str(1024 ** 3)))
+MEDIA_CACHE_DISK_MAX_ITEM_BYTES = int(os.getenv("MEDIA_CACHE_DISK_MAX_ITEM_BYTES", str(32 * 1024 * 1024)))
+
+# Media listing totals are cached per workspace and filter for this long.
+MEDIA_COUNT_CACHE_SECONDS = float(os.getenv("MEDIA_COUNT_CACHE_SECONDS", "30"))
+
+# Default per-workspace quotas (0 = unlimited); workspace_usage rows may
+# override them. Usage counters are reconciled against the media table
+# every WORKSPACE_USAGE_RECONCILE_INTERVAL_SECONDS (0 disables).
+WORKSPACE_QUOTA_BYTES = int(os.getenv("WORKSPACE_QUOTA_BYTES", "0"))
+WORKSPACE_QUOTA_FILES = int(os.getenv("WORKSPACE_QUOTA_FILES", "0"))
+WORKSPACE_USAGE_RECONCILE_INTERVAL_SECONDS = int(os.getenv("WORKSPACE_USAGE_RECONCILE_INTERVAL_SECONDS", "3600"))
+WORKSPACE_USAGE_RECONCILE_BATCH_SIZE = int(os.getenv("WORKSPACE_USAGE_RECONCILE_BATCH_SIZE", "500"))
+
+# Upper bound on the number of files in one ZIP export.
+EXPORT_MAX_FILES = int(os.getenv("EXPORT_MAX_FILES", "10000"))
+
+# Blob storage. New blobs go to STORAGE_BACKEND ("local" or "s3"); files from
+# before the storage layer live flat in FILES_DIR and are read as "legacy".
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", os.path.join(FILES_DIR, "blobs"))
+# Uploads are encrypted into this directory before being handed to the backend.
+STORAGE_STAGING_DIR = os.getenv("STORAGE_STAGING_DIR", os.path.join(FILES_DIR, "staging"))
+os.makedirs(STORAGE_STAGING_DIR, exist_ok=True)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_BUCKET = os.getenv("S3_BUCKET", "acc-media")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+S3_READ_AHEAD = int(os.getenv("S3_READ_AHEAD", str(1024 * 1024)))
+# Background move of blobs onto STORAGE_BACKEND; 0 disables it.
+STORAGE_MIGRATE_INTERVAL_SECONDS = int(os.getenv("STORAGE_MIGRATE_INTERVAL_SECONDS", "0"))
+STORAGE_MIGRATE_BATCH_SIZE = int(os.getenv("STORAGE_MIGRATE_BATCH_SIZE", "100"))
+# Background reconciliation of stored content against the database (see
+# services.storage_reconcile_service); 0 disables it. Unreferenced content is
+# only deleted once it is older than the grace period.
+STORAGE_RECONCILE_INTERVAL_SECONDS = int(os.getenv("STORAGE_RECONCILE_INTERVAL_SECONDS", "0"))
+STORAGE_RECONCILE_BATCH_SIZE = int(os.getenv("STORAGE_RECONCILE_BATCH_SIZE", "1000"))
+STORAGE_RECONCILE_GRACE_SECONDS = int(os.getenv("STORAGE_RECONCILE_GRACE_SECONDS", "86400"))
+# Deleted content is queued in pending_deletions and removed by a background
+# worker every DELETION_QUEUE_INTERVAL_SECONDS (0 disables it; the queue can
+# then be drained with ``python -m services.deletion_service``). Failed
+# removals are retried with exponential backoff between the two delays.
+DELETION_QUEUE_INTERVAL_SECONDS = float(os.getenv("DELETION_QUEUE_INTERVAL_SECONDS", "5"))
+DELETION_QUEUE_BATCH_SIZE = int(os.getenv("DELETION_QUEUE_BATCH_SIZE", "500"))
+DELETION_RETRY_BASE_SECONDS = int(os.getenv("DELETION_RETRY_BASE_SECONDS", "30"))
+DELETION_RETRY_MAX_SECONDS = int(os.getenv("DELETION_RETRY_MAX_SECONDS", "3600"))
+# Unwrapped per-workspace data keys are cached in each process for this long.
+WORKSPACE_KEY_CACHE_SECONDS = float(os.getenv("WORKSPACE_KEY_CACHE_SECONDS", "300"))
+# Background re-encryption of blobs onto the newest key; 0 disables it. The
+# job reads at most KEY_ROTATION_MAX_BYTES_PER_SECOND (0 = unthrottled) so
+# it does not starve live traffic of storage I/O.
+KEY_ROTATION_INTERVAL_SECONDS = int(os.getenv("KEY_ROTATION_INTERVAL_SECONDS", "0"))
+KEY_ROTATION_BATCH_SIZE = int(os.getenv("KEY_ROTATION_BATCH_SIZE", "50"))
+KEY_ROTATION_MAX_BYTES_PER_SECOND = int(os.getenv("KEY_ROTATION_MAX_BYTES_PER_SECOND", str(8 * 1024 * 1024)))
+# Integrity scrubbing: every SCRUB_INTERVAL_SECONDS (0 disables) the next
+# SCRUB_BATCH_SIZE blobs are read back and verified against their SHA-256,
+# at no more than SCRUB_MAX_BYTES_PER_SECOND.
+SCRUB_INTERVAL_SECONDS = int(os.getenv("SCRUB_INTERVAL_SECONDS", "300"))
+SCRUB_BATCH_SIZE = int(os.getenv("SCRUB_BATCH_SIZE", "50"))
+SCRUB_MAX_BYTES_PER_SECOND = int(os.getenv("SCRUB_MAX_BYTES_PER_SECOND", str(4 * 1024 * 1024)))
+# Authenticated users are cached per token, and workspace roles per
+# (workspace, user), for the given number of seconds (0 disables a cache).
+# Changes reach other workers once their entries expire, or immediately with
+# CACHE_INVALIDATION=postgres, which broadcasts invalidations with
+# LISTEN/NOTIFY. The same broadcast drops a deleted workspace's data key and
+# decrypted content everywhere.
+PRINCIPAL_CACHE_SECONDS = float(os.getenv("PRINCIPAL_CACHE_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_ITEMS = int(os.getenv("PRINCIPAL_CACHE_MAX_ITEMS", "10000"))
+MEMBERSHIP_CACHE_SECONDS = float(os.getenv("MEMBERSHIP_CACHE_SECONDS", "60"))
+MEMBERSHIP_CACHE_MAX_ITEMS = int(os.getenv("MEMBERSHIP_CACHE_MAX_ITEMS", "50000"))
+CACHE_INVALIDATION = os.getenv("CACHE_INVALIDATION", "local")
+# GET /metrics reports per-process counters (pools, caches, key rotation,
+# scrub). It is only mounted with METRICS_ENABLED=1 and then requires
+# "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+if METRICS_ENABLED and not METRICS_TOKEN:
+    raise RuntimeError("METRICS_TOKEN is not set")
 db_url = os.getenv("DATABASE_URL")
+# Async routes use the same database through an async driver; by default the
+# URL is DATABASE_URL with the driver swapped (asyncpg/aiosqlite).
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
 algorithm = os.getenv("ALGORITHM", "HS256")
-token_expire_minutes = int(os.getenv("token_expire_minutes"))
+# Access tokens are short-lived and carry the user's workspace roles (at
+# most TOKEN_ROLE_CLAIMS_MAX of them); the list routes that trust those
+# claims see role changes within this lifetime. Clients renew them with a
+# refresh token.
+token_expire_minutes = int(os.getenv("token_expire_minutes", "15"))
+TOKEN_ROLE_CLAIMS_MAX = int(os.getenv("TOKEN_ROLE_CLAIMS_MAX", "100"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Expired and revoked refresh tokens are deleted this often (0 disables).
+REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS = int(os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS", "3600"))
@@ -0,0 +1,237 @@
+"""Process-local cache of decrypted media content.
+
+Two tiers sit in front of the storage backends:
+
+* memory: an LRU of plaintext bytes for small items, bounded by
+  MEDIA_CACHE_MAX_BYTES in total and MEDIA_CACHE_MAX_ITEM_BYTES per item;
+* disk (optional, MEDIA_CACHE_DISK_DIR): larger items re-encrypted in the
+  segmented format on local disk. Unlike the stored blob they are neither
+  compressed nor remote, so ranges are served by seeking, and nothing has to
+  be fetched from S3 or decrypted as a whole Fernet token again.
+
+Entries are keyed by an id plus a validator (the content hash), so a stale
+entry is never served even if an invalidation was missed. Each worker
+process has its own cache; ``invalidate`` only reaches the local one, which
+is fine because a media row's content never changes in place and deleted
+rows 404 before the cache is consulted. Deleting a workspace destroys its
+data key, and its entries are dropped in every worker (see
+``services.workspace_key_service``).
+"""
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterator
+
+from core.blob_crypto import BlobReader, SegmentEncryptor
+from core.config import (
+    MEDIA_CACHE_DISK_DIR,
+    MEDIA_CACHE_DISK_MAX_BYTES,
+    MEDIA_CACHE_DISK_MAX_ITEM_BYTES,
+    MEDIA_CACHE_MAX_BYTES,
+    MEDIA_CACHE_MAX_ITEM_BYTES,
+)
+
+
+class BytesReader:
+    """Reader interface (``size``/``iter_range``/``close``) over cached bytes."""
+
+    def __init__(self, data: bytes, chunk_size: int = 64 * 1024):
+        self._data = data
+        self._chunk_size = chunk_size
+        self.size = len(data)
+
+    def iter_range(self, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        stop = self.size if stop is None else min(stop, self.size)
+        view = memoryview(self._data)
+        for offset in range(start, stop, self._chunk_size):
+            yield bytes(view[offset: min(offset + self._chunk_size, stop)])
+
+    def close(self) -> None:
+        pass
+
+
+class _Tier:
+    """Byte-bounded LRU bookkeeping; values are whatever the owner stores."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[Hashable, tuple[str, int, object]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, validator: str):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != validator:
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: Hashable, validator: str, size: int, value) -> list:
+        """Insert and return the values evicted to make room (including a replaced one)."""
+        dropped = self.pop(key)
+        self.entries[key] = (validator, size, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self.entries:
+            _, (_, old_size, old_value) = self.entries.popitem(last=False)
+            self.bytes -= old_size
+            self.evictions += 1
+            dropped.append(old_value)
+        return dropped
+
+    def pop(self, key: Hashable) -> list:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return []
+        self.bytes -= entry[1]
+        return [entry[2]]
+
+    def snapshot(self) -> dict:
+        return {
+            "items": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+
+def _remove(path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ContentCache:
+    def __init__(
+        self,
+        max_bytes: int,
+        max_item_bytes: int,
+        disk_dir: str = "",
+        disk_max_bytes: int = 0,
+        disk_max_item_bytes: int = 0,
+    ):
+        self.max_item_bytes = max_item_bytes if max_bytes > 0 else 0
+        self.disk_dir = disk_dir if disk_max_bytes > 0 else ""
+        self.disk_max_item_bytes = disk_max_item_bytes if self.disk_dir else 0
+        self._memory = _Tier(max_bytes)
+        self._disk = _Tier(disk_max_bytes)
+        self._lock = threading.Lock()
+        self.misses = 0
+        self.invalidations = 0
+        if self.disk_dir:
+            # the index lives in memory, so files left by a previous process
+            # are unreachable: start from an empty directory
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_item_bytes or self.disk_max_item_bytes)
+
+    def open(self, key: Hashable, validator: str | None, open_reader: Callable[[], object]):
+        """A reader for the content of ``key``, served from the cache when possible.
+
+        ``open_reader`` opens the uncached reader; its result is cached when
+        it fits one of the tiers. Content without a validator is never cached.
+        """
+        if not self.enabled or validator is None:
+            return open_reader()
+
+        with self._lock:
+            data = self._memory.get(key, validator)
+            path = None if data is not None else self._disk.get(key, validator)
+            if data is None and path is None:
+                self.misses += 1
+        if data is not None:
+            return BytesReader(data)
+        if path is not None:
+            try:
+                return BlobReader(open(path, "rb"))
+            except FileNotFoundError:
+                # evicted between the lookup and the open
+                pass
+
+        reader = open_reader()
+        size = reader.size
+        if size <= self.max_item_bytes:
+            try:
+                data = b"".join(reader.iter_range())
+            finally:
+                reader.close()
+            with self._lock:
+                self._memory.put(key, validator, size, data)
+            return BytesReader(data)
+        if size <= self.disk_max_item_bytes:
+            try:
+                path = self._spill(reader)
+            finally:
+                reader.close()
+            with self._lock:
+                dropped = self._disk.put(key, validator, size, path)
+            for old in dropped:
+                _remove(old)
+            return BlobReader(open(path, "rb"))
+        return reader
+
+    def _spill(self, reader) -> str:
+        path = os.path.join(self.disk_dir, f"{uuid.uuid4().hex}.enc")
+        encryptor = SegmentEncryptor()
+        try:
+            with open(path, "wb") as out:
+                for chunk in reader.iter_range():
+                    out.write(encryptor.update(chunk))
+                out.write(encryptor.finalize())
+        except BaseException:
+            _remove(path)
+            raise
+        return path
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            dropped_memory = self._memory.pop(key)
+            dropped_disk = self._disk.pop(key)
+            if dropped_memory or dropped_disk:
+                self.invalidations += 1
+        for path in dropped_disk:
+            _remove(path)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key satisfies ``predicate``."""
+        dropped_disk = []
+        with self._lock:
+            keys = {key for key in (*self._memory.entries, *self._disk.entries) if predicate(key)}
+            for key in keys:
+                self._memory.pop(key)
+                dropped_disk.extend(self._disk.pop(key))
+            self.invalidations += len(keys)
+        for path in dropped_disk:
+            _remove(path)
+
+    def clear(self) -> None:
+        self.invalidate_where(lambda key: True)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits = self._memory.hits + self._disk.hits
+            lookups = hits + self.misses
+            return {
+                "memory": self._memory.snapshot(),
+                "disk": self._disk.snapshot() if self.disk_dir else None,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": hits / lookups if lookups else None,
+            }
+
+
+content_cache = ContentCache(
+    MEDIA_CACHE_MAX_BYTES,
+    MEDIA_CACHE_MAX_ITEM_BYTES,
+    MEDIA_CACHE_DISK_DIR,
+    MEDIA_CACHE_DISK_MAX_BYTES,
+    MEDIA_CACHE_DISK_MAX_ITEM_BYTES,
+)
@@ -0,0 +1,189 @@
+"""Worker pools for blocking work issued from async routes.
+
+``run_io`` runs file and storage I/O on a bounded thread pool; ``run_crypto``
+sends large encryption/decryption jobs to a process pool so they neither
+block the event loop nor hold the GIL for the whole worker; ``run_password``
+does the same for password hashing on a pool of its own, which refuses work
+(``PoolSaturated``) once its queue is full. All pools count queued and
+running jobs for the metrics endpoint.
+"""
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from core.config import (
+    CRYPTO_POOL_WORKERS,
+    CRYPTO_PROCESS_THRESHOLD,
+    IO_POOL_WORKERS,
+    PASSWORD_POOL_MAX_QUEUE,
+    PASSWORD_POOL_WORKERS,
+)
+
+T = TypeVar("T")
+
+
+class PoolSaturated(Exception):
+    """Raised by ``submit`` when a pool's queue is at its limit."""
+
+
+class InstrumentedPool:
+    """Wraps an executor and tracks its queue depth."""
+
+    def __init__(self, name: str, factory: Callable[[], Executor], workers: int, max_queued: int = 0):
+        self.name = name
+        self.workers = workers
+        # jobs allowed to wait for a worker (0: unbounded)
+        self.queue_limit = max_queued
+        self._factory = factory
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_queued = 0
+
+    @property
+    def executor(self) -> Executor:
+        # created lazily so importing the module never forks or spawns
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory()
+            return self._executor
+
+    def _started(self) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+
+    def _finished(self, started_on_submit: bool, future: Future) -> None:
+        with self._lock:
+            if future.cancelled() and not started_on_submit:
+                # cancelled before a worker picked it up
+                self.queued -= 1
+                return
+            self.active -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> Future:
+        with self._lock:
+            # a process job counts as active once handed over, so the queue
+            # limit applies to active jobs beyond the worker count as well
+            waiting = self.queued + max(0, self.active - self.workers)
+            if self.queue_limit and waiting >= self.queue_limit:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool is saturated")
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        in_process = isinstance(self.executor, ProcessPoolExecutor)
+        if in_process:
+            # the worker process cannot call back into this one, so a process
+            # job counts as active as soon as it is handed over
+            self._started()
+            future = self.executor.submit(fn, *args)
+        else:
+            future = self.executor.submit(self._run, fn, *args)
+        future.add_done_callback(functools.partial(self._finished, in_process))
+        return future
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        self._started()
+        return fn(*args)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "max_queued": self.max_queued,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+io_pool = InstrumentedPool(
+    "io",
+    lambda: ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix="io"),
+    IO_POOL_WORKERS,
+)
+crypto_pool = InstrumentedPool(
+    "crypto",
+    lambda: ProcessPoolExecutor(
+        max_workers=CRYPTO_POOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    ),
+    CRYPTO_POOL_WORKERS,
+)
+
+password_pool = InstrumentedPool(
+    "password",
+    lambda: ProcessPoolExecutor(
+        max_workers=PASSWORD_POOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    ),
+    PASSWORD_POOL_WORKERS,
+    max_queued=PASSWORD_POOL_MAX_QUEUE,
+)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking I/O on the I/O thread pool."""
+    if kwargs:
+        fn = functools.partial(fn, **kwargs)
+    return await asyncio.wrap_future(io_pool.submit(fn, *args))
+
+
+def crypto_pool_for(size: int) -> InstrumentedPool:
+    return crypto_pool if size >= CRYPTO_PROCESS_THRESHOLD else io_pool
+
+
+async def run_crypto(fn: Callable[..., T], *args: Any, size: int) -> T:
+    """Run a crypto job of ``size`` payload bytes off the event loop.
+
+    ``fn`` and its arguments must be picklable: large jobs go to the process
+    pool, small ones are not worth the round trip and run on the I/O pool.
+    """
+    return await asyncio.wrap_future(crypto_pool_for(size).submit(fn, *args))
+
+
+def run_crypto_sync(fn: Callable[..., T], *args: Any, size: int) -> T:
+    """Blocking counterpart of ``run_crypto`` for code already off the loop."""
+    pool = crypto_pool_for(size)
+    if pool is io_pool:
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+
+async def run_password(fn: Callable[..., T], *args: Any) -> T:
+    """Run a password hashing job on the password pool.
+
+    Raises PoolSaturated right away when too many are already waiting.
+    """
+    return await asyncio.wrap_future(password_pool.submit(fn, *args))
+
+
+def pool_metrics() -> dict:
+    return {pool.name: pool.snapshot() for pool in (io_pool, crypto_pool, password_pool)}
+
+
+def init_executors(app) -> None:
+    @app.on_event("shutdown")
+    def shutdown_pools():
+        io_pool.shutdown()
+        crypto_pool.shutdown()
+        password_pool.shutdown()
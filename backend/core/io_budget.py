@@ -0,0 +1,23 @@
+import time
+
+
+class IOBudget:
+    """Paces a stream of bytes to at most ``rate`` per second (0 = unlimited).
+
+    Background jobs call ``consume`` after each chunk they read, which sleeps
+    whenever they get ahead of the budget, so they leave live traffic most of
+    the storage bandwidth.
+    """
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self._start = time.monotonic()
+        self._bytes = 0
+
+    def consume(self, size: int) -> None:
+        if self.rate <= 0:
+            return
+        self._bytes += size
+        ahead = self._bytes / self.rate - (time.monotonic() - self._start)
+        if ahead > 0:
+            time.sleep(ahead)
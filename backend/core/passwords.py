@@ -0,0 +1,17 @@
+"""Password hashing.
+
+bcrypt costs a few hundred milliseconds of CPU per call, so routes run these
+functions on the password pool (``core.executors.run_password``). The module
+imports nothing from the application, which keeps pool workers light.
+"""
+from passlib.context import CryptContext
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt_context.verify(plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    return bcrypt_context.hash(password)
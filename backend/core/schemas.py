@@ -7,6 +7,8 @@ class MediaResponse(BaseModel):
     workspace_id: int
     original_filename: str
     size_bytes: int
+    # bytes on disk after compression and encryption, when known
+    stored_size_bytes: int | None = None
     mime_type: str | None
     description: Optional[str]
     tags: Optional[str]
@@ -22,10 +24,45 @@ class MediaResponse(BaseModel):
 
 
 class MediaListResponse(BaseModel):
-    page: int
+    # None when paginating with a cursor
+    page: int | None = None
     page_size: int
-    total: int
+    # possibly a few seconds stale; None unless requested in cursor mode
+    total: int | None = None
     items: List[MediaResponse]
+    # pass as ``cursor`` to fetch the next page; None on the last page
+    next_cursor: str | None = None
+
+
+class TagFacet(BaseModel):
+    tag: str
+    count: int
+
+
+class MediaSearchHit(MediaResponse):
+    # relevance; only comparable within one result list
+    score: float
+
+
+class MediaSearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    items: List[MediaSearchHit]
+
+
+class BatchUploadItem(BaseModel):
+    filename: str
+    # per-file outcome: 201 created, 409 name taken, 400 empty file, ...
+    status_code: int
+    media: MediaResponse | None = None
+    detail: str | None = None
+
+
+class BatchUploadResponse(BaseModel):
+    created: int
+    failed: int
+    items: List[BatchUploadItem]
 
 
 class UpdateMediaRequest(BaseModel):
@@ -34,6 +71,32 @@ class UpdateMediaRequest(BaseModel):
     tags: Optional[List[str]] = None
 
 
+class CreateUploadSessionRequest(BaseModel):
+    filename: str
+    mime_type: str | None = None
+    # total size in bytes, when known; completion then requires all of it
+    size: int | None = None
+    description: str | None = None
+    tags: str | None = None
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    workspace_id: int
+    original_filename: str
+    mime_type: str | None
+    total_size: int | None
+    received_bytes: int
+    chunk_count: int
+    # set once the upload has been completed
+    media_id: int | None = None
+    created_at: datetime
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class MediaBase(BaseModel):
     id: int
     workspace_id: int
@@ -79,6 +142,12 @@ class CreateUserRequest(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+    # access token lifetime in seconds
+    expires_in: int | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class RenameFileRequest(BaseModel):
     new_filename: str
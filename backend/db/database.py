@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # from core.config import settings
@@ -9,6 +11,37 @@ engine = create_engine(str(db_url), future=True,echo=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+# Async counterpart for routes ported to ``async def`` (see ``get_async_db``).
+# Same database, async drivers: asyncpg for PostgreSQL, aiosqlite for SQLite.
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+_async_engine = None
+_async_sessionmaker = None
+
+
+def async_db_url() -> str:
+    if config.ASYNC_DATABASE_URL:
+        return config.ASYNC_DATABASE_URL
+    url = make_url(str(db_url))
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver known for {url.get_backend_name()}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """The async engine, created on first use so sync-only code never needs the async driver."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        url = async_db_url()
+        options = {}
+        if not url.startswith("sqlite"):
+            options = {"pool_size": config.ASYNC_DB_POOL_SIZE, "max_overflow": config.ASYNC_DB_MAX_OVERFLOW}
+        _async_engine = create_async_engine(url, pool_pre_ping=True, **options)
+        # nothing is reloaded implicitly after commit: lazy loads cannot happen
+        # outside an await in async code
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
 
 def init_db(app):
     @app.on_event("startup")
@@ -22,6 +55,11 @@ def init_db(app):
             print("DB connection failed:", exc)
             raise
 
+    @app.on_event("shutdown")
+    async def dispose_async_engine():
+        if _async_engine is not None:
+            await _async_engine.dispose()
+
 
 def get_db():
     db = SessionLocal()
@@ -29,3 +67,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _async_sessionmaker() as session:
+        yield session
+
+
+def dialect_insert(db):
+    """The ``insert`` construct with ON CONFLICT support for the session's database."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"INSERT ... ON CONFLICT is not supported on {dialect}")
+    return insert
@@ -1,57 +1,80 @@
 from typing import Callable, List
 
 from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db.database import get_db
-from routers.auth import get_current_user
-from models.workspace import WorkspaceMember
+from db.database import get_async_db, get_db
+from routers.auth import TokenClaims, get_current_user, get_token_claims
 from models.user import User
+from services.permission_service import (
+    Membership,
+    normalize_role,
+    resolve_membership,
+    resolve_membership_async,
+)
+from services.token_service import claimed_role
 
 
 def require_workspace_member(
     workspace_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-) -> WorkspaceMember:
+) -> Membership:
     """Ensure the current user is a member of the workspace.
 
-    Returns the WorkspaceMember row for downstream use.
+    Returns the resolved Membership (with the normalised role) for downstream use.
     """
-    member = (
-        db.query(WorkspaceMember)
-        .filter_by(workspace_id=workspace_id, user_id=current_user.id)
-        .first()
-    )
+    member = resolve_membership(db, workspace_id, current_user.id)
     if not member:
         raise HTTPException(status_code=403, detail="Not a workspace member")
     return member
 
 
+async def require_workspace_member_async(
+    workspace_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    claims: TokenClaims = Depends(get_token_claims),
+) -> Membership:
+    """``require_workspace_member`` for async routes; never blocks a thread."""
+    member = await resolve_membership_async(db, workspace_id, claims.user_id)
+    if not member:
+        raise HTTPException(status_code=403, detail="Not a workspace member")
+    return member
+
+
+async def require_workspace_reader(
+    workspace_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    claims: TokenClaims = Depends(get_token_claims),
+) -> Membership:
+    """Membership check for the hot list routes (media, documents, comments).
+
+    The role claimed by the access token is trusted without touching the
+    database, so a removal only takes effect once the token is renewed. Only
+    read-only routes may use this; everything else resolves the role with
+    ``require_workspace_member``.
+    """
+    role = claimed_role(claims.roles, workspace_id)
+    if role is not None:
+        return Membership(workspace_id=workspace_id, user_id=claims.user_id, role=role)
+    return await require_workspace_member_async(workspace_id, db, claims)
+
+
 def require_workspace_role(allowed_roles: List[str]) -> Callable:
     """Factory that returns a dependency verifying the member role is allowed.
 
     Usage in routes:
         Depends(require_workspace_role(["OWNER","ADMIN","EDITOR"]))
     """
+    # Roles are compared lowercase so DB-stored values (e.g. "owner") match
+    # allowed roles regardless of case.
+    normalized_allowed = frozenset(normalize_role(r) for r in allowed_roles)
 
     def _dependency(
-        workspace_id: int,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user),
-    ) -> WorkspaceMember:
-        member = (
-            db.query(WorkspaceMember)
-            .filter_by(workspace_id=workspace_id, user_id=current_user.id)
-            .first()
-        )
-        if not member:
-            raise HTTPException(status_code=403, detail="Not a workspace member")
-        # Normalize role strings to lowercase so DB-stored values (e.g. "owner")
-        # compare correctly against allowed roles regardless of case.
-        normalized_allowed = {r.strip().lower() for r in allowed_roles}
-        member_role = (member.role or "").strip().lower()
-        if member_role not in normalized_allowed:
+        member: Membership = Depends(require_workspace_member),
+    ) -> Membership:
+        if member.role not in normalized_allowed:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return member
 
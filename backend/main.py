@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Depends
 import os
 from fastapi.middleware.cors import CORSMiddleware
-from models import user, media,team,team_member
+from models import user, media,team,team_member, blob, upload_session, media_tag, workspace_usage, pending_deletion, integrity, refresh_token
 from db.database import engine
 from sqlalchemy.orm import Session
 from typing import Annotated
@@ -10,9 +10,35 @@ from routers import files, auth
 from routers import workspaces
 from routers import documents, comments
 from routers import users,teams
+from routers import metrics
+from routers import uploads
+from core.background import run_periodically
+from core.executors import init_executors
+from core.config import (
+    DELETION_QUEUE_INTERVAL_SECONDS,
+    KEY_ROTATION_INTERVAL_SECONDS,
+    METRICS_ENABLED,
+    REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS,
+    SCRUB_INTERVAL_SECONDS,
+    STORAGE_MIGRATE_INTERVAL_SECONDS,
+    STORAGE_RECONCILE_INTERVAL_SECONDS,
+    UPLOAD_SESSION_SWEEP_INTERVAL_SECONDS,
+    WORKSPACE_USAGE_RECONCILE_INTERVAL_SECONDS,
+)
+from services.deletion_service import run_deletion_worker
+from services.invalidation_service import init_cache_invalidation
+from services.key_rotation_service import run_key_rotation
+from services.scrub_service import run_scrub
+from services.storage_migration_service import run_storage_migration
+from services.storage_reconcile_service import run_storage_reconcile
+from services.token_service import run_refresh_token_sweep
+from services.upload_session_service import run_upload_session_sweep
+from services.usage_service import run_usage_reconciliation
 
 app = FastAPI()
 init_db(app)
+init_executors(app)
+init_cache_invalidation(app)
 # Configure CORS. Set environment variable `ALLOWED_ORIGINS` to a comma-separated
 # list of allowed origins (e.g. "https://example.com,https://app.example.com").
 # If not set, defaults to allow all origins for development convenience.
@@ -31,6 +57,7 @@ app.add_middleware(
 )
 user.Base.metadata.create_all(bind=engine)
 media.Base.metadata.create_all(bind=engine)
+app.include_router(uploads.router)
 app.include_router(files.router)
 app.include_router(auth.router)
 app.include_router(workspaces.router)
@@ -38,6 +65,16 @@ app.include_router(documents.router)
 app.include_router(comments.router)
 app.include_router(users.router)
 app.include_router(teams.router)
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
+run_periodically(app, "deletion-queue", DELETION_QUEUE_INTERVAL_SECONDS, run_deletion_worker)
+run_periodically(app, "storage-migration", STORAGE_MIGRATE_INTERVAL_SECONDS, run_storage_migration)
+run_periodically(app, "key-rotation", KEY_ROTATION_INTERVAL_SECONDS, run_key_rotation)
+run_periodically(app, "storage-reconcile", STORAGE_RECONCILE_INTERVAL_SECONDS, run_storage_reconcile)
+run_periodically(app, "integrity-scrub", SCRUB_INTERVAL_SECONDS, run_scrub)
+run_periodically(app, "refresh-token-sweep", REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS, run_refresh_token_sweep)
+run_periodically(app, "upload-session-sweep", UPLOAD_SESSION_SWEEP_INTERVAL_SECONDS, run_upload_session_sweep)
+run_periodically(app, "usage-reconciliation", WORKSPACE_USAGE_RECONCILE_INTERVAL_SECONDS, run_usage_reconciliation)
 db_dependency = Annotated[Session, Depends(get_db)]
 
 
@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, BigInteger, DateTime, func, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from db.database import Base
+
+
+class Blob(Base):
+    """A unique piece of stored content, shared by every Media row of a workspace with the same plaintext.
+
+    ``ref_count`` tracks how many Media rows point at the blob; the stored file
+    is removed only when the last reference goes away.
+    """
+    __tablename__ = "blobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    # Workspace whose data key seals the content. Deliberately not a foreign
+    # key: the rows outlive a deleted workspace until its files are purged.
+    # None for blobs from before per-workspace keys, sealed with the master
+    # key and possibly shared across workspaces.
+    workspace_id: Mapped[int | None] = mapped_column(Integer)
+
+    # SHA-256 of the plaintext; with the workspace, the deduplication key.
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    # Storage backend name (see storage.get_backend) and the key inside it.
+    backend: Mapped[str] = mapped_column(String(20), nullable=False)
+    storage_key: Mapped[str] = mapped_column(String(500), nullable=False)
+    # Logical (plaintext) size, and the size actually stored after
+    # compression and encryption (unknown for blobs from before compression).
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    stored_size: Mapped[int | None] = mapped_column(BigInteger)
+
+    # Compression applied before encryption (see core.codecs).
+    codec: Mapped[str] = mapped_column(String(20), nullable=False, default="identity")
+
+    # Master key the content is encrypted with (core.blob_crypto.key_id);
+    # None for blobs written before keys were tracked.
+    key_id: Mapped[str | None] = mapped_column(String(16), index=True)
+
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    media = relationship("Media", back_populates="blob")
+
+    __table_args__ = (
+        UniqueConstraint("backend", "storage_key", name="uq_blobs_backend_key"),
+        UniqueConstraint("workspace_id", "sha256", name="uq_blobs_workspace_sha256"),
+    )
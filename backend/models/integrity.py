@@ -0,0 +1,54 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, BigInteger, DateTime, ForeignKey, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.database import Base
+
+
+class BlobIntegrityFailure(Base):
+    """A blob whose stored content failed verification by the scrub job.
+
+    One row per blob, updated on every failed check and removed once the blob
+    verifies again (restored from backup, say) or is deleted.
+    """
+    __tablename__ = "blob_integrity_failures"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    blob_id: Mapped[int] = mapped_column(
+        ForeignKey("blobs.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+    )
+
+    # missing, decrypt (authentication failed), decode (decompression
+    # failed), checksum or size
+    kind: Mapped[str] = mapped_column(String(20), nullable=False, index=True)
+    detail: Mapped[str | None] = mapped_column(Text)
+
+    first_detected_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+    last_checked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class ScrubState(Base):
+    """Persistent progress of the scrub job, so a restart resumes mid-pass.
+
+    ``cursor`` is the last blob id verified in the current pass. Only the
+    worker holding an unexpired lease advances it.
+    """
+    __tablename__ = "scrub_state"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    cursor: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    checked_in_pass: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    pass_started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_pass_completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    passes_completed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -2,9 +2,11 @@ from datetime import datetime
 from sqlalchemy import (
     String,
     Integer,
+    BigInteger,
     DateTime,
     ForeignKey,
     func,
+    Index,
     UniqueConstraint,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -35,20 +37,23 @@ class Media(Base):
         nullable=False,
     )
 
-    stored_filename: Mapped[str] = mapped_column(
-        String(255),
-        unique=True,
-        nullable=False,
+    # Content-addressed blob backing this row. Rows uploaded before blobs
+    # existed have no blob and own their stored file outright.
+    blob_id: Mapped[int | None] = mapped_column(
+        ForeignKey("blobs.id", ondelete="RESTRICT"),
+        nullable=True,
+        index=True,
     )
 
-    stored_path: Mapped[str] = mapped_column(
-        String(500),
-        unique=True,
-        nullable=False,
-    )
+    # Location of files written before the blob store (flat in FILES_DIR).
+    # Rows backed by a blob leave these empty and are read through the blob.
+    stored_filename: Mapped[str | None] = mapped_column(String(255))
+    stored_path: Mapped[str | None] = mapped_column(String(500))
 
     mime_type: Mapped[str | None] = mapped_column(String(100))
-    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # SHA-256 of the plaintext, computed while the upload is streamed to disk.
+    content_sha256: Mapped[str | None] = mapped_column(String(64))
 
     description: Mapped[str | None] = mapped_column(Text)
     tags: Mapped[str | None] = mapped_column(String(255))
@@ -61,6 +66,7 @@ class Media(Base):
 
     workspace = relationship("Workspace", back_populates="media")
     uploader = relationship("User", back_populates="uploaded_media")
+    blob = relationship("Blob", back_populates="media")
 
     __table_args__ = (
         UniqueConstraint(
@@ -68,8 +74,14 @@ class Media(Base):
             "original_filename",
             name="uq_workspace_file_name",
         ),
+        # keyset pagination of a workspace's media by (created_at, id)
+        Index("ix_media_workspace_created_id", "workspace_id", "created_at", "id"),
     )
 
+    @property
+    def stored_size_bytes(self) -> int | None:
+        return self.blob.stored_size if self.blob is not None else None
+
     @property
     def tags_list(self) -> list[str]:
         return self.tags.split(",") if self.tags else []
@@ -0,0 +1,34 @@
+from sqlalchemy import String, Integer, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.database import Base
+
+
+class MediaTag(Base):
+    """One tag on one media row (normalized form of ``Media.tags``).
+
+    ``workspace_id`` is copied from the media row so tag filters and facets
+    stay within one index range per workspace.
+    """
+    __tablename__ = "media_tags"
+
+    media_id: Mapped[int] = mapped_column(ForeignKey("media.id", ondelete="CASCADE"), primary_key=True)
+    tag: Mapped[str] = mapped_column(String(100), primary_key=True)
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_media_tags_workspace_tag", "workspace_id", "tag", "media_id"),
+    )
+
+
+class WorkspaceTagCount(Base):
+    """Number of media carrying each tag in a workspace.
+
+    Maintained incrementally by services.tag_service in the same transaction
+    as the tag changes, so facet queries never scan media_tags.
+    """
+    __tablename__ = "workspace_tag_counts"
+
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), primary_key=True)
+    tag: Mapped[str] = mapped_column(String(100), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
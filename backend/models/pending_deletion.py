@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.database import Base
+
+
+class PendingDeletion(Base):
+    """Stored content waiting to be removed by the deletion worker.
+
+    Rows are written in the same transaction that drops the last reference to
+    the content, so a rolled-back delete leaves the content in place and a
+    committed one can never leak it. See services.deletion_service.
+    """
+    __tablename__ = "pending_deletions"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    # Storage backend name (see storage.get_backend) and the key inside it.
+    backend: Mapped[str] = mapped_column(String(20), nullable=False)
+    storage_key: Mapped[str] = mapped_column(String(500), nullable=False)
+
+    # Failed attempts so far; retries back off until ``next_attempt_at``.
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+        index=True,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+class PendingWorkspacePurge(Base):
+    """A deleted workspace whose blobs still have to be removed from storage.
+
+    Written in the transaction that deletes the workspace; the deletion worker
+    queues the workspace's blobs for removal in batches and drops the row once
+    none are left.
+    """
+    __tablename__ = "pending_workspace_purges"
+
+    workspace_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
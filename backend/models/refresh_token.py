@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy import ForeignKey, String, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.database import Base
+
+
+class RefreshToken(Base):
+    """A refresh token, stored by hash only.
+
+    Every use replaces the token with a new one of the same family; a token
+    presented again after it was replaced means it leaked, and the whole
+    family is revoked. Revoked and expired rows form the revocation list
+    until the sweep removes them. See services.token_service.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    # SHA-256 of the token handed to the client
+    token_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    # shared by a login's token and all tokens rotated from it
+    family_id: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
+
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
@@ -0,0 +1,39 @@
+from datetime import datetime
+from sqlalchemy import String, BigInteger, Integer, DateTime, ForeignKey, func, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.database import Base
+
+
+class UploadSession(Base):
+    """Server-side state of a resumable upload.
+
+    Chunks are appended strictly in order; ``received_bytes`` is the offset the
+    next chunk must start at. The spooled chunks live on disk (see
+    services.upload_session_service) until the session is finalized into a
+    Media row, aborted, or swept after ``expires_at``. A finalized session is
+    kept (with ``media_id``) until it expires, so repeating the completion
+    returns the same media.
+    """
+    __tablename__ = "upload_sessions"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_by: Mapped[int | None] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+
+    original_filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    mime_type: Mapped[str | None] = mapped_column(String(100))
+    description: Mapped[str | None] = mapped_column(Text)
+    tags: Mapped[str | None] = mapped_column(String(255))
+
+    # Declared total size, when the client knows it up front.
+    total_size: Mapped[int | None] = mapped_column(BigInteger)
+    received_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    chunk_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Set while one request assembles the upload; other completions wait it out.
+    completing_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    media_id: Mapped[int | None] = mapped_column(ForeignKey("media.id", ondelete="CASCADE"), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import ForeignKey, DateTime, func, String, UniqueConstraint
+from sqlalchemy import ForeignKey, DateTime, func, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from db.database import Base
 from enum import Enum
@@ -25,6 +25,12 @@ class Workspace(Base):
         nullable=False,
     )
 
+    # Data key sealing this workspace's blobs, wrapped by the master key ring
+    # (see services.workspace_key_service), and the id of the master key that
+    # wrapped it. Deleting the row crypto-shreds the workspace's content.
+    data_key: Mapped[str | None] = mapped_column(Text)
+    data_key_master_id: Mapped[str | None] = mapped_column(String(16))
+
 
     members = relationship(
         "WorkspaceMember",
@@ -36,6 +42,8 @@ class Workspace(Base):
         "Media",
         back_populates="workspace",
         cascade="all, delete-orphan",
+        # left to the database FK cascade rather than loaded and deleted row by row
+        passive_deletes=True,
     )
 
 
@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.database import Base
+
+
+class WorkspaceUsage(Base):
+    """Running totals of the media stored in a workspace, and its quota.
+
+    ``file_count``/``bytes_used`` are adjusted in the same transaction as every
+    media insert and delete (services.usage_service) and periodically
+    reconciled against the media table. ``bytes_used`` counts logical sizes,
+    i.e. ``SUM(media.size_bytes)``, regardless of deduplication. A NULL quota
+    falls back to the configured default.
+    """
+    __tablename__ = "workspace_usage"
+
+    workspace_id: Mapped[int] = mapped_column(ForeignKey("workspaces.id", ondelete="CASCADE"), primary_key=True)
+    file_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    bytes_used: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    quota_bytes: Mapped[int | None] = mapped_column(BigInteger)
+    quota_files: Mapped[int | None] = mapped_column(BigInteger)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
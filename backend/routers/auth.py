@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Annotated
 
@@ -6,10 +7,11 @@ from jwt import PyJWTError
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
-from core.schemas import CreateUserRequest, Token
+from core.executors import PoolSaturated, run_io, run_password
+from core.passwords import get_password_hash, verify_password
+from core.schemas import CreateUserRequest, RefreshTokenRequest, Token
 from core.config import (
     SECRET_KEY,
     algorithm as ALGORITHM,
@@ -17,6 +19,13 @@ from core.config import (
 )
 from db.database import get_db
 from models.user import User
+from services import principal_cache_service
+from services.token_service import (
+    issue_refresh_token,
+    revoke_refresh_token,
+    role_claims,
+    rotate_refresh_token,
+)
 
 # --------------------------------------------------
 # CONFIG
@@ -24,7 +33,6 @@ from models.user import User
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 db_dependency = Annotated[Session, Depends(get_db)]
@@ -34,12 +42,16 @@ db_dependency = Annotated[Session, Depends(get_db)]
 # --------------------------------------------------
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return bcrypt_context.hash(password)
+async def run_password_job(fn, *args):
+    """Run a password function on the password pool; 503 when it is saturated."""
+    try:
+        return await run_password(fn, *args)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
 
 
 # --------------------------------------------------
@@ -47,11 +59,11 @@ def get_password_hash(password: str) -> str:
 # --------------------------------------------------
 
 
-def authenticate_user(db: Session, username: str, password: str) -> User | None:
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(db: Session, username: str, password: str) -> User | None:
+    user = await run_io(db.query(User).filter(User.username == username).first)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await run_password_job(verify_password, password, user.hashed_password):
         return None
     return user
 
@@ -60,6 +72,7 @@ def create_access_token(
     username: str,
     user_id: int,
     expires_delta: timedelta,
+    roles: dict[str, str] | None = None,
 ) -> str:
     now = datetime.utcnow()
     expire = now + expires_delta
@@ -70,6 +83,9 @@ def create_access_token(
         "iat": now,
         "exp": expire,
     }
+    if roles is not None:
+        # workspace id -> role code, see services.token_service.role_claims
+        payload["wr"] = roles
 
     token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     return token
@@ -81,17 +97,17 @@ def create_access_token(
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     create_user_request: CreateUserRequest,
     db: db_dependency,
 ):
-    existing_user = (
+    existing_user = await run_io(
         db.query(User)
         .filter(
             (User.username == create_user_request.username)
             | (User.email == create_user_request.email)
         )
-        .first()
+        .first
     )
 
     if existing_user:
@@ -103,22 +119,21 @@ def create_user(
     user = User(
         username=create_user_request.username,
         email=create_user_request.email,
-        hashed_password=get_password_hash(create_user_request.password),
+        hashed_password=await run_password_job(get_password_hash, create_user_request.password),
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await run_io(db.commit)
 
     return {"message": "User created successfully"}
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: db_dependency,
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(
@@ -127,27 +142,62 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    return await run_io(issue_tokens, db, user)
+
+
+def issue_tokens(db: Session, user: User, refresh_token: str | None = None) -> dict:
+    """Access token with the user's current role claims, plus a refresh token.
+
+    Without ``refresh_token`` a new token family is started (login).
+    """
+    if refresh_token is None:
+        refresh_token = issue_refresh_token(db, user.id)
+        db.commit()
+
     access_token = create_access_token(
         username=user.username,
         user_id=user.id,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        roles=role_claims(db, user.id),
     )
 
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
     }
 
 
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(
+    request: RefreshTokenRequest,
+    db: db_dependency,
+):
+    user_id, refresh_token = rotate_refresh_token(db, request.refresh_token)
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+    return issue_tokens(db, user, refresh_token)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    request: RefreshTokenRequest,
+    db: db_dependency,
+):
+    revoke_refresh_token(db, request.refresh_token)
+
+
 # --------------------------------------------------
 # DEPENDENCY
 # --------------------------------------------------
 
 
-def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: db_dependency,
-) -> User:
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(
             token,
@@ -176,6 +226,36 @@ def get_current_user(
             detail="Could not validate credentials",
         )
 
+    return payload
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    """What an access token asserts, trusted without a database lookup."""
+
+    user_id: int
+    username: str
+    # workspace id -> role code; None for tokens issued without role claims
+    roles: dict | None
+
+
+async def get_token_claims(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenClaims:
+    # no I/O: resolved on the event loop rather than in the thread pool
+    payload = decode_access_token(token)
+    return TokenClaims(user_id=payload["user_id"], username=payload["sub"], roles=payload.get("wr"))
+
+
+def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: db_dependency,
+) -> User:
+    cached = principal_cache_service.lookup(db, token)
+    if cached is not None:
+        return cached
+    generation = principal_cache_service.generation()
+
+    payload = decode_access_token(token)
+    user_id = payload["user_id"]
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(
@@ -183,4 +263,5 @@ def get_current_user(
             detail="User not found",
         )
 
+    principal_cache_service.store(token, user, payload["exp"], generation)
     return user
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db.database import get_db
+from db.database import get_async_db, get_db
 from routers.auth import get_current_user
 from models.user import User
 from models.comment import Comment
-from dependencies.permissions import require_workspace_member, require_workspace_role
+from dependencies.permissions import require_workspace_member, require_workspace_reader, require_workspace_role
 from core.schemas import CommentCreateRequest, CommentResponse
 import re
 
@@ -66,18 +68,17 @@ def create_comment(
 
 
 @router.get("", response_model=list[CommentResponse])
-def list_comments(
+async def list_comments(
     workspace_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _member = Depends(require_workspace_member),
+    db: AsyncSession = Depends(get_async_db),
+    _member = Depends(require_workspace_reader),
 ):
-    rows = db.query(Comment).filter_by(workspace_id=workspace_id).all()
+    rows = (await db.scalars(select(Comment).filter_by(workspace_id=workspace_id))).all()
     # bulk-load user info to avoid N+1 queries
     author_ids = {c.author_id for c in rows if c.author_id}
     users = {}
     if author_ids:
-        urows = db.query(User).filter(User.id.in_(list(author_ids))).all()
+        urows = (await db.scalars(select(User).filter(User.id.in_(list(author_ids))))).all()
         users = {u.id: u for u in urows}
 
     result = []
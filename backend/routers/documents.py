@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db.database import get_db
+from db.database import get_async_db, get_db
 from routers.auth import get_current_user
 from models.user import User
 from models.document import Document
-from dependencies.permissions import require_workspace_member, require_workspace_role
+from dependencies.permissions import require_workspace_member_async, require_workspace_reader, require_workspace_role
 from core.schemas import DocumentCreateRequest, DocumentResponse
 from models.media import Media
 
@@ -44,25 +46,23 @@ def create_document(
 
 
 @router.get("", response_model=list[DocumentResponse])
-def list_documents(
+async def list_documents(
     workspace_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _member = Depends(require_workspace_member),
+    db: AsyncSession = Depends(get_async_db),
+    _member = Depends(require_workspace_reader),
 ):
-    rows = db.query(Document).filter_by(workspace_id=workspace_id).all()
+    rows = (await db.scalars(select(Document).filter_by(workspace_id=workspace_id))).all()
     return rows
 
 
 @router.get("/{doc_id}", response_model=DocumentResponse)
-def get_document(
+async def get_document(
     workspace_id: int,
     doc_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _member = Depends(require_workspace_member),
+    db: AsyncSession = Depends(get_async_db),
+    _member = Depends(require_workspace_member_async),
 ):
-    doc = db.query(Document).filter_by(workspace_id=workspace_id, id=doc_id).first()
+    doc = await db.scalar(select(Document).filter_by(workspace_id=workspace_id, id=doc_id))
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
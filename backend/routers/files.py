@@ -6,25 +6,55 @@ from fastapi import (
     Depends,
     Query,
     Form,
+    Header,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import Optional
-from io import BytesIO
-import os
-import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import re
+import base64
+import json
 
-from fastapi.responses import StreamingResponse
-from sqlalchemy import asc, desc
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import asc, desc, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.database import get_db
+from db.database import get_async_db, get_db
 from routers.auth import get_current_user
 from models.user import User
 from models.media import Media
-from dependencies.permissions import require_workspace_member, require_workspace_role
+from dependencies.permissions import (
+    require_workspace_member,
+    require_workspace_member_async,
+    require_workspace_reader,
+    require_workspace_role,
+)
 
-from core.config import fernet, FILES_DIR
+from services.media_service import (
+    store_upload,
+    store_uploads,
+    create_media,
+    create_media_batch,
+    open_cached_media_reader,
+    invalidate_media_cache,
+    invalidate_media_count,
+    count_media_async,
+    iter_media_content,
+)
+from core.executors import run_io
+from core.config import BATCH_UPLOAD_MAX_FILES, EXPORT_MAX_FILES
+from core.cache_control import cache_control_for
+from services.export_service import iter_zip
+from services.search_service import search_media
+from services.tag_service import filter_by_tags, normalize_tags, set_media_tags, tag_facets
+from services.usage_service import check_quota_headroom
+from services.blob_service import remove_media
 from core.schemas import (
+    BatchUploadResponse,
     MediaListResponse,
+    MediaSearchResponse,
+    TagFacet,
     MediaResponse,
     UpdateMediaRequest,
 )
@@ -48,26 +78,123 @@ def get_media_or_404(
     return media
 
 
-# ======================================================
-# Routes
-# ======================================================
-
-@router.get("/", response_model=MediaListResponse)
-def list_media(
+def media_etag(media: Media) -> str | None:
+    """Strong validator derived from the plaintext hash (absent on legacy rows)."""
+    return f'"{media.content_sha256}"' if media.content_sha256 else None
+
+
+def _media_modified_at(media: Media) -> datetime:
+    # Stored content is immutable, so the upload time is its modification time.
+    created = media.created_at
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return created.astimezone(timezone.utc)
+
+
+def media_last_modified(media: Media) -> str:
+    return format_datetime(_media_modified_at(media), usegmt=True)
+
+
+def not_modified(media: Media, etag: str | None, if_none_match: str | None, if_modified_since: str | None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (RFC 9110 section 13.2.2).
+
+    If-None-Match uses weak comparison and, when present, makes the server
+    ignore If-Modified-Since.
+    """
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        if etag is None:
+            return False
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in candidates
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates have one-second resolution
+        return _media_modified_at(media).replace(microsecond=0) <= since
+    return False
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into a half-open ``(start, stop)`` pair.
+
+    Returns None when the whole representation should be sent instead
+    (no header, malformed or multi-range requests, which RFC 9110 lets us
+    ignore). Raises 416 when the range lies outside the content.
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+
+    if not m.group(1):
+        # suffix range: the last N bytes
+        length = int(m.group(2))
+        if length == 0:
+            start = size
+        else:
+            start = max(size - length, 0)
+        stop = size
+    else:
+        start = int(m.group(1))
+        stop = min(int(m.group(2)) + 1, size) if m.group(2) else size
+        if m.group(2) and int(m.group(2)) < start:
+            return None
+
+    if start >= size or start >= stop:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, stop
+
+
+def encode_cursor(media: Media) -> str:
+    """Opaque keyset position after ``media`` in (created_at, id) order."""
+    raw = json.dumps([media.created_at.isoformat(), media.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, media_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(media_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def if_range_matches(if_range: str | None, etag: str | None, last_modified: str) -> bool:
+    """Whether a ranged request may be honoured given its If-Range validator."""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return etag is not None and if_range == etag
+    # weak validators never match; anything else is an HTTP-date
+    return not if_range.startswith("W/") and if_range == last_modified
+
+
+def _media_filters(
+    query,
     workspace_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _member: User = Depends(require_workspace_member),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(10, ge=1, le=100),
-    filename: Optional[str] = Query(None),
-    # `type` is optional; when provided we perform a simple mime-type prefix filter.
-    type: Optional[str] = Query(None),
-    sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    filename: str | None,
+    type: str | None,
+    tags: list[str] | None,
+    tag_match: str,
 ):
-    # membership validated by dependency
-
-    query = db.query(Media).filter(Media.workspace_id == workspace_id)
+    # works on ORM queries and select() statements alike
+    query = query.options(selectinload(Media.blob)).filter(Media.workspace_id == workspace_id)
 
     if filename:
         query = query.filter(Media.original_filename.ilike(f"%{filename}%"))
@@ -80,20 +207,143 @@ def list_media(
         if t in allowed_prefixes:
             query = query.filter(Media.mime_type.like(f"{t}/%"))
 
-    order = asc(Media.created_at) if sort_order == "asc" else desc(Media.created_at)
-    query = query.order_by(order)
+    if tags:
+        query = filter_by_tags(query, workspace_id, tags, tag_match)
+
+    return query
+
+
+def filter_media_query(
+    db: Session,
+    workspace_id: int,
+    filename: str | None,
+    type: str | None,
+    tags: list[str] | None = None,
+    tag_match: str = "all",
+):
+    """Media of a workspace narrowed by the ``list_media`` filters."""
+    return _media_filters(db.query(Media), workspace_id, filename, type, tags, tag_match)
+
+
+def media_select(
+    workspace_id: int,
+    filename: str | None,
+    type: str | None,
+    tags: list[str] | None = None,
+    tag_match: str = "all",
+):
+    """``filter_media_query`` as a statement for async sessions."""
+    return _media_filters(select(Media), workspace_id, filename, type, tags, tag_match)
+
+
+async def get_media_or_404_async(db: AsyncSession, workspace_id: int, media_id: int) -> Media:
+    media = await db.scalar(
+        select(Media)
+        .options(selectinload(Media.blob))
+        .filter_by(id=media_id, workspace_id=workspace_id)
+    )
+    if not media:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return media
 
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
+
+# ======================================================
+# Routes
+# ======================================================
+
+@router.get("/", response_model=MediaListResponse)
+async def list_media(
+    workspace_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    _member = Depends(require_workspace_reader),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    filename: Optional[str] = Query(None),
+    # `type` is optional; when provided we perform a simple mime-type prefix filter.
+    type: Optional[str] = Query(None),
+    sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    # repeat `tag` to filter by several; `tag_match` says whether media
+    # must carry all of them or any one
+    tag: Optional[list[str]] = Query(None),
+    tag_match: str = Query("all", pattern="^(all|any)$"),
+    # Keyset pagination: pass an empty `cursor` for the first page, then the
+    # `next_cursor` of each response. `page` is ignored in this mode.
+    cursor: Optional[str] = Query(None),
+    # Defaults to true for page-based requests and false with a cursor.
+    include_total: Optional[bool] = Query(None),
+):
+    # membership validated by dependency
+
+    tags = normalize_tags(tag)
+    query = media_select(workspace_id, filename, type, tags, tag_match)
+    keyset = cursor is not None
+
+    total = None
+    want_total = not keyset if include_total is None else include_total
+    if want_total:
+        total = await count_media_async(db, query, (workspace_id, filename, type, tuple(tags), tag_match))
+
+    descending = sort_order != "asc"
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        position = tuple_(Media.created_at, Media.id)
+        after = tuple_(created_at, last_id)
+        query = query.filter(position < after if descending else position > after)
+
+    direction = desc if descending else asc
+    query = query.order_by(direction(Media.created_at), direction(Media.id))
+    if not keyset:
+        query = query.offset((page - 1) * page_size)
+    # one extra row tells whether there is a next page
+    rows = (await db.scalars(query.limit(page_size + 1))).all()
+    items = rows[:page_size]
 
     return {
-        "page": page,
+        "page": None if keyset else page,
         "page_size": page_size,
         "total": total,
         "items": items,
+        "next_cursor": encode_cursor(items[-1]) if len(rows) > page_size else None,
     }
 
 
+@router.get("/tags", response_model=list[TagFacet])
+def list_media_tags(
+    workspace_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_member),
+    prefix: Optional[str] = Query(None, max_length=100),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Tags used in the workspace with the number of media carrying each."""
+    return tag_facets(db, workspace_id, prefix, limit)
+
+
+@router.get("/search", response_model=MediaSearchResponse)
+def search_media_endpoint(
+    workspace_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_member),
+    page: int = Query(1, ge=1, le=50),
+    page_size: int = Query(20, ge=1, le=100),
+    type: Optional[str] = Query(None),
+):
+    """Ranked search over filename, tags and description.
+
+    Words match as prefixes; filenames also match approximately.
+    """
+    query = search_media(filter_media_query(db, workspace_id, None, type), q)
+    rows = query.offset((page - 1) * page_size).limit(page_size).all()
+    items = [
+        {**MediaResponse.model_validate(media).model_dump(), "score": float(score)}
+        for media, score in rows
+    ]
+    return {"query": q, "page": page, "page_size": page_size, "items": items}
+
+
 @router.post("/upload", response_model=MediaResponse)
 async def upload_media(
     workspace_id: int,
@@ -106,64 +356,173 @@ async def upload_media(
 ):
     # membership & role validated by dependency
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file")
-
-    encrypted = fernet.encrypt(content)
-
-    stored_filename = f"{uuid.uuid4().hex}.enc"
-    stored_path = os.path.join(FILES_DIR, stored_filename)
-
-    with open(stored_path, "wb") as f:
-        f.write(encrypted)
-
-    media = Media(
+    # reject bad tags and full workspaces before staging the upload
+    normalize_tags(tags)
+    await run_io(check_quota_headroom, db, workspace_id)
+    stored = await store_upload(file, workspace_id)
+    media = await create_media(
+        db,
+        stored,
         workspace_id=workspace_id,
         uploaded_by=current_user.id,
         original_filename=file.filename,
-        stored_filename=stored_filename,
-        stored_path=stored_path,
-        size_bytes=len(encrypted),
         mime_type=file.content_type,
         description=description,
-        tags=tags.strip() if tags else None,
+        tags=tags,
     )
-
-    db.add(media)
-    db.commit()
-    db.refresh(media)
     try:
         from services.audit_service import log_event
 
-        log_event(db, workspace_id=workspace_id, actor_id=current_user.id, action="media.upload", detail=media.original_filename)
+        await run_io(log_event, db, workspace_id=workspace_id, actor_id=current_user.id, action="media.upload", detail=media.original_filename)
     except Exception:
         pass
     return media
 
 
-@router.get("/{media_id}/download")
-def download_media(
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_media_batch(
+    workspace_id: int,
+    files: list[UploadFile] = File(...),
+    description: str | None = Form(None),
+    tags: str | None = Form(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_role(["OWNER", "ADMIN", "EDITOR"])),
+):
+    """Upload several files at once.
+
+    Files are staged concurrently, then every Media row and audit entry is
+    written in a single transaction. The result lists each file with its own
+    status code, so one name conflict does not fail the batch.
+    """
+    if len(files) > BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_UPLOAD_MAX_FILES} files per batch",
+        )
+
+    normalize_tags(tags)
+    await run_io(check_quota_headroom, db, workspace_id, files=1)
+    staged = await store_uploads(files, workspace_id)
+    items = await run_io(
+        create_media_batch,
+        db,
+        [(f.filename, f.content_type, stored) for f, stored in zip(files, staged)],
+        workspace_id=workspace_id,
+        uploaded_by=current_user.id,
+        description=description,
+        tags=tags,
+    )
+    created = sum(1 for item in items if item["status_code"] == 201)
+    return {"created": created, "failed": len(items) - created, "items": items}
+
+
+@router.get("/export")
+def export_media(
     workspace_id: int,
-    media_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     _member = Depends(require_workspace_member),
+    ids: list[int] | None = Query(None),
+    filename: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    tag: Optional[list[str]] = Query(None),
+    tag_match: str = Query("all", pattern="^(all|any)$"),
 ):
-    media = get_media_or_404(db, workspace_id, media_id)
+    """Stream a ZIP archive of the selected media.
+
+    Select files with repeated ``ids`` parameters, or with the same
+    ``filename``/``type``/``tag`` filters as ``list_media``; both narrow the set when
+    given together. Files are decrypted one at a time while the archive is
+    being sent.
+    """
+    try:
+        from services.audit_service import log_event
+
+        log_event(db, workspace_id=workspace_id, actor_id=current_user.id, action="media.export")
+    except Exception:
+        pass
+
+    query = filter_media_query(db, workspace_id, filename, type, normalize_tags(tag), tag_match)
+    if ids:
+        query = query.filter(Media.id.in_(ids))
+    items = query.order_by(Media.id).limit(EXPORT_MAX_FILES + 1).all()
+    if not items:
+        raise HTTPException(status_code=404, detail="No media matched")
+    if len(items) > EXPORT_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {EXPORT_MAX_FILES} files per export",
+        )
+
+    return StreamingResponse(
+        iter_zip(items),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="workspace-{workspace_id}-media.zip"'},
+    )
+
+
+@router.get("/{media_id}/download")
+async def download_media(
+    workspace_id: int,
+    media_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    _member = Depends(require_workspace_member_async),
+    range_header: str | None = Header(None, alias="Range"),
+    if_range: str | None = Header(None, alias="If-Range"),
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
+    if_modified_since: str | None = Header(None, alias="If-Modified-Since"),
+):
+    media = await get_media_or_404_async(db, workspace_id, media_id)
 
-    if not os.path.exists(media.stored_path):
+    etag = media_etag(media)
+    last_modified = media_last_modified(media)
+    validators = {
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control_for(media.mime_type),
+    }
+    if etag:
+        validators["ETag"] = etag
+
+    # answered from the row alone: no storage read, no decryption
+    if not_modified(media, etag, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=validators)
+
+    try:
+        reader = await run_io(open_cached_media_reader, media)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Stored file missing")
 
-    with open(media.stored_path, "rb") as f:
-        decrypted = fernet.decrypt(f.read())
+    headers = {
+        "Content-Disposition": f'attachment; filename="{media.original_filename}"',
+        "Accept-Ranges": "bytes",
+        **validators,
+    }
 
+    try:
+        byte_range = None
+        if if_range_matches(if_range, etag, last_modified):
+            byte_range = parse_range(range_header, reader.size)
+    except HTTPException:
+        reader.close()
+        raise
+
+    if byte_range is None:
+        headers["Content-Length"] = str(reader.size)
+        return StreamingResponse(
+            iter_media_content(reader),
+            media_type=media.mime_type,
+            headers=headers,
+        )
+
+    start, stop = byte_range
+    headers["Content-Range"] = f"bytes {start}-{stop - 1}/{reader.size}"
+    headers["Content-Length"] = str(stop - start)
     return StreamingResponse(
-        BytesIO(decrypted),
+        iter_media_content(reader, start, stop),
+        status_code=206,
         media_type=media.mime_type,
-        headers={
-            "Content-Disposition": f'attachment; filename="{media.original_filename}"'
-        },
+        headers=headers,
     )
 
 
@@ -183,9 +542,11 @@ def update_media(
     if payload.description is not None:
         media.description = payload.description
     if payload.tags is not None:
-        media.tags = ",".join(payload.tags)
+        set_media_tags(db, media, payload.tags)
 
     db.commit()
+    invalidate_media_cache(workspace_id, media_id)
+    invalidate_media_count(workspace_id)
     db.refresh(media)
     return media
 
@@ -200,11 +561,10 @@ def delete_media(
 ):
     media = get_media_or_404(db, workspace_id, media_id)
 
-    if os.path.exists(media.stored_path):
-        os.remove(media.stored_path)
-
-    db.delete(media)
+    remove_media(db, media)
     db.commit()
+    invalidate_media_cache(workspace_id, media_id)
+    invalidate_media_count(workspace_id)
     try:
         from services.audit_service import log_event
 
@@ -0,0 +1,35 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from core.config import METRICS_TOKEN
+from core.content_cache import content_cache
+from core.executors import pool_metrics
+from services.key_rotation_service import rotation_metrics
+from services.permission_service import membership_cache_metrics
+from services.principal_cache_service import principal_cache_metrics
+from services.scrub_service import scrub_metrics
+
+
+def require_metrics_token(authorization: str | None = Header(None)) -> None:
+    """Only scrapers holding METRICS_TOKEN may read the counters."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+# mounted by main only when METRICS_ENABLED is set
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(require_metrics_token)])
+
+
+@router.get("")
+def get_metrics():
+    """Process-local operational counters (per worker process)."""
+    return {
+        "executors": pool_metrics(),
+        "content_cache": content_cache.metrics(),
+        "key_rotation": rotation_metrics(),
+        "principal_cache": principal_cache_metrics(),
+        "membership_cache": membership_cache_metrics(),
+        "scrub": scrub_metrics(),
+    }
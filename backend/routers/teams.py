@@ -10,6 +10,7 @@ from models.user import User
 from core.schemas import CreateTeamRequest, TeamResponse, TeamMemberResponse
 from pydantic import BaseModel
 from core.schemas import MemberResponse
+from services.permission_service import member_role
 from services.team_service import require_team_member
 class CreateTeamRequest(BaseModel):
     name: str
@@ -87,16 +88,9 @@ def add_workspace_to_team(
         raise HTTPException(status_code=404, detail="Team not found")
 
     # permission check AGAINST THE TARGET WORKSPACE
-    member = (
-        db.query(WorkspaceMember)
-        .filter_by(
-            workspace_id=workspace_id,
-            user_id=current_user.id,
-        )
-        .first()
-    )
+    role = member_role(db, workspace_id, current_user.id)
 
-    if not member or member.role not in {"owner", "admin"}:
+    if role not in {"owner", "admin"}:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     db.add(TeamWorkspace(team_id=team.id, workspace_id=workspace_id))
     db.flush()
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, Header, Request, Response
+from sqlalchemy.orm import Session
+
+from db.database import get_db
+from routers.auth import get_current_user
+from models.user import User
+from dependencies.permissions import require_workspace_role
+from core.executors import run_io
+
+from services.upload_session_service import (
+    abort_session,
+    append_chunk,
+    create_session,
+    finalize_session,
+    get_session_or_404,
+)
+from core.schemas import CreateUploadSessionRequest, MediaResponse, UploadSessionResponse
+
+router = APIRouter(
+    prefix="/workspaces/{workspace_id}/media/uploads",
+    tags=["media"],
+)
+
+UPLOADERS = ["OWNER", "ADMIN", "EDITOR"]
+
+
+@router.post("", response_model=UploadSessionResponse, status_code=201)
+def create_upload(
+    workspace_id: int,
+    payload: CreateUploadSessionRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_role(UPLOADERS)),
+):
+    session = create_session(
+        db,
+        workspace_id=workspace_id,
+        user_id=current_user.id,
+        original_filename=payload.filename,
+        mime_type=payload.mime_type,
+        total_size=payload.size,
+        description=payload.description,
+        tags=payload.tags,
+    )
+    response.headers["Location"] = f"/workspaces/{workspace_id}/media/uploads/{session.id}"
+    response.headers["Upload-Offset"] = "0"
+    return session
+
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+def get_upload(
+    workspace_id: int,
+    upload_id: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_role(UPLOADERS)),
+):
+    """Progress of an upload; ``received_bytes`` is where the client resumes."""
+    session = get_session_or_404(db, workspace_id, upload_id, current_user.id)
+    response.headers["Upload-Offset"] = str(session.received_bytes)
+    return session
+
+
+@router.put("/{upload_id}", response_model=UploadSessionResponse)
+async def put_upload_chunk(
+    workspace_id: int,
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_role(UPLOADERS)),
+):
+    """Append the raw request body at ``Upload-Offset``.
+
+    The offset must equal the bytes received so far; otherwise 409 is returned
+    with the expected offset in the ``Upload-Offset`` header.
+    """
+    session = await run_io(get_session_or_404, db, workspace_id, upload_id, current_user.id)
+    session = await append_chunk(db, session, upload_offset, request.stream())
+    response.headers["Upload-Offset"] = str(session.received_bytes)
+    return session
+
+
+@router.post("/{upload_id}/complete", response_model=MediaResponse, status_code=201)
+async def complete_upload(
+    workspace_id: int,
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_role(UPLOADERS)),
+):
+    session = await run_io(get_session_or_404, db, workspace_id, upload_id, current_user.id)
+    media = await finalize_session(db, session)
+    try:
+        from services.audit_service import log_event
+
+        await run_io(log_event, db, workspace_id=workspace_id, actor_id=current_user.id, action="media.upload", detail=media.original_filename)
+    except Exception:
+        pass
+    return media
+
+
+@router.delete("/{upload_id}", status_code=204)
+def abort_upload(
+    workspace_id: int,
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    _member = Depends(require_workspace_role(UPLOADERS)),
+):
+    session = get_session_or_404(db, workspace_id, upload_id, current_user.id)
+    abort_session(db, session)
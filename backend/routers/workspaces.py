@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
-from db.database import get_db
+from db.database import get_async_db, get_db
 from routers.auth import get_current_user
 from models.workspace import Workspace, WorkspaceMember
 from models.user import User
+from models.pending_deletion import PendingWorkspacePurge
 import re
 
 from pydantic import BaseModel
 from core.schemas import MemberResponse
+from dependencies.permissions import require_workspace_member, require_workspace_member_async
+from services.blob_service import release_workspace_media
+from services.permission_service import Membership
+from services.media_service import invalidate_media_count
+from services.usage_service import get_usage
 
 
 class CreateWorkspaceRequest(BaseModel):
@@ -66,15 +74,18 @@ class AddMemberRequest(BaseModel):
 
 
 @router.get("/{workspace_id}/members")
-def list_members(
+async def list_members(
     workspace_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    _member = Depends(lambda workspace_id, db=Depends(get_db), current_user=Depends(get_current_user):
-                      db.query(WorkspaceMember).filter_by(workspace_id=workspace_id, user_id=current_user.id).first() or (_ for _ in ()).throw(HTTPException(status_code=403, detail="Not a workspace member"))),
+    db: AsyncSession = Depends(get_async_db),
+    _member = Depends(require_workspace_member_async),
 ) -> list[MemberResponse]:
-    # Return member rows augmented with username/email for frontend display
-    members = db.query(WorkspaceMember).filter_by(workspace_id=workspace_id).all()
+    # Return member rows augmented with username/email for frontend display;
+    # users are loaded up front since async sessions cannot lazy-load
+    members = (await db.scalars(
+        select(WorkspaceMember)
+        .options(selectinload(WorkspaceMember.user))
+        .filter_by(workspace_id=workspace_id)
+    )).all()
     def _resolve_avatar(val: str | None) -> str | None:
         if not val:
             return None
@@ -112,8 +123,7 @@ def add_member_endpoint(
     payload: AddMemberRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    caller_member: WorkspaceMember = Depends(lambda workspace_id, db=Depends(get_db), current_user=Depends(get_current_user):
-                                            db.query(WorkspaceMember).filter_by(workspace_id=workspace_id, user_id=current_user.id).first() or (_ for _ in ()).throw(HTTPException(status_code=403, detail="Not a workspace member"))),
+    caller_member: Membership = Depends(require_workspace_member),
 ):
     # Only OWNER or ADMIN can manage members
     if caller_member.role not in {"owner", "admin"}:
@@ -153,8 +163,7 @@ def patch_member(
     payload: AddMemberRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    caller_member: WorkspaceMember = Depends(lambda workspace_id, db=Depends(get_db), current_user=Depends(get_current_user):
-                                            db.query(WorkspaceMember).filter_by(workspace_id=workspace_id, user_id=current_user.id).first() or (_ for _ in ()).throw(HTTPException(status_code=403, detail="Not a workspace member"))),
+    caller_member: Membership = Depends(require_workspace_member),
 ):
     if caller_member.role not in {"owner", "admin"}:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -189,8 +198,7 @@ def delete_member(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    caller_member: WorkspaceMember = Depends(lambda workspace_id, db=Depends(get_db), current_user=Depends(get_current_user):
-                                            db.query(WorkspaceMember).filter_by(workspace_id=workspace_id, user_id=current_user.id).first() or (_ for _ in ()).throw(HTTPException(status_code=403, detail="Not a workspace member"))),
+    caller_member: Membership = Depends(require_workspace_member),
 ):
     if caller_member.role not in {"owner", "admin"}:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -222,6 +230,27 @@ def delete_member(
     return {"detail": "Member removed"}
 
 
+# ---------------------------
+# Storage usage
+# ---------------------------
+class WorkspaceUsageResponse(BaseModel):
+    workspace_id: int
+    file_count: int
+    bytes_used: int
+    # effective limits; None means unlimited
+    quota_bytes: int | None = None
+    quota_files: int | None = None
+
+
+@router.get("/{workspace_id}/usage", response_model=WorkspaceUsageResponse)
+def get_workspace_usage(
+    workspace_id: int,
+    db: Session = Depends(get_db),
+    _member: Membership = Depends(require_workspace_member),
+):
+    return get_usage(db, workspace_id)
+
+
 # ---------------------------
 # Workspace settings
 # ---------------------------
@@ -237,8 +266,7 @@ def update_workspace(
     payload: WorkspaceUpdateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    caller_member: WorkspaceMember = Depends(lambda workspace_id, db=Depends(get_db), current_user=Depends(get_current_user):
-                                            db.query(WorkspaceMember).filter_by(workspace_id=workspace_id, user_id=current_user.id).first() or (_ for _ in ()).throw(HTTPException(status_code=403, detail="Not a workspace member"))),
+    caller_member: Membership = Depends(require_workspace_member),
 ):
     if caller_member.role != "owner":
         raise HTTPException(status_code=403, detail="Only OWNER can modify workspace settings")
@@ -257,8 +285,7 @@ def delete_workspace(
     workspace_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    caller_member: WorkspaceMember = Depends(lambda workspace_id, db=Depends(get_db), current_user=Depends(get_current_user):
-                                            db.query(WorkspaceMember).filter_by(workspace_id=workspace_id, user_id=current_user.id).first() or (_ for _ in ()).throw(HTTPException(status_code=403, detail="Not a workspace member"))),
+    caller_member: Membership = Depends(require_workspace_member),
 ):
     if caller_member.role != "owner":
         raise HTTPException(status_code=403, detail="Only OWNER can delete workspace")
@@ -267,9 +294,15 @@ def delete_workspace(
     if not ws:
         raise HTTPException(status_code=404, detail="Workspace not found")
 
-    # cascade delete (DB FK cascade set on models) — perform soft-delete if desired
+    # Deleting the row destroys the workspace's data key, which makes all of
+    # its blobs unreadable at once; their files are purged in the background.
+    # Media from before the data key are released first, the rest cascades
+    # (DB FK cascade set on models).
+    release_workspace_media(db, workspace_id)
+    db.add(PendingWorkspacePurge(workspace_id=workspace_id))
     db.delete(ws)
     db.commit()
+    invalidate_media_count(workspace_id)
     try:
         from services.audit_service import log_event
 
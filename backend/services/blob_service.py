@@ -0,0 +1,175 @@
+import os
+from collections import Counter
+from dataclasses import dataclass
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.blob import Blob
+from models.media import Media
+from services.deletion_service import enqueue_deletion
+from services.tag_service import clear_media_tags
+from services.usage_service import release_usage
+from storage import BlobLocation, LEGACY_BACKEND, default_backend, get_backend
+
+
+@dataclass
+class StoredBlob:
+    """An encrypted upload waiting in the staging directory."""
+
+    staging_path: str
+    size_bytes: int
+    content_sha256: str
+    codec: str
+    stored_size: int
+    key_id: str
+    # workspace whose data key sealed the content
+    workspace_id: int
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_staged(stored: StoredBlob) -> None:
+    """Drop a staged upload that will not be stored."""
+    _discard(stored.staging_path)
+
+
+def blob_location(blob: Blob) -> BlobLocation:
+    return BlobLocation(blob.backend, blob.storage_key)
+
+
+def media_location(media: Media) -> BlobLocation:
+    """Where the encrypted content of ``media`` is stored."""
+    if media.blob is not None:
+        return blob_location(media.blob)
+    return BlobLocation(LEGACY_BACKEND, media.stored_filename)
+
+
+def acquire_blob(db: Session, stored: StoredBlob) -> Blob:
+    """Take a reference on the blob holding this content.
+
+    When identical content is already stored in the same workspace the staged
+    file is discarded and the existing blob is reused (content is never
+    shared across workspaces, each seals it with its own data key); otherwise
+    the staged file is handed to the default storage backend and becomes a
+    new blob (``ref_count == 1``). The blob row is locked so a concurrent
+    release cannot drop it underneath us. Changes are flushed but not
+    committed.
+    """
+    blob = (
+        db.query(Blob)
+        .filter_by(workspace_id=stored.workspace_id, sha256=stored.content_sha256)
+        .with_for_update()
+        .first()
+    )
+    if blob is None:
+        backend = default_backend()
+        key = backend.new_key()
+        backend.put_file(stored.staging_path, key)
+        blob = Blob(
+            workspace_id=stored.workspace_id,
+            sha256=stored.content_sha256,
+            backend=backend.name,
+            storage_key=key,
+            size_bytes=stored.size_bytes,
+            stored_size=stored.stored_size,
+            codec=stored.codec,
+            key_id=stored.key_id,
+            ref_count=1,
+        )
+        try:
+            with db.begin_nested():
+                db.add(blob)
+            return blob
+        except IntegrityError:
+            # A concurrent upload of the same content inserted the blob first.
+            backend.delete(key)
+            blob = (
+                db.query(Blob)
+                .filter_by(workspace_id=stored.workspace_id, sha256=stored.content_sha256)
+                .with_for_update()
+                .one()
+            )
+    else:
+        _discard(stored.staging_path)
+
+    blob.ref_count += 1
+    return blob
+
+
+def remove_media(db: Session, media: Media) -> None:
+    """Delete a Media row and drop its blob reference.
+
+    Content no longer referenced by any row is queued for deletion in the
+    same transaction (see ``services.deletion_service``), so it is removed
+    only if the delete commits. Changes are flushed but not committed.
+    """
+    blob_id = media.blob_id
+    legacy = BlobLocation(LEGACY_BACKEND, media.stored_filename) if media.stored_filename else None
+    clear_media_tags(db, media)
+    release_usage(db, media.workspace_id, 1, media.size_bytes)
+    db.delete(media)
+    db.flush()
+
+    if blob_id is None:
+        # rows from before the blob store own their file outright
+        enqueue_deletion(db, legacy)
+        return
+
+    blob = db.query(Blob).filter_by(id=blob_id).with_for_update().one()
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        return
+
+    enqueue_deletion(db, blob_location(blob))
+    db.delete(blob)
+
+
+def release_workspace_media(db: Session, workspace_id: int, batch_size: int = 1000) -> None:
+    """Delete the Media rows of a workspace that predate its data key.
+
+    Content sealed with the workspace's own data key dies with the workspace
+    row and is purged lazily (see ``services.deletion_service``). Older rows
+    point at master-key blobs other workspaces may share, or own legacy
+    files; they are released here in batches, queueing content left
+    unreferenced for deletion. Not committed.
+    """
+    after_id = 0
+    while True:
+        rows = (
+            db.query(Media.id, Media.blob_id, Media.stored_filename)
+            .outerjoin(Blob, Media.blob_id == Blob.id)
+            .filter(Media.workspace_id == workspace_id, Media.id > after_id, Blob.workspace_id.is_(None))
+            .order_by(Media.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        after_id = rows[-1].id
+
+        refs = Counter(row.blob_id for row in rows if row.blob_id is not None)
+        for row in rows:
+            if row.blob_id is None and row.stored_filename:
+                enqueue_deletion(db, BlobLocation(LEGACY_BACKEND, row.stored_filename))
+        db.query(Media).filter(Media.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+
+        if refs:
+            blobs = db.query(Blob).filter(Blob.id.in_(refs)).order_by(Blob.id).with_for_update().all()
+            for blob in blobs:
+                blob.ref_count -= refs[blob.id]
+                if blob.ref_count <= 0:
+                    enqueue_deletion(db, blob_location(blob))
+                    db.delete(blob)
+        db.flush()
+
+
+def delete_blob_location(location: BlobLocation | None) -> None:
+    """Remove content written for a transaction that was rolled back."""
+    if location:
+        get_backend(location.backend).delete(location.key)
@@ -0,0 +1,152 @@
+"""Deferred removal of stored content.
+
+Requests never delete files themselves: dropping the last reference to some
+content queues its location in ``pending_deletions`` within the same
+transaction (``enqueue_deletion``), and the worker here removes queued
+content in batches, grouped per backend so S3 can use bulk deletes. Failed
+removals are retried with exponential backoff; deleting a key that is
+already gone counts as success, so entries may safely be processed twice.
+
+Deleted workspaces are purged the same way: their blobs are unreadable the
+moment the workspace row (and its data key) is gone, and ``purge_workspaces``
+queues their content batch by batch afterwards.
+
+Runs in the background every DELETION_QUEUE_INTERVAL_SECONDS; drain the
+queue by hand with ``python -m services.deletion_service``.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from core.config import (
+    DELETION_QUEUE_BATCH_SIZE,
+    DELETION_RETRY_BASE_SECONDS,
+    DELETION_RETRY_MAX_SECONDS,
+)
+from db.database import SessionLocal
+from models.blob import Blob
+from models.pending_deletion import PendingDeletion, PendingWorkspacePurge
+from storage import BlobLocation, get_backend
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_deletion(db: Session, location: BlobLocation | None) -> None:
+    """Queue ``location`` for removal once the current transaction commits."""
+    if location:
+        db.add(PendingDeletion(
+            backend=location.backend,
+            storage_key=location.key,
+            next_attempt_at=datetime.now(timezone.utc),
+        ))
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(DELETION_RETRY_BASE_SECONDS * 2 ** (attempts - 1), DELETION_RETRY_MAX_SECONDS))
+
+
+def process_deletions(db: Session, batch_size: int = DELETION_QUEUE_BATCH_SIZE) -> tuple[int, int]:
+    """Remove up to ``batch_size`` due entries; returns (removed, failed)."""
+    now = datetime.now(timezone.utc)
+    entries = (
+        db.query(PendingDeletion)
+        .filter(PendingDeletion.next_attempt_at <= now)
+        .order_by(PendingDeletion.next_attempt_at, PendingDeletion.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not entries:
+        db.rollback()
+        return 0, 0
+
+    by_backend = defaultdict(list)
+    for entry in entries:
+        by_backend[entry.backend].append(entry)
+
+    removed = failed = 0
+    for name, group in by_backend.items():
+        try:
+            errors = get_backend(name).delete_many([entry.storage_key for entry in group])
+        except Exception as exc:
+            message = str(exc) or type(exc).__name__
+            errors = {entry.storage_key: message for entry in group}
+        for entry in group:
+            error = errors.get(entry.storage_key)
+            if error is None:
+                db.delete(entry)
+                removed += 1
+                continue
+            entry.attempts += 1
+            entry.last_error = error[:1000]
+            entry.next_attempt_at = now + _retry_delay(entry.attempts)
+            failed += 1
+            logger.warning(
+                "Deleting %s:%s failed (attempt %d): %s",
+                name, entry.storage_key, entry.attempts, error,
+            )
+    db.commit()
+    return removed, failed
+
+
+def purge_workspaces(db: Session, batch_size: int = DELETION_QUEUE_BATCH_SIZE) -> int:
+    """Queue up to ``batch_size`` blobs of deleted workspaces for removal; returns how many."""
+    purges = db.query(PendingWorkspacePurge).order_by(PendingWorkspacePurge.created_at).all()
+    queued = 0
+    for purge in purges:
+        blobs = (
+            db.query(Blob)
+            .filter_by(workspace_id=purge.workspace_id)
+            .limit(batch_size - queued)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for blob in blobs:
+            enqueue_deletion(db, BlobLocation(blob.backend, blob.storage_key))
+            db.delete(blob)
+        queued += len(blobs)
+        # an upload racing the workspace delete has no workspace left to commit
+        # into, so once no blob (locked or not) remains none can appear
+        if not blobs and db.query(Blob.id).filter_by(workspace_id=purge.workspace_id).first() is None:
+            db.delete(purge)
+        if queued >= batch_size:
+            break
+    db.commit()
+    return queued
+
+
+def drain(db: Session, batch_size: int = DELETION_QUEUE_BATCH_SIZE) -> int:
+    """Process batches until nothing is due; returns the number of entries removed."""
+    total = 0
+    while True:
+        removed, failed = process_deletions(db, batch_size)
+        total += removed
+        if removed + failed < batch_size:
+            return total
+
+
+def run_deletion_worker() -> None:
+    """Background entry point: purge deleted workspaces and empty the due part of the queue."""
+    db = SessionLocal()
+    try:
+        while purge_workspaces(db):
+            pass
+        removed = drain(db)
+    finally:
+        db.close()
+    if removed:
+        logger.info("Removed %d stored blobs", removed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        while purge_workspaces(session):
+            pass
+        count = drain(session)
+    finally:
+        session.close()
+    logger.info("Done, %d stored blobs removed", count)
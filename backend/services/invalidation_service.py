@@ -0,0 +1,98 @@
+"""Cross-worker invalidation of process-local caches.
+
+Caches of database rows (principals, workspace roles, workspace data keys
+and the content decrypted with them) live in each worker process. A worker that commits a change drops its own entries right away;
+with CACHE_INVALIDATION=postgres the change is also published with NOTIFY
+inside the committing transaction, so Postgres delivers it only if the
+commit succeeds, and every worker listening (``init_cache_invalidation``)
+hands it to the cache registered for its kind. Without broadcasting, other
+workers pick up changes when their entries expire.
+"""
+import logging
+import select
+import threading
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import CACHE_INVALIDATION
+from db.database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidate"
+_RETRY_SECONDS = 5
+
+# kind -> (handler for one payload, reset dropping everything)
+_caches: dict[str, tuple[Callable[[str], None], Callable[[], None]]] = {}
+
+
+def broadcasting() -> bool:
+    return CACHE_INVALIDATION == "postgres" and engine.dialect.name == "postgresql"
+
+
+def register(kind: str, handler: Callable[[str], None], reset: Callable[[], None]) -> None:
+    """Route published ``kind`` payloads to ``handler``; ``reset`` runs whenever some may have been missed."""
+    _caches[kind] = (handler, reset)
+
+
+def publish(session: Session, kind: str, payload: str) -> None:
+    """Announce a change to other workers once ``session``'s transaction commits."""
+    if broadcasting():
+        session.connection().execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": f"{kind}:{payload}"},
+        )
+
+
+def _dispatch(message: str) -> None:
+    kind, _, payload = message.partition(":")
+    entry = _caches.get(kind)
+    if entry is not None:
+        entry[0](payload)
+
+
+def _reset_all() -> None:
+    for _, reset in _caches.values():
+        reset()
+
+
+def _listen(stop: threading.Event) -> None:
+    while not stop.is_set():
+        connection = None
+        try:
+            connection = engine.raw_connection()
+            driver = connection.driver_connection
+            driver.autocommit = True
+            driver.cursor().execute(f"LISTEN {CHANNEL}")
+            # notifications sent while not listening are lost
+            _reset_all()
+            while not stop.is_set():
+                if select.select([driver], [], [], _RETRY_SECONDS) == ([], [], []):
+                    continue
+                driver.poll()
+                while driver.notifies:
+                    _dispatch(driver.notifies.pop(0).payload)
+        except Exception:
+            logger.exception("Cache invalidation listener failed, reconnecting")
+            stop.wait(_RETRY_SECONDS)
+        finally:
+            if connection is not None:
+                # the connection is in LISTEN mode; never hand it back to the pool
+                connection.invalidate()
+
+
+def init_cache_invalidation(app) -> None:
+    """Listen for invalidations from other workers when broadcasting is enabled."""
+    if not broadcasting():
+        return
+    stop = threading.Event()
+
+    @app.on_event("startup")
+    def _start() -> None:
+        threading.Thread(target=_listen, args=(stop,), name="cache-invalidation", daemon=True).start()
+
+    @app.on_event("shutdown")
+    def _stop() -> None:
+        stop.set()
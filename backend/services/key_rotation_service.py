@@ -0,0 +1,224 @@
+"""Re-encrypts stored blobs onto the newest master key.
+
+Blobs sealed with a workspace data key need no re-encryption: rotating the
+master key only re-wraps the data keys (``workspace_key_service.rewrap_batch``),
+which this job does first. What follows applies to blobs from before
+per-workspace keys, sealed with the master key directly.
+
+After a new key is put in front of FILE_ENCRYPTION_KEYS, new content uses it
+right away while existing blobs stay readable under their old key. This job
+then moves them over one at a time: the content is streamed segment by
+segment through a fresh encryptor into a new key on the same backend,
+without holding any lock, and only the final swap locks the blob row. If the
+blob changed meanwhile the copy is dropped and the blob is retried later;
+otherwise the row is repointed and the old copy queued for deletion in the
+same transaction. Blobs already on the current key are never selected
+again, so an interrupted run simply resumes where it stopped.
+
+Reads are paced to KEY_ROTATION_MAX_BYTES_PER_SECOND. Once no blob reports
+an old key (``rotation_status``), the old key can be dropped from the ring.
+
+Run once to completion with ``python -m services.key_rotation_service``
+(``--status`` only reports progress) or in the background via
+KEY_ROTATION_INTERVAL_SECONDS.
+"""
+import logging
+import os
+import sys
+import threading
+import uuid
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from core.blob_crypto import CURRENT_KEY_ID, BlobDecryptionError, BlobReader, SegmentEncryptor
+from core.config import (
+    KEY_ROTATION_BATCH_SIZE,
+    KEY_ROTATION_MAX_BYTES_PER_SECOND,
+    STORAGE_STAGING_DIR,
+)
+from core.io_budget import IOBudget
+from db.database import SessionLocal
+from models.blob import Blob
+from models.media import Media
+from models.workspace import Workspace
+from services.deletion_service import enqueue_deletion
+from services.workspace_key_service import rewrap_batch
+from storage import BlobLocation, get_backend
+
+logger = logging.getLogger(__name__)
+
+
+# process-local progress counters, exposed through /metrics
+_stats_lock = threading.Lock()
+_stats = {"rotated_blobs": 0, "rotated_bytes": 0, "failed_blobs": 0}
+
+
+def _count(**deltas: int) -> None:
+    with _stats_lock:
+        for name, delta in deltas.items():
+            _stats[name] += delta
+
+
+def rotation_metrics() -> dict:
+    with _stats_lock:
+        return {"current_key_id": CURRENT_KEY_ID, **_stats}
+
+
+def rotation_status(db: Session) -> dict:
+    """Master-key blobs and stored bytes per key id (None: unknown), and what is left to rotate."""
+    rows = (
+        db.query(Blob.key_id, func.count(Blob.id), func.coalesce(func.sum(Blob.stored_size), 0))
+        .filter(Blob.workspace_id.is_(None))
+        .group_by(Blob.key_id)
+        .all()
+    )
+    stale_workspace_keys = (
+        db.query(func.count(Workspace.id))
+        .filter(
+            Workspace.data_key.isnot(None),
+            or_(Workspace.data_key_master_id.is_(None), Workspace.data_key_master_id != CURRENT_KEY_ID),
+        )
+        .scalar()
+    )
+    db.rollback()
+    keys = {kid: {"blobs": count, "stored_bytes": int(size)} for kid, count, size in rows}
+    return {
+        "current_key_id": CURRENT_KEY_ID,
+        "keys": keys,
+        "remaining_blobs": sum(entry["blobs"] for kid, entry in keys.items() if kid != CURRENT_KEY_ID),
+        "remaining_workspace_keys": stale_workspace_keys,
+    }
+
+
+def _reencrypt(src, staging_path: str, budget: IOBudget) -> tuple[SegmentEncryptor, int]:
+    encryptor = SegmentEncryptor()
+    stored_size = 0
+    with open(staging_path, "wb") as out:
+        for segment in BlobReader(src).iter_range():
+            sealed = encryptor.update(segment)
+            out.write(sealed)
+            stored_size += len(sealed)
+            budget.consume(len(segment))
+        sealed = encryptor.finalize()
+        out.write(sealed)
+        stored_size += len(sealed)
+    return encryptor, stored_size
+
+
+def rotate_blob(db: Session, blob_id: int, budget: IOBudget) -> bool:
+    """Re-encrypt one blob onto the current key; False when it was skipped."""
+    blob = db.query(Blob).filter_by(id=blob_id).first()
+    if blob is None or blob.workspace_id is not None or blob.key_id == CURRENT_KEY_ID:
+        db.rollback()
+        return False
+    backend = get_backend(blob.backend)
+    old_key = blob.storage_key
+    db.rollback()
+
+    staging_path = os.path.join(STORAGE_STAGING_DIR, f"{uuid.uuid4().hex}.enc")
+    new_key = backend.new_key()
+    try:
+        with backend.open(old_key) as src:
+            encryptor, stored_size = _reencrypt(src, staging_path, budget)
+        backend.put_file(staging_path, new_key)
+    except (FileNotFoundError, BlobDecryptionError) as exc:
+        # missing content is the reconciler's business; undecryptable content
+        # needs its key added back to the ring
+        logger.warning("Blob %s at %s:%s not rotated: %s", blob_id, backend.name, old_key, exc)
+        _count(failed_blobs=1)
+        return False
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+
+    blob = db.query(Blob).filter_by(id=blob_id).with_for_update(skip_locked=True).first()
+    if blob is None or blob.backend != backend.name or blob.storage_key != old_key:
+        # deleted, moved or locked by a live request: drop the copy, retry later
+        db.rollback()
+        backend.delete(new_key)
+        return False
+
+    blob.storage_key = new_key
+    blob.key_id = encryptor.key_id
+    blob.stored_size = stored_size
+    # legacy rows still carry the old flat location; it is no longer valid
+    db.query(Media).filter_by(blob_id=blob_id).update(
+        {Media.stored_filename: None, Media.stored_path: None},
+        synchronize_session=False,
+    )
+    enqueue_deletion(db, BlobLocation(backend.name, old_key))
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        backend.delete(new_key)
+        raise
+    _count(rotated_blobs=1, rotated_bytes=stored_size)
+    return True
+
+
+def rotate_batch(
+    db: Session,
+    budget: IOBudget,
+    after_id: int = 0,
+    batch_size: int = KEY_ROTATION_BATCH_SIZE,
+) -> tuple[int, int | None]:
+    """Rotate up to ``batch_size`` blobs with ``id > after_id``.
+
+    Returns the number rotated and the last id examined (None once every blob
+    has been visited), to be passed as ``after_id`` on the next call.
+    """
+    ids = [
+        row.id
+        for row in db.query(Blob.id)
+        .filter(
+            Blob.id > after_id,
+            Blob.workspace_id.is_(None),
+            or_(Blob.key_id.is_(None), Blob.key_id != CURRENT_KEY_ID),
+        )
+        .order_by(Blob.id)
+        .limit(batch_size)
+        .all()
+    ]
+    db.rollback()
+
+    rotated = sum(rotate_blob(db, blob_id, budget) for blob_id in ids)
+    return rotated, (ids[-1] if ids else None)
+
+
+_cursor = 0
+
+
+def run_key_rotation() -> None:
+    """Background entry point: rotate one batch per tick, wrapping around at the end."""
+    global _cursor
+    db = SessionLocal()
+    try:
+        rewrapped = rewrap_batch(db, KEY_ROTATION_BATCH_SIZE)
+        if rewrapped:
+            logger.info("Re-wrapped %d workspace keys with key %s", rewrapped, CURRENT_KEY_ID)
+        rotated, last_id = rotate_batch(db, IOBudget(KEY_ROTATION_MAX_BYTES_PER_SECOND), after_id=_cursor)
+        _cursor = last_id or 0
+        if rotated:
+            logger.info("Rotated %d blobs to key %s, %d left", rotated, CURRENT_KEY_ID, rotation_status(db)["remaining_blobs"])
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        if "--status" not in sys.argv[1:]:
+            while rewrap_batch(session, KEY_ROTATION_BATCH_SIZE):
+                pass
+            io_budget = IOBudget(KEY_ROTATION_MAX_BYTES_PER_SECOND)
+            total, cursor = 0, 0
+            while cursor is not None:
+                rotated_now, cursor = rotate_batch(session, io_budget, after_id=cursor)
+                total += rotated_now
+                logger.info("Rotated %d blobs so far", total)
+        logger.info("Status: %s", rotation_status(session))
+    finally:
+        session.close()
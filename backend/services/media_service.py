@@ -1,10 +1,410 @@
+import asyncio
 import os
 import os
-from sqlalchemy.orm import Session
-from fastapi import HTTPException
+import hashlib
+import threading
+import time
+import uuid
+from typing import AsyncIterator
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from fastapi import HTTPException, UploadFile
 from models.media import Media
 from sqlalchemy.exc import IntegrityError
 
+from core.blob_crypto import BlobReader, SegmentEncryptor, seal_segments
+from core.content_cache import content_cache
+from core.codecs import IDENTITY, DecodingReader, codec_for_mime, compressor
+from core.config import BATCH_UPLOAD_CONCURRENCY, MEDIA_COUNT_CACHE_SECONDS, STORAGE_STAGING_DIR, UPLOAD_CHUNK_SIZE
+from core.executors import run_crypto, run_io
+from services.blob_service import (
+    StoredBlob,
+    acquire_blob,
+    blob_location,
+    delete_blob_location,
+    discard_staged,
+    media_location,
+    remove_media,
+)
+from services.audit_service import log_event
+from services.tag_service import normalize_tags, set_media_tags
+from services.usage_service import charge_usage
+from services.workspace_key_service import workspace_data_key
+from storage import get_backend
+
+
+# (workspace_id, *filters) -> (expires_at, count); see count_media
+_count_cache: dict[tuple, tuple[float, int]] = {}
+_count_lock = threading.Lock()
+_COUNT_CACHE_MAX_ENTRIES = 4096
+
+
+def _cached_count(key: tuple) -> int | None:
+    with _count_lock:
+        cached = _count_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def _store_count(key: tuple, total: int) -> None:
+    with _count_lock:
+        if len(_count_cache) >= _COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.clear()
+        _count_cache[key] = (time.monotonic() + MEDIA_COUNT_CACHE_SECONDS, total)
+
+
+def count_media(query, key: tuple) -> int:
+    """``query.count()`` cached for MEDIA_COUNT_CACHE_SECONDS under ``key``.
+
+    ``key`` must start with the workspace id so writes can invalidate it.
+    """
+    total = _cached_count(key)
+    if total is None:
+        total = query.order_by(None).count()
+        _store_count(key, total)
+    return total
+
+
+async def count_media_async(db: AsyncSession, statement, key: tuple) -> int:
+    """``count_media`` for a ``select(Media)`` statement on an async session."""
+    total = _cached_count(key)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(statement.order_by(None).subquery()))
+        _store_count(key, total)
+    return total
+
+
+def invalidate_media_count(workspace_id: int) -> None:
+    with _count_lock:
+        for key in [k for k in _count_cache if k[0] == workspace_id]:
+            del _count_cache[key]
+
+
+async def store_upload(file: UploadFile, workspace_id: int) -> StoredBlob:
+    """Stream a multipart upload into the staging directory (see ``store_stream``)."""
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+    return await store_stream(chunks(), file.content_type, workspace_id)
+
+
+async def store_stream(chunks: AsyncIterator[bytes], mime_type: str | None, workspace_id: int) -> StoredBlob:
+    """Stream content into the staging directory, encrypting it segment by segment.
+
+    The plaintext is never held in memory as a whole: each chunk is hashed,
+    compressed when its MIME type calls for it, encrypted and appended to a
+    staging file, which ``blob_service.acquire_blob`` later hands to the
+    storage backend. Hashing, compression and writes run on the
+    I/O pool and sealing on the crypto pools, so the event loop only shuttles
+    chunks around. Content is sealed with the workspace's data key (see
+    ``services.workspace_key_service``).
+    """
+    data_key = await run_io(workspace_data_key, workspace_id)
+    staging_path = os.path.join(STORAGE_STAGING_DIR, f"{uuid.uuid4().hex}.enc")
+
+    codec = codec_for_mime(mime_type)
+    packer = compressor(codec)
+    encryptor = SegmentEncryptor(data_key)
+    digest = hashlib.sha256()
+    size = 0
+    stored_size = 0
+    out = await run_io(open, staging_path, "wb")
+    try:
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                # hashlib, zlib and zstd release the GIL on large buffers
+                await run_io(digest.update, chunk)
+                if codec != IDENTITY:
+                    chunk = await run_io(packer.compress, chunk)
+                sealed = await run_crypto(seal_segments, *encryptor.plan(chunk), size=len(chunk))
+                await run_io(out.write, sealed)
+                stored_size += len(sealed)
+            tail = await run_io(packer.flush)
+            sealed = await run_crypto(seal_segments, *encryptor.plan(tail), size=len(tail))
+            sealed += seal_segments(*encryptor.plan_final())
+            await run_io(out.write, sealed)
+            stored_size += len(sealed)
+        finally:
+            await run_io(out.close)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        await run_io(os.remove, staging_path)
+        raise
+
+    return StoredBlob(
+        staging_path=staging_path,
+        size_bytes=size,
+        content_sha256=digest.hexdigest(),
+        codec=codec,
+        stored_size=stored_size,
+        key_id=encryptor.key_id,
+        workspace_id=workspace_id,
+    )
+
+
+async def create_media(
+    db: Session,
+    stored: StoredBlob,
+    *,
+    workspace_id: int,
+    uploaded_by: int | None,
+    original_filename: str,
+    mime_type: str | None,
+    description: str | None = None,
+    tags: str | None = None,
+) -> Media:
+    """Turn staged content into a committed Media row backed by a blob."""
+    try:
+        normalize_tags(tags)
+    except HTTPException:
+        discard_staged(stored)
+        raise
+    # handing the staged file to the backend may be a network upload, and the
+    # session's queries and commit would block the event loop
+    return await run_io(
+        _insert_media,
+        db,
+        stored,
+        tags,
+        workspace_id=workspace_id,
+        uploaded_by=uploaded_by,
+        original_filename=original_filename,
+        mime_type=mime_type,
+        description=description,
+    )
+
+
+def _insert_media(
+    db: Session,
+    stored: StoredBlob,
+    tags: str | None,
+    *,
+    workspace_id: int,
+    uploaded_by: int | None,
+    original_filename: str,
+    mime_type: str | None,
+    description: str | None,
+) -> Media:
+    blob = acquire_blob(db, stored)
+
+    media = Media(
+        workspace_id=workspace_id,
+        uploaded_by=uploaded_by,
+        original_filename=original_filename,
+        blob=blob,
+        size_bytes=stored.size_bytes,
+        content_sha256=stored.content_sha256,
+        mime_type=mime_type,
+        description=description,
+    )
+
+    db.add(media)
+    new_location = blob_location(blob) if blob.ref_count == 1 else None
+    try:
+        db.flush()
+        set_media_tags(db, media, tags)
+        charge_usage(db, workspace_id, 1, stored.size_bytes)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        # a blob created for this upload was rolled back with the media row;
+        # drop the content nothing references any more
+        delete_blob_location(new_location)
+        raise HTTPException(
+            status_code=409,
+            detail="A file with this name already exists",
+        )
+    except HTTPException:
+        # over quota
+        db.rollback()
+        delete_blob_location(new_location)
+        raise
+    invalidate_media_count(workspace_id)
+    db.refresh(media)
+    return media
+
+
+async def store_uploads(files: list[UploadFile], workspace_id: int) -> list[StoredBlob | HTTPException]:
+    """Stage several uploads concurrently, at most BATCH_UPLOAD_CONCURRENCY at a time.
+
+    Per-file client errors (such as an empty file) are returned in place of
+    the StoredBlob; anything else discards whatever was staged and propagates.
+    """
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+
+    async def stage(file: UploadFile) -> StoredBlob | HTTPException:
+        async with semaphore:
+            try:
+                return await store_upload(file, workspace_id)
+            except HTTPException as exc:
+                return exc
+
+    results = await asyncio.gather(*(stage(f) for f in files), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, HTTPException):
+            for stored in results:
+                if isinstance(stored, StoredBlob):
+                    discard_staged(stored)
+            raise result
+    return results
+
+
+def _batch_result(filename: str, status_code: int, *, media: Media | None = None, detail: str | None = None) -> dict:
+    return {"filename": filename, "status_code": status_code, "media": media, "detail": detail}
+
+
+def create_media_batch(
+    db: Session,
+    uploads: list[tuple[str, str | None, StoredBlob | HTTPException]],
+    *,
+    workspace_id: int,
+    uploaded_by: int | None,
+    description: str | None = None,
+    tags: str | None = None,
+) -> list[dict]:
+    """Create Media rows and their audit entries for staged uploads in one transaction.
+
+    ``uploads`` holds ``(filename, mime_type, staged)`` in request order; the
+    result has one entry per upload with a per-file status code. A filename
+    taken in the workspace (or earlier in the batch) yields a 409 for that
+    file only; its insert is rolled back to a savepoint so the rest of the
+    batch still commits.
+    """
+    names = {name for name, _, stored in uploads if isinstance(stored, StoredBlob)}
+    try:
+        normalize_tags(tags)
+    except HTTPException:
+        for _, _, stored in uploads:
+            if isinstance(stored, StoredBlob):
+                discard_staged(stored)
+        raise
+    taken = {
+        name
+        for (name,) in db.query(Media.original_filename).filter(
+            Media.workspace_id == workspace_id,
+            Media.original_filename.in_(names),
+        )
+    } if names else set()
+
+    results: list[dict | None] = [None] * len(uploads)
+    created: list[tuple[int, Media]] = []
+    new_locations = []
+    try:
+        for i, (filename, mime_type, stored) in enumerate(uploads):
+            if isinstance(stored, HTTPException):
+                results[i] = _batch_result(filename, stored.status_code, detail=stored.detail)
+                continue
+            if filename in taken:
+                discard_staged(stored)
+                results[i] = _batch_result(filename, 409, detail="A file with this name already exists")
+                continue
+
+            new_location = None
+            try:
+                with db.begin_nested():
+                    blob = acquire_blob(db, stored)
+                    new_location = blob_location(blob) if blob.ref_count == 1 else None
+                    media = Media(
+                        workspace_id=workspace_id,
+                        uploaded_by=uploaded_by,
+                        original_filename=filename,
+                        blob=blob,
+                        size_bytes=stored.size_bytes,
+                        content_sha256=stored.content_sha256,
+                        mime_type=mime_type,
+                        description=description,
+                    )
+                    db.add(media)
+                    db.flush()
+                    set_media_tags(db, media, tags)
+                    charge_usage(db, workspace_id, 1, stored.size_bytes)
+            except IntegrityError:
+                # lost a race for the name; the savepoint took the blob with it
+                delete_blob_location(new_location)
+                results[i] = _batch_result(filename, 409, detail="A file with this name already exists")
+                continue
+            except HTTPException as exc:
+                # over quota; later (smaller) files may still fit
+                delete_blob_location(new_location)
+                results[i] = _batch_result(filename, exc.status_code, detail=exc.detail)
+                continue
+
+            taken.add(filename)
+            new_locations.append(new_location)
+            created.append((i, media))
+            log_event(db, workspace_id=workspace_id, actor_id=uploaded_by, action="media.upload", detail=filename, commit=False)
+
+        created_ids = [media.id for _, media in created]
+        db.commit()
+    except BaseException:
+        db.rollback()
+        for location in new_locations:
+            delete_blob_location(location)
+        for _, _, stored in uploads:
+            if isinstance(stored, StoredBlob):
+                discard_staged(stored)
+        raise
+
+    if created_ids:
+        invalidate_media_count(workspace_id)
+        # reload the committed rows in one query rather than one per row
+        db.query(Media).options(selectinload(Media.blob)).filter(Media.id.in_(created_ids)).all()
+    for i, media in created:
+        results[i] = _batch_result(media.original_filename, 201, media=media)
+    return results
+
+
+def open_media_reader(media: Media) -> DecodingReader:
+    """Open the stored content of ``media`` for (ranged) reading.
+
+    The reader decrypts and decompresses; its ``size`` is the logical size.
+    Raises FileNotFoundError when the stored content is missing.
+    """
+    location = media_location(media)
+    blob = media.blob
+    # blobs from before per-workspace keys are sealed with the master key
+    data_key = workspace_data_key(blob.workspace_id) if blob is not None and blob.workspace_id is not None else None
+    f = get_backend(location.backend).open(location.key)
+    try:
+        reader = BlobReader(f, data_key)
+    except Exception:
+        f.close()
+        raise
+    if media.blob is None:
+        return DecodingReader(reader, IDENTITY)
+    return DecodingReader(reader, media.blob.codec, media.blob.size_bytes)
+
+
+def open_cached_media_reader(media: Media):
+    """``open_media_reader`` behind the decrypted-content cache (core.content_cache)."""
+    validator = media.content_sha256 or media.stored_filename
+    # keyed by workspace too, so a deleted workspace's entries can be dropped
+    return content_cache.open((media.workspace_id, media.id), validator, lambda: open_media_reader(media))
+
+
+def invalidate_media_cache(workspace_id: int, media_id: int) -> None:
+    content_cache.invalidate((workspace_id, media_id))
+
+
+async def iter_media_content(reader: DecodingReader, start: int = 0, stop: int | None = None) -> AsyncIterator[bytes]:
+    """Yield decrypted bytes ``[start, stop)`` and close the reader when done.
+
+    Each segment is read and decrypted on the I/O pool.
+    """
+    segments = reader.iter_range(start, stop)
+    try:
+        while (chunk := await run_io(next, segments, None)) is not None:
+            yield chunk
+    finally:
+        await run_io(reader.close)
+
 
 def get_media_by_filename(db: Session, workspace_id: int, filename: str) -> Media:
     """Workspace-scoped lookup by original filename."""
@@ -55,19 +455,12 @@ def rename_file(db: Session, media: Media, new_filename: str) -> Media:
 
 
 def delete_file(db: Session, media: Media) -> None:
-    path: str = media.stored_path
-
-    if os.path.exists(path):
-        try:
-            os.remove(path)
-        except OSError:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to delete file from storage",
-            )
-
-    db.delete(media)
+    media_id, workspace_id = media.id, media.workspace_id
+    # the stored content is queued for removal in the same transaction
+    remove_media(db, media)
     db.commit()
+    invalidate_media_cache(workspace_id, media_id)
+    invalidate_media_count(workspace_id)
 
 
 def update_media(
@@ -84,10 +477,9 @@ def update_media(
     if description is not None:
         media.description = description
 
-    if tags is not None:
-        media.tags = ",".join(tags)
-
     try:
+        if tags is not None:
+            set_media_tags(db, media, tags)
         db.commit()
     except IntegrityError:
         db.rollback()
@@ -96,5 +488,7 @@ def update_media(
             detail="A file with this name already exists",
         )
 
+    invalidate_media_cache(media.workspace_id, media.id)
+    invalidate_media_count(media.workspace_id)
     db.refresh(media)
     return media
@@ -0,0 +1,198 @@
+"""Workspace membership and role resolution.
+
+Every workspace-scoped route asks for the caller's role in the workspace.
+Roles are cached per ``(workspace_id, user_id)`` for MEMBERSHIP_CACHE_SECONDS
+in an LRU of MEMBERSHIP_CACHE_MAX_ITEMS entries, normalised to lower case;
+non-members are not cached. ``warm_user_roles`` loads all of a user's roles
+with one query, which login does so the first requests after it are hits.
+
+Any flush that adds, changes or removes a membership (or deletes a
+workspace) drops the affected entries once the transaction commits, in this
+worker and, through ``services.invalidation_service``, optionally in all
+others.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.config import MEMBERSHIP_CACHE_MAX_ITEMS, MEMBERSHIP_CACHE_SECONDS
+from models.workspace import Workspace, WorkspaceMember
+from services.invalidation_service import publish, register
+
+
+@dataclass(frozen=True)
+class Membership:
+    """The caller's resolved membership, as returned by the permission dependencies."""
+
+    workspace_id: int
+    user_id: int
+    role: str
+
+
+_lock = threading.Lock()
+# (workspace id, user id) -> (role, expiry on the monotonic clock)
+_cache: OrderedDict[tuple[int, int], tuple[str, float]] = OrderedDict()
+# bumped by every invalidation, so a lookup that raced one does not cache
+# the role it read before the change
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def membership_cache_metrics() -> dict:
+    with _lock:
+        return {"entries": len(_cache), **_stats}
+
+
+def normalize_role(role: str | None) -> str:
+    return (role or "").strip().lower()
+
+
+def _store(roles: dict[tuple[int, int], str], seen_generation: int) -> None:
+    if MEMBERSHIP_CACHE_SECONDS <= 0 or MEMBERSHIP_CACHE_MAX_ITEMS <= 0:
+        return
+    expires_at = time.monotonic() + MEMBERSHIP_CACHE_SECONDS
+    with _lock:
+        if _generation != seen_generation:
+            return
+        for key, role in roles.items():
+            _cache[key] = (role, expires_at)
+            _cache.move_to_end(key)
+        while len(_cache) > MEMBERSHIP_CACHE_MAX_ITEMS:
+            _cache.popitem(last=False)
+
+
+def _cached_role(key: tuple[int, int]) -> tuple[str | None, int]:
+    """The cached role (None on a miss) and the generation to store a fetched one under."""
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[0], _generation
+        _stats["misses"] += 1
+        return None, _generation
+
+
+def _role_query(workspace_id: int, user_id: int):
+    return select(WorkspaceMember.role).where(
+        WorkspaceMember.workspace_id == workspace_id,
+        WorkspaceMember.user_id == user_id,
+    )
+
+
+def _fetched(key: tuple[int, int], role: str | None, seen_generation: int) -> str | None:
+    if role is None:
+        return None
+    role = normalize_role(role)
+    _store({key: role}, seen_generation)
+    return role
+
+
+def member_role(db: Session, workspace_id: int, user_id: int) -> str | None:
+    """The user's normalised role in the workspace, or None if not a member."""
+    key = (workspace_id, user_id)
+    role, seen_generation = _cached_role(key)
+    if role is not None:
+        return role
+    return _fetched(key, db.scalar(_role_query(workspace_id, user_id)), seen_generation)
+
+
+async def member_role_async(db: AsyncSession, workspace_id: int, user_id: int) -> str | None:
+    """``member_role`` for async routes."""
+    key = (workspace_id, user_id)
+    role, seen_generation = _cached_role(key)
+    if role is not None:
+        return role
+    return _fetched(key, await db.scalar(_role_query(workspace_id, user_id)), seen_generation)
+
+
+def resolve_membership(db: Session, workspace_id: int, user_id: int) -> Membership | None:
+    role = member_role(db, workspace_id, user_id)
+    if role is None:
+        return None
+    return Membership(workspace_id=workspace_id, user_id=user_id, role=role)
+
+
+async def resolve_membership_async(db: AsyncSession, workspace_id: int, user_id: int) -> Membership | None:
+    role = await member_role_async(db, workspace_id, user_id)
+    if role is None:
+        return None
+    return Membership(workspace_id=workspace_id, user_id=user_id, role=role)
+
+
+def warm_user_roles(db: Session, user_id: int) -> dict[int, str]:
+    """Cache the user's roles in all of their workspaces; returns them by workspace id."""
+    with _lock:
+        seen_generation = _generation
+    rows = (
+        db.query(WorkspaceMember.workspace_id, WorkspaceMember.role)
+        .filter(WorkspaceMember.user_id == user_id)
+        .limit(MEMBERSHIP_CACHE_MAX_ITEMS)
+        .all()
+    )
+    roles = {row.workspace_id: normalize_role(row.role) for row in rows}
+    _store({(workspace_id, user_id): role for workspace_id, role in roles.items()}, seen_generation)
+    return roles
+
+
+def invalidate(workspace_id: int, user_id: int | None = None) -> None:
+    """Drop a cached role, or all roles in the workspace when ``user_id`` is None."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _stats["invalidations"] += 1
+        if user_id is not None:
+            _cache.pop((workspace_id, user_id), None)
+            return
+        for key in [key for key in _cache if key[0] == workspace_id]:
+            del _cache[key]
+
+
+def clear() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# invalidation on commit
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_memberships(session: Session, flush_context) -> None:
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WorkspaceMember) and obj.workspace_id is not None:
+            changed.add((obj.workspace_id, obj.user_id))
+        elif isinstance(obj, Workspace) and obj in session.deleted and obj.id is not None:
+            changed.add((obj.id, None))
+    if not changed:
+        return
+    session.info.setdefault("changed_memberships", set()).update(changed)
+    for workspace_id, user_id in changed:
+        publish(session, "member", f"{workspace_id}:{'*' if user_id is None else user_id}")
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_memberships(session: Session) -> None:
+    for workspace_id, user_id in session.info.pop("changed_memberships", ()):
+        invalidate(workspace_id, user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_memberships(session: Session) -> None:
+    session.info.pop("changed_memberships", None)
+
+
+def _on_published(payload: str) -> None:
+    workspace_id, _, user_id = payload.partition(":")
+    invalidate(int(workspace_id), None if user_id == "*" else int(user_id))
+
+
+register("member", _on_published, clear)
@@ -0,0 +1,126 @@
+"""Cache of authenticated principals in front of ``get_current_user``.
+
+Every authenticated request used to decode its bearer token and load the user
+row. Both results are kept here per token, for at most
+PRINCIPAL_CACHE_SECONDS and never past the token's own expiry, in an LRU of
+PRINCIPAL_CACHE_MAX_ITEMS entries. The cached value is a detached snapshot of
+the row's columns; each request gets its own copy merged into its session
+without a query, so routes can keep modifying and committing ``current_user``
+as before.
+
+Any flush that updates or deletes a user drops that user's entries once the
+transaction commits, in this worker and, through
+``services.invalidation_service``, optionally in all others.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from core.config import PRINCIPAL_CACHE_MAX_ITEMS, PRINCIPAL_CACHE_SECONDS
+from models.user import User
+from services.invalidation_service import publish, register
+
+_lock = threading.Lock()
+# token -> (user id, detached User snapshot, expiry on the wall clock)
+_cache: OrderedDict[str, tuple[int, User, float]] = OrderedDict()
+# bumped by every invalidation, so a lookup that raced one does not cache
+# the row it read before the change
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def principal_cache_metrics() -> dict:
+    with _lock:
+        return {"entries": len(_cache), **_stats}
+
+
+def generation() -> int:
+    """Pass to ``store`` to detect invalidations during the lookup."""
+    with _lock:
+        return _generation
+
+
+def lookup(db: Session, token: str) -> User | None:
+    """The cached principal for ``token``, merged into ``db``; None on a miss."""
+    now = time.time()
+    with _lock:
+        entry = _cache.get(token)
+        if entry is None or entry[2] <= now:
+            if entry is not None:
+                del _cache[token]
+            _stats["misses"] += 1
+            return None
+        _cache.move_to_end(token)
+        _stats["hits"] += 1
+        snapshot = entry[1]
+    return db.merge(snapshot, load=False)
+
+
+def store(token: str, user: User, token_expires_at: float, seen_generation: int) -> None:
+    """Cache ``user`` (as loaded for ``token``) unless it was invalidated since ``seen_generation``."""
+    if PRINCIPAL_CACHE_SECONDS <= 0 or PRINCIPAL_CACHE_MAX_ITEMS <= 0:
+        return
+    snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    expires_at = min(time.time() + PRINCIPAL_CACHE_SECONDS, token_expires_at)
+    with _lock:
+        if _generation != seen_generation:
+            return
+        _cache[token] = (user.id, snapshot, expires_at)
+        _cache.move_to_end(token)
+        while len(_cache) > PRINCIPAL_CACHE_MAX_ITEMS:
+            _cache.popitem(last=False)
+
+
+def invalidate(user_ids) -> None:
+    """Drop the cached principals of ``user_ids`` in this process."""
+    global _generation
+    user_ids = set(user_ids)
+    with _lock:
+        _generation += 1
+        _stats["invalidations"] += 1
+        for token in [token for token, entry in _cache.items() if entry[0] in user_ids]:
+            del _cache[token]
+
+
+def clear() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# invalidation on commit
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:
+    changed = {
+        obj.id
+        for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    }
+    if not changed:
+        return
+    session.info.setdefault("changed_user_ids", set()).update(changed)
+    for user_id in changed:
+        publish(session, "user", str(user_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    changed = session.info.pop("changed_user_ids", None)
+    if changed:
+        invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop("changed_user_ids", None)
+
+
+register("user", lambda payload: invalidate({int(payload)}), clear)
@@ -0,0 +1,251 @@
+"""Background integrity scrubbing of stored blobs.
+
+Each blob is read back in full, decrypted (which authenticates every
+segment), decompressed and hashed, and the result is compared with the
+SHA-256 and size recorded at upload time. Failures are kept in
+``blob_integrity_failures``, one row per blob, so corruption shows up there
+instead of in the middle of somebody's download; a row disappears once its
+blob verifies again or is deleted.
+
+The job walks blobs in id order a batch per tick, reading at most
+SCRUB_MAX_BYTES_PER_SECOND. Its position is stored in ``scrub_state``, so a
+restart resumes mid-pass, and a lease on that row keeps several workers from
+scrubbing at the same time.
+
+Runs in the background every SCRUB_INTERVAL_SECONDS; ``python -m
+services.scrub_service`` runs a full pass (``--status`` only reports).
+"""
+import hashlib
+import logging
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.blob_crypto import BlobDecryptionError, BlobReader
+from core.codecs import DecompressionError, DecompressionLimitExceeded, iter_decompressed
+from core.config import SCRUB_BATCH_SIZE, SCRUB_MAX_BYTES_PER_SECOND
+from core.io_budget import IOBudget
+from db.database import SessionLocal
+from models.blob import Blob
+from models.integrity import BlobIntegrityFailure, ScrubState
+from services.workspace_key_service import workspace_data_key
+from storage import get_backend
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "blobs"
+# long enough to cover one batch of large blobs at the configured rate
+LEASE = timedelta(hours=1)
+
+_stats_lock = threading.Lock()
+_stats = {"checked_blobs": 0, "checked_bytes": 0, "failures": 0}
+
+
+def scrub_metrics() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(**deltas: int) -> None:
+    with _stats_lock:
+        for name, delta in deltas.items():
+            _stats[name] += delta
+
+
+def _aware(value: datetime | None) -> datetime | None:
+    # SQLite hands back naive datetimes
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _metered(chunks, budget: IOBudget):
+    for stored in chunks:
+        budget.consume(len(stored))
+        _count(checked_bytes=len(stored))
+        yield stored
+
+
+def verify_blob(blob: Blob, budget: IOBudget) -> tuple[str, str] | None:
+    """Check one blob; returns None when intact, else ``(kind, detail)``."""
+    if blob.workspace_id is not None:
+        try:
+            data_key = workspace_data_key(blob.workspace_id)
+        except HTTPException:
+            # workspace deleted: its blobs are unreadable by design until purged
+            return None
+    else:
+        data_key = None
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with get_backend(blob.backend).open(blob.storage_key) as f:
+            stored = _metered(BlobReader(f, data_key).iter_range(), budget)
+            # stops as soon as the output passes the recorded size
+            for plain in iter_decompressed(blob.codec, stored, blob.size_bytes):
+                digest.update(plain)
+                size += len(plain)
+    except FileNotFoundError:
+        return "missing", f"{blob.backend}:{blob.storage_key} not found"
+    except BlobDecryptionError as exc:
+        return "decrypt", str(exc)
+    except DecompressionError as exc:
+        return "decode", str(exc) or type(exc).__name__
+    except DecompressionLimitExceeded as exc:
+        return "size", str(exc)
+
+    if size != blob.size_bytes:
+        return "size", f"expected {blob.size_bytes} bytes, got {size}"
+    if digest.hexdigest() != blob.sha256:
+        return "checksum", f"expected {blob.sha256}, got {digest.hexdigest()}"
+    return None
+
+
+def _record(db: Session, blob: Blob, failure: tuple[str, str] | None) -> None:
+    # the blob may have been deleted or repointed (rotation, migration) while
+    # it was being read; a stale result says nothing about the current content
+    current = (
+        db.query(Blob.id)
+        .filter_by(id=blob.id, backend=blob.backend, storage_key=blob.storage_key)
+        .first()
+    )
+    if current is None:
+        return
+    existing = db.query(BlobIntegrityFailure).filter_by(blob_id=blob.id).first()
+    if failure is None:
+        if existing is not None:
+            logger.info("Blob %s verifies again", blob.id)
+            db.delete(existing)
+        return
+
+    kind, detail = failure
+    logger.error("Blob %s failed verification (%s): %s", blob.id, kind, detail)
+    _count(failures=1)
+    now = datetime.now(timezone.utc)
+    if existing is None:
+        db.add(BlobIntegrityFailure(blob_id=blob.id, kind=kind, detail=detail, first_detected_at=now, last_checked_at=now))
+    else:
+        existing.kind = kind
+        existing.detail = detail
+        existing.last_checked_at = now
+
+
+def _claim(db: Session) -> ScrubState | None:
+    """Take the scrub lease; None when another worker holds it."""
+    now = datetime.now(timezone.utc)
+    state = db.query(ScrubState).filter_by(name=STATE_NAME).with_for_update().first()
+    if state is None:
+        state = ScrubState(name=STATE_NAME, cursor=0, checked_in_pass=0, passes_completed=0, pass_started_at=now)
+        db.add(state)
+    elif _aware(state.lease_expires_at) is not None and _aware(state.lease_expires_at) > now:
+        db.rollback()
+        return None
+    state.lease_expires_at = now + LEASE
+    try:
+        db.commit()
+    except IntegrityError:
+        # another worker created the row first
+        db.rollback()
+        return None
+    return state
+
+
+def scrub_batch(db: Session, budget: IOBudget, batch_size: int = SCRUB_BATCH_SIZE) -> int | None:
+    """Verify the next ``batch_size`` blobs of the current pass.
+
+    Returns how many were checked, or None when another worker holds the
+    lease. The cursor is saved after every blob.
+    """
+    state = _claim(db)
+    if state is None:
+        return None
+
+    blobs = (
+        db.query(Blob)
+        .filter(Blob.id > state.cursor)
+        .order_by(Blob.id)
+        .limit(batch_size)
+        .all()
+    )
+    # keep the loaded rows usable without holding a transaction open while
+    # the content is read
+    for blob in blobs:
+        db.expunge(blob)
+    db.rollback()
+    try:
+        for blob in blobs:
+            failure = verify_blob(blob, budget)
+            _record(db, blob, failure)
+            state.cursor = blob.id
+            state.checked_in_pass += 1
+            state.lease_expires_at = datetime.now(timezone.utc) + LEASE
+            db.commit()
+            _count(checked_blobs=1)
+
+        if len(blobs) < batch_size:
+            now = datetime.now(timezone.utc)
+            logger.info("Scrub pass complete: %d blobs checked", state.checked_in_pass)
+            state.cursor = 0
+            state.checked_in_pass = 0
+            state.passes_completed += 1
+            state.last_pass_completed_at = now
+            state.pass_started_at = now
+            db.commit()
+    finally:
+        db.rollback()
+        state.lease_expires_at = None
+        db.commit()
+    return len(blobs)
+
+
+def scrub_status(db: Session) -> dict:
+    """Progress of the current pass and the recorded failures per kind."""
+    state = db.query(ScrubState).filter_by(name=STATE_NAME).first()
+    total = db.query(func.count(Blob.id)).scalar()
+    failures = dict(
+        db.query(BlobIntegrityFailure.kind, func.count(BlobIntegrityFailure.id))
+        .group_by(BlobIntegrityFailure.kind)
+        .all()
+    )
+    status = {
+        "total_blobs": total,
+        "cursor": state.cursor if state else 0,
+        "checked_in_pass": state.checked_in_pass if state else 0,
+        "pass_started_at": state.pass_started_at if state else None,
+        "last_pass_completed_at": state.last_pass_completed_at if state else None,
+        "passes_completed": state.passes_completed if state else 0,
+        "failures": failures,
+    }
+    db.rollback()
+    return status
+
+
+def run_scrub() -> None:
+    """Background entry point: verify one batch per tick."""
+    db = SessionLocal()
+    try:
+        scrub_batch(db, IOBudget(SCRUB_MAX_BYTES_PER_SECOND))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        if "--status" not in sys.argv[1:]:
+            io_budget = IOBudget(SCRUB_MAX_BYTES_PER_SECOND)
+            passes = scrub_status(session)["passes_completed"]
+            while scrub_status(session)["passes_completed"] == passes:
+                if scrub_batch(session, io_budget) is None:
+                    logger.info("Another worker is scrubbing, try again later")
+                    break
+        logger.info("Status: %s", scrub_status(session))
+    finally:
+        session.close()
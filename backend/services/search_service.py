@@ -0,0 +1,74 @@
+"""Ranked media search.
+
+On PostgreSQL this uses the indexes from migration e8f9a0b1c2d3:
+
+* ``media.search_vector``: a generated tsvector over filename, tags and
+  description (weighted in that order). Every query word is matched as a
+  prefix, so "rep 2024" finds "Report_2024_final.pdf".
+* a pg_trgm GIN index on ``original_filename`` for fuzzy matches
+  (``word_similarity``), which catches typos such as "reprot".
+
+The column is maintained by the database and not mapped on ``Media``.
+Other databases (local SQLite setups) fall back to an unranked substring
+match over the same fields.
+"""
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, literal, literal_column, or_
+from sqlalchemy.orm import Query
+
+from models.media import Media
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+search_vector = literal_column("media.search_vector")
+
+
+def prefix_tsquery(q: str) -> str:
+    """``to_tsquery`` input requiring every word of ``q`` as a prefix."""
+    words = _WORD_RE.findall(q.lower())
+    if not words:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def search_media(query: Query, q: str) -> Query:
+    """Narrow a Media query to matches for ``q``, best first.
+
+    Returns a query of ``(Media, score)`` rows.
+    """
+    q = q.strip()
+    tsquery_text = prefix_tsquery(q)
+    if query.session.get_bind().dialect.name != "postgresql":
+        pattern = f"%{q}%"
+        score = case((Media.original_filename.ilike(f"{q}%"), 1.0), else_=0.5)
+        return (
+            query.add_columns(score.label("score"))
+            .filter(
+                or_(
+                    Media.original_filename.ilike(pattern),
+                    Media.description.ilike(pattern),
+                    Media.tags.ilike(pattern),
+                )
+            )
+            .order_by(score.desc(), Media.id.desc())
+        )
+
+    tsquery = func.to_tsquery("simple", tsquery_text)
+    text = literal(q)
+    score = (
+        func.ts_rank_cd(search_vector, tsquery)
+        + func.word_similarity(text, Media.original_filename)
+    )
+    return (
+        query.add_columns(score.label("score"))
+        .filter(
+            or_(
+                search_vector.op("@@")(tsquery),
+                # word_similarity above pg_trgm.word_similarity_threshold
+                text.op("<%")(Media.original_filename),
+            )
+        )
+        .order_by(score.desc(), Media.id.desc())
+    )
@@ -0,0 +1,114 @@
+"""Moves blobs onto the configured storage backend without downtime.
+
+Each blob is copied while its row is locked, the row is repointed and
+committed, and only then is the old copy deleted; readers always find the
+content at whichever location the row names. Rows locked by an upload or
+delete are skipped and picked up on a later pass.
+
+Run once to completion with ``python -m services.storage_migration_service``
+or in the background via STORAGE_MIGRATE_INTERVAL_SECONDS.
+"""
+import logging
+
+from sqlalchemy.orm import Session
+
+from core.config import STORAGE_MIGRATE_BATCH_SIZE
+from db.database import SessionLocal
+from models.blob import Blob
+from models.media import Media
+from storage import StorageBackend, default_backend, get_backend
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_batch(
+    db: Session,
+    target: StorageBackend,
+    after_id: int = 0,
+    batch_size: int = STORAGE_MIGRATE_BATCH_SIZE,
+) -> tuple[int, int | None]:
+    """Move up to ``batch_size`` blobs with ``id > after_id`` onto ``target``.
+
+    Returns the number moved and the last id examined (None once every blob
+    has been visited), to be passed as ``after_id`` on the next call.
+    """
+    ids = [
+        row.id
+        for row in db.query(Blob.id)
+        .filter(Blob.backend != target.name, Blob.id > after_id)
+        .order_by(Blob.id)
+        .limit(batch_size)
+        .all()
+    ]
+    db.rollback()
+
+    moved = 0
+    for blob_id in ids:
+        blob = (
+            db.query(Blob)
+            .filter_by(id=blob_id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if blob is None or blob.backend == target.name:
+            db.rollback()
+            continue
+
+        source = get_backend(blob.backend)
+        old_key = blob.storage_key
+        new_key = target.new_key()
+        try:
+            with source.open(old_key) as src:
+                target.put_stream(src, new_key)
+        except FileNotFoundError:
+            db.rollback()
+            logger.warning("Blob %s missing at %s:%s, not migrated", blob_id, source.name, old_key)
+            continue
+
+        blob.backend = target.name
+        blob.storage_key = new_key
+        # legacy rows still carry the old flat location; it is no longer valid
+        db.query(Media).filter_by(blob_id=blob_id).update(
+            {Media.stored_filename: None, Media.stored_path: None},
+            synchronize_session=False,
+        )
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            target.delete(new_key)
+            raise
+        source.delete(old_key)
+        moved += 1
+    return moved, (ids[-1] if ids else None)
+
+
+_cursor = 0
+
+
+def run_storage_migration() -> None:
+    """Background entry point: migrate one batch per tick, wrapping around at the end."""
+    global _cursor
+    db = SessionLocal()
+    try:
+        moved, last_id = migrate_batch(db, default_backend(), after_id=_cursor)
+        _cursor = last_id or 0
+        if moved:
+            logger.info("Migrated %d blobs to %s storage", moved, default_backend().name)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    target_backend = default_backend()
+    total, cursor = 0, 0
+    try:
+        while cursor is not None:
+            moved_now, cursor = migrate_batch(session, target_backend, after_id=cursor)
+            total += moved_now
+            logger.info("Migrated %d blobs so far", total)
+    finally:
+        session.close()
+    logger.info("Done, %d blobs now on %s storage", total, target_backend.name)
@@ -0,0 +1,356 @@
+"""Reconciles stored content with the rows that reference it.
+
+Content goes astray in a few ways: media rows removed by a database cascade
+(as workspace deletion did before it released media itself) never drop
+their blob references, and an upload whose commit fails after the content
+was written leaves the file behind. A pass runs three steps:
+
+* blobs: ``ref_count`` is recounted where it disagrees with the media table;
+  blobs nothing references any more are deleted and their content queued
+  for removal.
+* storage: every backend's keys are compared with the rows naming them. The
+  sharded local layout and S3 list keys in byte order, so the listing and the
+  blobs table (walked in the same order) are merged batch by batch; the flat
+  legacy directory is unordered and is checked in chunks instead. Keys no row
+  references are orphans and are deleted once older than
+  STORAGE_RECONCILE_GRACE_SECONDS, since uploads write content before
+  committing its row. Rows whose content is gone are reported as missing.
+* staging: staged uploads abandoned for longer than the grace period are removed.
+
+Memory use is bounded by the batch size, however many files are stored.
+
+Run once with ``python -m services.storage_reconcile_service [--dry-run]`` or
+in the background via STORAGE_RECONCILE_INTERVAL_SECONDS.
+"""
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from typing import Iterator
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import (
+    STORAGE_RECONCILE_BATCH_SIZE,
+    STORAGE_RECONCILE_GRACE_SECONDS,
+    STORAGE_STAGING_DIR,
+)
+from db.database import SessionLocal
+from models.blob import Blob
+from models.media import Media
+from services.blob_service import blob_location
+from services.deletion_service import enqueue_deletion
+from storage import LEGACY_BACKEND, StorageBackend, default_backend, get_backend
+
+logger = logging.getLogger(__name__)
+
+# how many orphaned/missing keys a report lists by name
+SAMPLE_SIZE = 20
+
+
+@dataclass
+class ReconcileReport:
+    """Outcome of a pass; in a dry run the counters say what would have been done."""
+
+    dry_run: bool = False
+    scanned_keys: int = 0
+    orphans: int = 0
+    orphans_deleted: int = 0
+    missing: int = 0
+    blobs_repaired: int = 0
+    blobs_released: int = 0
+    staging_deleted: int = 0
+    orphan_samples: list[str] = field(default_factory=list)
+    missing_samples: list[str] = field(default_factory=list)
+
+    def add_orphan(self, backend: str, key: str) -> None:
+        self.orphans += 1
+        if len(self.orphan_samples) < SAMPLE_SIZE:
+            self.orphan_samples.append(f"{backend}:{key}")
+
+    def add_missing(self, backend: str, key: str) -> None:
+        self.missing += 1
+        if len(self.missing_samples) < SAMPLE_SIZE:
+            self.missing_samples.append(f"{backend}:{key}")
+
+
+def _chunks(items: Iterator, size: int) -> Iterator[list]:
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def _byte_order(db: Session, column):
+    # Postgres compares text by locale; backends list keys byte-wise
+    if db.get_bind().dialect.name == "postgresql":
+        return column.collate("C")
+    return column
+
+
+# ---------------------------------------------------------------------------
+# blobs
+
+
+def _repair_blob(db: Session, blob_id: int, report: ReconcileReport) -> None:
+    # an upload or delete holding the row will leave it consistent itself
+    blob = db.query(Blob).filter_by(id=blob_id).with_for_update(skip_locked=True).first()
+    if blob is None:
+        db.rollback()
+        return
+    refs = db.query(func.count(Media.id)).filter(Media.blob_id == blob_id).scalar()
+    if refs == blob.ref_count:
+        db.rollback()
+        return
+
+    if refs:
+        report.blobs_repaired += 1
+        if report.dry_run:
+            db.rollback()
+            return
+        blob.ref_count = refs
+        db.commit()
+        return
+
+    report.blobs_released += 1
+    if report.dry_run:
+        db.rollback()
+        return
+    enqueue_deletion(db, blob_location(blob))
+    db.delete(blob)
+    db.commit()
+
+
+def repair_blob_refs(db: Session, report: ReconcileReport, batch_size: int) -> None:
+    """Recount blob references and release blobs left without any."""
+    after_id = 0
+    while True:
+        rows = (
+            db.query(Blob.id, Blob.ref_count)
+            .filter(Blob.id > after_id)
+            .order_by(Blob.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            db.rollback()
+            return
+        after_id = rows[-1].id
+        counts = dict(
+            db.query(Media.blob_id, func.count(Media.id))
+            .filter(Media.blob_id.in_([row.id for row in rows]))
+            .group_by(Media.blob_id)
+            .all()
+        )
+        db.rollback()
+        for row in rows:
+            if counts.get(row.id, 0) != row.ref_count:
+                _repair_blob(db, row.id, report)
+
+
+# ---------------------------------------------------------------------------
+# storage
+
+
+def _stored_keys(backend: StorageBackend, report: ReconcileReport) -> Iterator[str]:
+    for key in backend.iter_keys():
+        # buckets may be shared with other objects; blobs are always *.enc
+        if key.endswith(".enc"):
+            report.scanned_keys += 1
+            yield key
+
+
+def _recorded_keys(db: Session, backend: str, batch_size: int) -> Iterator[str]:
+    """Storage keys of the blobs on ``backend``, in byte order, fetched in batches."""
+    column = _byte_order(db, Blob.storage_key)
+    after = ""
+    while True:
+        keys = [
+            row.storage_key
+            for row in db.query(Blob.storage_key)
+            .filter(Blob.backend == backend, column > after)
+            .order_by(column)
+            .limit(batch_size)
+            .all()
+        ]
+        db.rollback()
+        if not keys:
+            return
+        yield from keys
+        after = keys[-1]
+
+
+def _orphan(backend: StorageBackend, key: str, report: ReconcileReport, cutoff: float) -> None:
+    report.add_orphan(backend.name, key)
+    if report.dry_run:
+        return
+    modified = backend.modified_at(key)
+    if modified is None or modified > cutoff:
+        # gone already, or possibly an upload that has not committed yet
+        return
+    backend.delete(key)
+    report.orphans_deleted += 1
+
+
+def _missing(db: Session, backend: StorageBackend, key: str, report: ReconcileReport) -> None:
+    # the listing and the table are read at different moments: confirm
+    # against both before reporting
+    if backend.exists(key):
+        return
+    still_recorded = (
+        db.query(Blob.id).filter_by(backend=backend.name, storage_key=key).first() is not None
+        or (
+            backend.name == LEGACY_BACKEND
+            and db.query(Media.id).filter(Media.blob_id.is_(None), Media.stored_filename == key).first() is not None
+        )
+    )
+    db.rollback()
+    if still_recorded:
+        report.add_missing(backend.name, key)
+        logger.warning("Stored content missing at %s:%s", backend.name, key)
+
+
+def _reconcile_sorted(
+    db: Session, backend: StorageBackend, report: ReconcileReport, cutoff: float, batch_size: int
+) -> None:
+    stored = _stored_keys(backend, report)
+    recorded = _recorded_keys(db, backend.name, batch_size)
+    key = next(stored, None)
+    row_key = next(recorded, None)
+    while key is not None or row_key is not None:
+        if row_key is None or (key is not None and key < row_key):
+            _orphan(backend, key, report, cutoff)
+            key = next(stored, None)
+        elif key is None or row_key < key:
+            _missing(db, backend, row_key, report)
+            row_key = next(recorded, None)
+        else:
+            key = next(stored, None)
+            row_key = next(recorded, None)
+
+
+def _legacy_media_keys(db: Session, batch_size: int) -> Iterator[str]:
+    """Stored filenames of media rows from before the blob store."""
+    after_id = 0
+    while True:
+        rows = (
+            db.query(Media.id, Media.stored_filename)
+            .filter(Media.blob_id.is_(None), Media.stored_filename.isnot(None), Media.id > after_id)
+            .order_by(Media.id)
+            .limit(batch_size)
+            .all()
+        )
+        db.rollback()
+        if not rows:
+            return
+        yield from (row.stored_filename for row in rows)
+        after_id = rows[-1].id
+
+
+def _reconcile_unsorted(
+    db: Session, backend: StorageBackend, report: ReconcileReport, cutoff: float, batch_size: int
+) -> None:
+    legacy = backend.name == LEGACY_BACKEND
+    for chunk in _chunks(_stored_keys(backend, report), batch_size):
+        known = {
+            row.storage_key
+            for row in db.query(Blob.storage_key).filter(Blob.backend == backend.name, Blob.storage_key.in_(chunk))
+        }
+        if legacy:
+            known.update(
+                row.stored_filename
+                for row in db.query(Media.stored_filename).filter(
+                    Media.blob_id.is_(None), Media.stored_filename.in_(chunk)
+                )
+            )
+        db.rollback()
+        for key in chunk:
+            if key not in known:
+                _orphan(backend, key, report, cutoff)
+
+    # without an ordered listing, rows are checked against storage one by one
+    for key in _recorded_keys(db, backend.name, batch_size):
+        if not backend.exists(key):
+            _missing(db, backend, key, report)
+    if legacy:
+        for key in _legacy_media_keys(db, batch_size):
+            if not backend.exists(key):
+                _missing(db, backend, key, report)
+
+
+def reconcile_backend(
+    db: Session, backend: StorageBackend, report: ReconcileReport, cutoff: float, batch_size: int
+) -> None:
+    """Delete orphans older than ``cutoff`` (a timestamp) and report missing content on ``backend``."""
+    if backend.keys_sorted:
+        _reconcile_sorted(db, backend, report, cutoff, batch_size)
+    else:
+        _reconcile_unsorted(db, backend, report, cutoff, batch_size)
+
+
+# ---------------------------------------------------------------------------
+# staging
+
+
+def sweep_staging(report: ReconcileReport, cutoff: float) -> None:
+    """Remove staged uploads last written before ``cutoff``."""
+    with os.scandir(STORAGE_STAGING_DIR) as entries:
+        for entry in entries:
+            # directories hold upload session spools, which expire on their own
+            if not entry.is_file():
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                if not report.dry_run:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            report.staging_deleted += 1
+
+
+def _backends(db: Session) -> list[StorageBackend]:
+    names = {LEGACY_BACKEND, default_backend().name}
+    names.update(row.backend for row in db.query(Blob.backend).distinct())
+    db.rollback()
+    return [get_backend(name) for name in sorted(names)]
+
+
+def reconcile_storage(
+    db: Session,
+    *,
+    dry_run: bool = False,
+    grace_seconds: float = STORAGE_RECONCILE_GRACE_SECONDS,
+    batch_size: int = STORAGE_RECONCILE_BATCH_SIZE,
+) -> ReconcileReport:
+    """Run a full reconciliation pass over every backend in use."""
+    report = ReconcileReport(dry_run=dry_run)
+    cutoff = time.time() - grace_seconds
+    repair_blob_refs(db, report, batch_size)
+    for backend in _backends(db):
+        reconcile_backend(db, backend, report, cutoff, batch_size)
+    sweep_staging(report, cutoff)
+    return report
+
+
+def run_storage_reconcile() -> None:
+    """Background entry point: one full pass per tick."""
+    db = SessionLocal()
+    try:
+        report = reconcile_storage(db)
+    finally:
+        db.close()
+    if report.orphans or report.missing or report.blobs_repaired or report.blobs_released or report.staging_deleted:
+        logger.info("Storage reconciliation: %s", asdict(report))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        result = reconcile_storage(session, dry_run="--dry-run" in sys.argv[1:])
+    finally:
+        session.close()
+    for name, value in asdict(result).items():
+        logger.info("%s: %s", name, value)
@@ -0,0 +1,126 @@
+"""Normalized media tags and their per-workspace counts.
+
+``Media.tags`` keeps the comma-joined form returned by the API, spelled as the
+client sent it; the ``media_tags`` rows and ``workspace_tag_counts`` are
+derived from it here, in the caller's transaction. Every write path (upload,
+update, delete) goes through ``set_media_tags`` / ``clear_media_tags``.
+"""
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from db.database import dialect_insert
+from models.media import Media
+from models.media_tag import MediaTag, WorkspaceTagCount
+
+MAX_TAG_LENGTH = 100
+
+
+def stored_tags(tags: str | list[str] | None) -> str | None:
+    """``Media.tags`` for the given tags: a string trimmed, a list comma-joined."""
+    if isinstance(tags, str):
+        return tags.strip() or None
+    return ",".join(tags) if tags is not None else None
+
+
+def normalize_tags(tags: str | list[str] | None) -> list[str]:
+    """Split, trim and deduplicate tags, keeping their order and spelling.
+
+    Raises 400 for a tag longer than ``MAX_TAG_LENGTH`` or when the stored
+    form would not fit ``Media.tags``.
+    """
+    if not tags:
+        return []
+    if len(stored_tags(tags) or "") > Media.tags.type.length:
+        raise HTTPException(status_code=400, detail="Too many tags")
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    result = []
+    for tag in tags:
+        tag = tag.strip()
+        if not tag or tag in result:
+            continue
+        if len(tag) > MAX_TAG_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Tags are limited to {MAX_TAG_LENGTH} characters")
+        result.append(tag)
+    return result
+
+
+def _adjust_counts(db: Session, workspace_id: int, deltas: Counter) -> None:
+    deltas = {tag: n for tag, n in deltas.items() if n}
+    if not deltas:
+        return
+    insert = dialect_insert(db)
+    # sorted so concurrent transactions lock counter rows in the same order
+    stmt = insert(WorkspaceTagCount).values(
+        [{"workspace_id": workspace_id, "tag": tag, "count": deltas[tag]} for tag in sorted(deltas)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WorkspaceTagCount.workspace_id, WorkspaceTagCount.tag],
+        set_={"count": WorkspaceTagCount.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+    if any(n < 0 for n in deltas.values()):
+        db.execute(
+            delete(WorkspaceTagCount).where(
+                WorkspaceTagCount.workspace_id == workspace_id,
+                WorkspaceTagCount.tag.in_([tag for tag, n in deltas.items() if n < 0]),
+                WorkspaceTagCount.count <= 0,
+            )
+        )
+
+
+def set_media_tags(db: Session, media: Media, tags: str | list[str] | None) -> None:
+    """Replace the tags of a flushed media row. Does not commit."""
+    new = normalize_tags(tags)
+    media.tags = stored_tags(tags)
+    old = set(db.scalars(select(MediaTag.tag).where(MediaTag.media_id == media.id)))
+
+    added = [tag for tag in new if tag not in old]
+    removed = old - set(new)
+    if removed:
+        db.execute(delete(MediaTag).where(MediaTag.media_id == media.id, MediaTag.tag.in_(removed)))
+    if added:
+        db.add_all(MediaTag(media_id=media.id, workspace_id=media.workspace_id, tag=tag) for tag in added)
+        db.flush()
+
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    _adjust_counts(db, media.workspace_id, deltas)
+
+
+def clear_media_tags(db: Session, media: Media) -> None:
+    """Drop the tags of a media row about to be deleted. Does not commit."""
+    old = list(db.scalars(select(MediaTag.tag).where(MediaTag.media_id == media.id)))
+    if not old:
+        return
+    db.execute(delete(MediaTag).where(MediaTag.media_id == media.id))
+    _adjust_counts(db, media.workspace_id, Counter({tag: -1 for tag in old}))
+
+
+def filter_by_tags(query, workspace_id: int, tags: list[str], match: str = "all"):
+    """Narrow a Media query to rows carrying all (or any) of ``tags``."""
+    tags = normalize_tags(tags)
+    if not tags:
+        return query
+    matching = select(MediaTag.media_id).where(
+        MediaTag.workspace_id == workspace_id,
+        MediaTag.tag.in_(tags),
+    )
+    if match == "all" and len(tags) > 1:
+        matching = matching.group_by(MediaTag.media_id).having(func.count() == len(tags))
+    return query.filter(Media.id.in_(matching))
+
+
+def tag_facets(db: Session, workspace_id: int, prefix: str | None = None, limit: int = 50) -> list[dict]:
+    """Most used tags of a workspace with their media counts."""
+    query = select(WorkspaceTagCount.tag, WorkspaceTagCount.count).where(
+        WorkspaceTagCount.workspace_id == workspace_id,
+        WorkspaceTagCount.count > 0,
+    )
+    if prefix:
+        query = query.where(WorkspaceTagCount.tag.startswith(prefix.strip(), autoescape=True))
+    query = query.order_by(WorkspaceTagCount.count.desc(), WorkspaceTagCount.tag).limit(limit)
+    return [{"tag": tag, "count": count} for tag, count in db.execute(query)]
@@ -0,0 +1,150 @@
+"""Refresh tokens and workspace role claims for access tokens.
+
+Access tokens are short-lived JWTs. Besides the user they carry the user's
+workspace roles as compact claims (``role_claims``), so the hot list routes
+can authorise from the token alone (``require_workspace_reader`` in
+``dependencies.permissions``); there a removal is seen once the client
+renews its access token. All other routes resolve the role from the
+database.
+
+Renewal uses an opaque refresh token, stored only as a SHA-256 hash. Each
+use replaces it with a new one of the same family. Presenting a replaced or
+revoked token again means it leaked: the whole family is revoked and the
+client has to log in again. Logging out revokes the family as well. Rows
+stay until they expire, which is what makes reuse detectable; the sweep
+(REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS) then deletes them.
+"""
+import hashlib
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from core.config import REFRESH_TOKEN_EXPIRE_DAYS, TOKEN_ROLE_CLAIMS_MAX
+from db.database import SessionLocal
+from models.refresh_token import RefreshToken
+from models.workspace import WorkspaceRole
+from services.permission_service import warm_user_roles
+
+logger = logging.getLogger(__name__)
+
+# one letter per role keeps the claims small in every request header
+ROLE_CODES = {
+    WorkspaceRole.OWNER.value: "o",
+    WorkspaceRole.ADMIN.value: "a",
+    WorkspaceRole.EDITOR.value: "e",
+    WorkspaceRole.REVIEWER.value: "r",
+    WorkspaceRole.VIEWER.value: "v",
+}
+ROLES_BY_CODE = {code: role for role, code in ROLE_CODES.items()}
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _invalid() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def role_claims(db: Session, user_id: int) -> dict[str, str]:
+    """``{workspace_id: role code}`` for the token, newest workspaces first.
+
+    Also warms the membership cache. Workspaces beyond TOKEN_ROLE_CLAIMS_MAX
+    are left out and authorised from the database instead.
+    """
+    roles = warm_user_roles(db, user_id)
+    recent = sorted(roles.items(), key=lambda item: item[0], reverse=True)[:TOKEN_ROLE_CLAIMS_MAX]
+    return {str(workspace_id): ROLE_CODES[role] for workspace_id, role in recent if role in ROLE_CODES}
+
+
+def claimed_role(claims: dict | None, workspace_id: int) -> str | None:
+    """The role the token claims in ``workspace_id``, if any."""
+    if not isinstance(claims, dict):
+        return None
+    return ROLES_BY_CODE.get(claims.get(str(workspace_id)))
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: str | None = None) -> str:
+    """Add a new refresh token for ``user_id``; committed by the caller."""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=_hash(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+def _revoke_family(db: Session, family_id: str, now: datetime) -> None:
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None),
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+
+
+def rotate_refresh_token(db: Session, token: str) -> tuple[int, str]:
+    """Exchange ``token`` for a new one; returns ``(user_id, new token)``.
+
+    Raises 401 for unknown, expired or revoked tokens; reuse of a replaced
+    token also revokes its family.
+    """
+    now = datetime.now(timezone.utc)
+    row = db.query(RefreshToken).filter_by(token_hash=_hash(token)).with_for_update().first()
+    if row is None or _aware(row.expires_at) <= now:
+        db.rollback()
+        raise _invalid()
+    if row.revoked_at is not None:
+        logger.warning("Revoked refresh token presented for user %s, revoking family %s", row.user_id, row.family_id)
+        _revoke_family(db, row.family_id, now)
+        db.commit()
+        raise _invalid()
+
+    row.revoked_at = now
+    new_token = issue_refresh_token(db, row.user_id, row.family_id)
+    user_id = row.user_id
+    db.commit()
+    return user_id, new_token
+
+
+def revoke_refresh_token(db: Session, token: str) -> None:
+    """Revoke the family of ``token`` (logout); unknown tokens are ignored."""
+    row = db.query(RefreshToken).filter_by(token_hash=_hash(token)).first()
+    if row is not None:
+        _revoke_family(db, row.family_id, datetime.now(timezone.utc))
+    db.commit()
+
+
+def sweep_refresh_tokens(db: Session) -> int:
+    """Delete expired refresh tokens; returns how many."""
+    removed = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.expires_at <= datetime.now(timezone.utc))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return removed
+
+
+def run_refresh_token_sweep() -> None:
+    """Background entry point."""
+    db = SessionLocal()
+    try:
+        removed = sweep_refresh_tokens(db)
+    finally:
+        db.close()
+    if removed:
+        logger.info("Deleted %d expired refresh tokens", removed)
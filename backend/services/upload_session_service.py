@@ -0,0 +1,354 @@
+"""Resumable uploads.
+
+Each chunk is streamed from the request body straight into its own encrypted
+spool file named after its offset; ``UploadSession.received_bytes`` only
+moves forward once a chunk is fully on disk, so a dropped connection costs at
+most the chunk in flight. Finalizing replays the spooled chunks through the
+regular ingestion pipeline (hash, compress, encrypt, deduplicate) and creates
+the Media row.
+"""
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from core.blob_crypto import BlobReader, SegmentEncryptor, seal_segments
+from core.config import (
+    STORAGE_STAGING_DIR,
+    UPLOAD_SESSION_MAX_CHUNK_SIZE,
+    UPLOAD_SESSION_MAX_SIZE,
+    UPLOAD_SESSION_TTL_SECONDS,
+)
+from core.executors import run_crypto, run_io
+from db.database import SessionLocal
+from models.media import Media
+from models.upload_session import UploadSession
+from services.media_service import create_media, store_stream
+from services.tag_service import normalize_tags, stored_tags
+from services.usage_service import check_quota_headroom
+
+logger = logging.getLogger(__name__)
+
+SPOOL_ROOT = os.path.join(STORAGE_STAGING_DIR, "sessions")
+# long enough to assemble the largest upload; a crashed completion can be
+# retried once it lapses
+FINALIZE_LEASE = timedelta(hours=1)
+
+
+def _spool_dir(session_id: str) -> str:
+    return os.path.join(SPOOL_ROOT, session_id)
+
+
+def _chunk_path(session_id: str, offset: int) -> str:
+    # zero-padded so a directory listing sorts chunks by offset
+    return os.path.join(_spool_dir(session_id), f"{offset:016d}.enc")
+
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+
+
+def _offset_conflict(session: UploadSession) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Chunk must start at offset {session.received_bytes}",
+        headers={"Upload-Offset": str(session.received_bytes)},
+    )
+
+
+def create_session(
+    db: Session,
+    *,
+    workspace_id: int,
+    user_id: int,
+    original_filename: str,
+    mime_type: str | None,
+    total_size: int | None,
+    description: str | None,
+    tags: str | None,
+) -> UploadSession:
+    if total_size is not None and not 0 < total_size <= UPLOAD_SESSION_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="Declared size exceeds the upload limit")
+    check_quota_headroom(db, workspace_id, size=total_size or 0)
+    normalize_tags(tags)  # reject bad tags before any chunk is sent
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        workspace_id=workspace_id,
+        created_by=user_id,
+        original_filename=original_filename,
+        mime_type=mime_type,
+        total_size=total_size,
+        description=description,
+        tags=stored_tags(tags),
+        received_bytes=0,
+        chunk_count=0,
+        expires_at=_expiry(),
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    os.makedirs(_spool_dir(session.id), exist_ok=True)
+    return session
+
+
+def get_session_or_404(
+    db: Session,
+    workspace_id: int,
+    session_id: str,
+    user_id: int,
+    *,
+    lock: bool = False,
+) -> UploadSession:
+    query = db.query(UploadSession).filter_by(id=session_id, workspace_id=workspace_id, created_by=user_id)
+    if lock:
+        query = query.with_for_update()
+    session = query.first()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    expires_at = session.expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    if expires_at <= datetime.now(timezone.utc):
+        raise HTTPException(status_code=404, detail="Upload session expired")
+    return session
+
+
+async def append_chunk(db: Session, session: UploadSession, offset: int, body: AsyncIterator[bytes]) -> UploadSession:
+    """Spool one chunk starting at ``offset`` and advance the session."""
+    conflict = _completed_conflict(session)
+    if conflict is not None:
+        raise conflict
+    if offset != session.received_bytes:
+        raise _offset_conflict(session)
+
+    limit = UPLOAD_SESSION_MAX_CHUNK_SIZE
+    if session.total_size is not None:
+        limit = min(limit, session.total_size - offset)
+    else:
+        limit = min(limit, UPLOAD_SESSION_MAX_SIZE - offset)
+
+    session_id = session.id
+    final_path = _chunk_path(session_id, offset)
+    part_path = final_path + ".part"
+    encryptor = SegmentEncryptor()
+    received = 0
+    out = await run_io(open, part_path, "wb")
+    try:
+        try:
+            async for data in body:
+                received += len(data)
+                if received > limit:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds the upload limit")
+                sealed = await run_crypto(seal_segments, *encryptor.plan(data), size=len(data))
+                await run_io(out.write, sealed)
+            await run_io(out.write, seal_segments(*encryptor.plan_final()))
+        finally:
+            await run_io(out.close)
+        if received == 0:
+            raise HTTPException(status_code=400, detail="Empty chunk")
+        return await run_io(_commit_chunk, db, session, offset, received, part_path, final_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            await run_io(os.remove, part_path)
+        raise
+
+
+def _commit_chunk(db: Session, session: UploadSession, offset: int, received: int, part_path: str, final_path: str) -> UploadSession:
+    # Re-check under a row lock: a concurrent request may have taken this
+    # offset while we were receiving.
+    workspace_id, session_id, created_by = session.workspace_id, session.id, session.created_by
+    db.rollback()
+    session = get_session_or_404(db, workspace_id, session_id, created_by, lock=True)
+    conflict = _completed_conflict(session)
+    if conflict is not None:
+        db.rollback()
+        raise conflict
+    if session.received_bytes != offset:
+        db.rollback()
+        raise _offset_conflict(session)
+    os.replace(part_path, final_path)
+
+    session.received_bytes = offset + received
+    session.chunk_count += 1
+    session.expires_at = _expiry()
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def _spooled_chunks(session: UploadSession) -> list[str]:
+    """Paths of the spooled chunks, validated to cover ``[0, received_bytes)``."""
+    names = sorted(n for n in os.listdir(_spool_dir(session.id)) if n.endswith(".enc"))
+    paths = []
+    expected = 0
+    for name in names:
+        offset = int(name[:-4])
+        if offset >= session.received_bytes:
+            # left behind by a chunk whose commit failed
+            continue
+        if offset != expected:
+            raise HTTPException(status_code=409, detail="Spooled upload is incomplete")
+        path = os.path.join(_spool_dir(session.id), name)
+        with open(path, "rb") as f:
+            expected += BlobReader(f).size
+        paths.append(path)
+    if expected != session.received_bytes:
+        raise HTTPException(status_code=409, detail="Spooled upload is incomplete")
+    return paths
+
+
+async def _iter_spooled(paths: list[str]) -> AsyncIterator[bytes]:
+    for path in paths:
+        f = await run_io(open, path, "rb")
+        try:
+            segments = BlobReader(f).iter_range()
+            while (segment := await run_io(next, segments, None)) is not None:
+                yield segment
+        finally:
+            await run_io(f.close)
+
+
+def _completing(session: UploadSession) -> bool:
+    until = session.completing_until
+    if until is None:
+        return False
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    return until > datetime.now(timezone.utc)
+
+
+def _completed_conflict(session: UploadSession) -> HTTPException | None:
+    if session.media_id is not None:
+        return HTTPException(status_code=409, detail="Upload already completed")
+    if _completing(session):
+        return HTTPException(status_code=409, detail="Upload is being completed", headers={"Retry-After": "5"})
+    return None
+
+
+def _claim_completion(db: Session, session: UploadSession) -> bool:
+    """Mark the session as completing; False when completed or claimed elsewhere.
+
+    A claimed session is reloaded, so it reflects chunks committed before.
+    """
+    now = datetime.now(timezone.utc)
+    claimed = (
+        db.query(UploadSession)
+        .filter(
+            UploadSession.id == session.id,
+            UploadSession.media_id.is_(None),
+            or_(UploadSession.completing_until.is_(None), UploadSession.completing_until <= now),
+        )
+        .update({UploadSession.completing_until: now + FINALIZE_LEASE}, synchronize_session=False)
+    )
+    db.commit()
+    if claimed != 1:
+        return False
+    db.refresh(session)
+    return True
+
+
+def _finish_completion(db: Session, session_id: str, media_id: int | None) -> None:
+    """Record the created media, or release the claim when ``media_id`` is None."""
+    db.rollback()
+    values = {UploadSession.completing_until: None}
+    if media_id is not None:
+        # kept for a while so a repeated completion finds the media
+        values.update({UploadSession.media_id: media_id, UploadSession.expires_at: _expiry()})
+    db.query(UploadSession).filter_by(id=session_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+def _completed_media(db: Session, session_id: str) -> Media:
+    """The media of a session whose completion could not be claimed."""
+    session = db.query(UploadSession).filter_by(id=session_id).first()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    media = db.get(Media, session.media_id) if session.media_id is not None else None
+    if media is None:
+        raise HTTPException(status_code=409, detail="Upload is being completed", headers={"Retry-After": "5"})
+    return media
+
+
+async def finalize_session(db: Session, session: UploadSession) -> Media:
+    """Assemble the upload into a Media row, once.
+
+    Completing an already completed session returns its media; while another
+    request is completing it, 409 is returned.
+    """
+    session_id = session.id
+    if not await run_io(_claim_completion, db, session):
+        return await run_io(_completed_media, db, session_id)
+
+    try:
+        if session.received_bytes == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+        if session.total_size is not None and session.received_bytes != session.total_size:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete: {session.received_bytes} of {session.total_size} bytes received",
+                headers={"Upload-Offset": str(session.received_bytes)},
+            )
+
+        paths = await run_io(_spooled_chunks, session)
+        stored = await store_stream(_iter_spooled(paths), session.mime_type, session.workspace_id)
+        media = await create_media(
+            db,
+            stored,
+            workspace_id=session.workspace_id,
+            uploaded_by=session.created_by,
+            original_filename=session.original_filename,
+            mime_type=session.mime_type,
+            description=session.description,
+            tags=session.tags,
+        )
+    except BaseException:
+        await run_io(_finish_completion, db, session_id, None)
+        raise
+    media_id = media.id
+    await run_io(_finish_completion, db, session_id, media_id)
+    await run_io(shutil.rmtree, _spool_dir(session_id), True)
+    return await run_io(db.get, Media, media_id)
+
+
+def abort_session(db: Session, session: UploadSession) -> None:
+    if _completing(session):
+        raise HTTPException(status_code=409, detail="Upload is being completed", headers={"Retry-After": "5"})
+    session_id = session.id
+    db.delete(session)
+    db.commit()
+    shutil.rmtree(_spool_dir(session_id), ignore_errors=True)
+
+
+def sweep_expired_sessions(db: Session) -> int:
+    """Delete expired sessions and their spooled chunks; returns how many went."""
+    now = datetime.now(timezone.utc)
+    expired = [row.id for row in db.query(UploadSession.id).filter(UploadSession.expires_at <= now).all()]
+    if expired:
+        db.query(UploadSession).filter(UploadSession.id.in_(expired)).delete(synchronize_session=False)
+        db.commit()
+
+    # Spool directories whose session no longer exists (expired, or removed
+    # by a workspace delete cascading over upload_sessions).
+    if os.path.isdir(SPOOL_ROOT):
+        on_disk = set(os.listdir(SPOOL_ROOT))
+        live = {row.id for row in db.query(UploadSession.id).filter(UploadSession.id.in_(on_disk)).all()} if on_disk else set()
+        for session_id in on_disk - live:
+            shutil.rmtree(_spool_dir(session_id), ignore_errors=True)
+    return len(expired)
+
+
+def run_upload_session_sweep() -> None:
+    db = SessionLocal()
+    try:
+        swept = sweep_expired_sessions(db)
+        if swept:
+            logger.info("Swept %d expired upload sessions", swept)
+    finally:
+        db.close()
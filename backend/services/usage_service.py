@@ -0,0 +1,156 @@
+"""Per-workspace storage usage counters and quotas.
+
+Uploads charge ``workspace_usage`` under a row lock right before they commit,
+so concurrent uploads into one workspace cannot overshoot the quota; deletes
+release usage with a plain atomic UPDATE. ``reconcile_usage`` recomputes the
+counters from the media table to repair any drift (rows removed by the
+workspace FK cascade, manual SQL, ...).
+"""
+import logging
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from core.config import WORKSPACE_QUOTA_BYTES, WORKSPACE_QUOTA_FILES, WORKSPACE_USAGE_RECONCILE_BATCH_SIZE
+from db.database import SessionLocal, dialect_insert
+from models.media import Media
+from models.workspace import Workspace
+from models.workspace_usage import WorkspaceUsage
+
+logger = logging.getLogger(__name__)
+
+
+def _ensure_rows(db: Session, workspace_ids: list[int]) -> None:
+    insert = dialect_insert(db)
+    db.execute(
+        insert(WorkspaceUsage)
+        .values([{"workspace_id": wid, "file_count": 0, "bytes_used": 0} for wid in workspace_ids])
+        .on_conflict_do_nothing(index_elements=[WorkspaceUsage.workspace_id])
+    )
+
+
+def effective_quota(usage: WorkspaceUsage | None) -> tuple[int | None, int | None]:
+    """``(bytes, files)`` limits for a workspace; None means unlimited."""
+    quota_bytes = usage.quota_bytes if usage is not None and usage.quota_bytes is not None else WORKSPACE_QUOTA_BYTES
+    quota_files = usage.quota_files if usage is not None and usage.quota_files is not None else WORKSPACE_QUOTA_FILES
+    return quota_bytes or None, quota_files or None
+
+
+def _enforce(usage: WorkspaceUsage | None, files: int, size: int) -> None:
+    quota_bytes, quota_files = effective_quota(usage)
+    used_bytes = usage.bytes_used if usage is not None else 0
+    used_files = usage.file_count if usage is not None else 0
+    if quota_bytes is not None and used_bytes + size > quota_bytes:
+        raise HTTPException(status_code=413, detail="Workspace storage quota exceeded")
+    if quota_files is not None and used_files + files > quota_files:
+        raise HTTPException(status_code=413, detail="Workspace file quota exceeded")
+
+
+def check_quota_headroom(db: Session, workspace_id: int, files: int = 1, size: int = 0) -> None:
+    """Cheap early rejection before an upload is staged (no lock taken).
+
+    The authoritative check is ``charge_usage`` at commit time.
+    """
+    _enforce(db.get(WorkspaceUsage, workspace_id), files, size)
+
+
+def charge_usage(db: Session, workspace_id: int, files: int, size: int) -> None:
+    """Add new media to the workspace totals, enforcing the quota. Does not commit.
+
+    Raises 413 when the quota would be exceeded. The usage row stays locked
+    until the caller's transaction ends.
+    """
+    _ensure_rows(db, [workspace_id])
+    usage = (
+        db.query(WorkspaceUsage)
+        .filter_by(workspace_id=workspace_id)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    _enforce(usage, files, size)
+    usage.file_count += files
+    usage.bytes_used += size
+
+
+def release_usage(db: Session, workspace_id: int, files: int, size: int) -> None:
+    """Subtract deleted media from the workspace totals. Does not commit."""
+    db.execute(
+        update(WorkspaceUsage)
+        .where(WorkspaceUsage.workspace_id == workspace_id)
+        .values(
+            file_count=WorkspaceUsage.file_count - files,
+            bytes_used=WorkspaceUsage.bytes_used - size,
+        )
+    )
+
+
+def get_usage(db: Session, workspace_id: int) -> dict:
+    usage = db.get(WorkspaceUsage, workspace_id)
+    quota_bytes, quota_files = effective_quota(usage)
+    return {
+        "workspace_id": workspace_id,
+        "file_count": usage.file_count if usage is not None else 0,
+        "bytes_used": usage.bytes_used if usage is not None else 0,
+        "quota_bytes": quota_bytes,
+        "quota_files": quota_files,
+    }
+
+
+def reconcile_usage(db: Session, batch_size: int = WORKSPACE_USAGE_RECONCILE_BATCH_SIZE) -> int:
+    """Recompute every workspace's counters from the media table.
+
+    Works through workspaces in id order, one batch per transaction. Each
+    batch locks its usage rows before aggregating, so uploads committing
+    meanwhile are either counted by the aggregate or wait and apply their
+    increment on top of the repaired value. Returns the number of rows fixed.
+    """
+    repaired = 0
+    after_id = 0
+    while True:
+        ids = db.scalars(
+            select(Workspace.id).where(Workspace.id > after_id).order_by(Workspace.id).limit(batch_size)
+        ).all()
+        if not ids:
+            return repaired
+        after_id = ids[-1]
+
+        _ensure_rows(db, ids)
+        rows = (
+            db.query(WorkspaceUsage)
+            .filter(WorkspaceUsage.workspace_id.in_(ids))
+            .order_by(WorkspaceUsage.workspace_id)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        )
+        actual = {
+            wid: (count, total)
+            for wid, count, total in db.execute(
+                select(Media.workspace_id, func.count(), func.coalesce(func.sum(Media.size_bytes), 0))
+                .where(Media.workspace_id.in_(ids))
+                .group_by(Media.workspace_id)
+            )
+        }
+        for usage in rows:
+            count, total = actual.get(usage.workspace_id, (0, 0))
+            if (usage.file_count, usage.bytes_used) != (count, total):
+                logger.warning(
+                    "Workspace %d usage drifted: %d files/%d bytes recorded, %d/%d actual",
+                    usage.workspace_id, usage.file_count, usage.bytes_used, count, total,
+                )
+                usage.file_count = count
+                usage.bytes_used = total
+                repaired += 1
+        db.commit()
+
+
+def run_usage_reconciliation() -> None:
+    db = SessionLocal()
+    try:
+        repaired = reconcile_usage(db)
+        if repaired:
+            logger.info("Repaired usage counters of %d workspaces", repaired)
+    finally:
+        db.close()
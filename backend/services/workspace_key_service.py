@@ -0,0 +1,150 @@
+"""Per-workspace data keys (envelope encryption).
+
+Every workspace gets a random data key the first time it stores content. The
+key is kept on the workspace row wrapped by the master key ring (a Fernet
+token from ``core.config.fernet``), and blobs of the workspace are sealed
+with it instead of the master key. Deleting the workspace row destroys the
+wrapped key, so all of its content becomes unreadable at once; the stored
+files are removed later by the deletion worker (see
+``services.deletion_service.purge_workspaces``).
+
+Unwrapped keys are cached per process for WORKSPACE_KEY_CACHE_SECONDS.
+When a workspace is deleted, its cached key and decrypted content
+(``core.content_cache``) are dropped once the transaction commits, in this
+worker and, through ``services.invalidation_service``, in all others when
+broadcasting is enabled; otherwise other workers keep them for at most the
+cache lifetime. Rotating the master key only re-wraps data keys
+(``rewrap_batch``); the blobs themselves are untouched.
+"""
+import os
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+
+from core.blob_crypto import CURRENT_KEY_ID
+from core.config import WORKSPACE_KEY_CACHE_SECONDS, fernet
+from core.content_cache import content_cache
+from db.database import SessionLocal
+from models.workspace import Workspace
+from services.invalidation_service import publish, register
+
+DATA_KEY_SIZE = 32
+_CACHE_MAX_ITEMS = 10000
+
+_cache_lock = threading.Lock()
+# workspace id -> (unwrapped key, expiry on the monotonic clock)
+_cache: dict[int, tuple[bytes, float]] = {}
+
+
+def _unwrap(token: str) -> bytes:
+    return fernet.decrypt(token.encode())
+
+
+def _load_or_create(workspace_id: int) -> bytes:
+    db = SessionLocal()
+    try:
+        ws = db.query(Workspace).filter_by(id=workspace_id).first()
+        if ws is None:
+            raise HTTPException(status_code=404, detail="Workspace not found")
+        if ws.data_key is not None:
+            return _unwrap(ws.data_key)
+
+        # first content of this workspace: create the key under a row lock so
+        # concurrent uploads agree on a single one
+        db.rollback()
+        ws = db.query(Workspace).filter_by(id=workspace_id).with_for_update().first()
+        if ws is None:
+            raise HTTPException(status_code=404, detail="Workspace not found")
+        if ws.data_key is None:
+            ws.data_key = fernet.encrypt(os.urandom(DATA_KEY_SIZE)).decode()
+            ws.data_key_master_id = CURRENT_KEY_ID
+        token = ws.data_key
+        db.commit()
+        return _unwrap(token)
+    finally:
+        db.close()
+
+
+def workspace_data_key(workspace_id: int) -> bytes:
+    """The unwrapped data key of a workspace, created on first use.
+
+    Opens its own session, so it is safe to call from streaming responses and
+    worker threads. Raises 404 once the workspace (and its key) is gone.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(workspace_id)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+    key = _load_or_create(workspace_id)
+    with _cache_lock:
+        if len(_cache) >= _CACHE_MAX_ITEMS:
+            for stale in [wid for wid, (_, expiry) in _cache.items() if expiry <= now]:
+                del _cache[stale]
+        _cache[workspace_id] = (key, now + WORKSPACE_KEY_CACHE_SECONDS)
+    return key
+
+
+def forget_data_key(workspace_id: int) -> None:
+    """Drop a cached key and the workspace's cached content from this process."""
+    with _cache_lock:
+        _cache.pop(workspace_id, None)
+    # content cache keys are (workspace id, media id)
+    content_cache.invalidate_where(lambda key: key[0] == workspace_id)
+
+
+def _forget_all() -> None:
+    with _cache_lock:
+        _cache.clear()
+    content_cache.clear()
+
+
+def rewrap_batch(db: Session, batch_size: int) -> int:
+    """Re-wrap up to ``batch_size`` data keys still wrapped by an older master key."""
+    workspaces = (
+        db.query(Workspace)
+        .filter(
+            Workspace.data_key.isnot(None),
+            or_(Workspace.data_key_master_id.is_(None), Workspace.data_key_master_id != CURRENT_KEY_ID),
+        )
+        .order_by(Workspace.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for ws in workspaces:
+        ws.data_key = fernet.rotate(ws.data_key.encode()).decode()
+        ws.data_key_master_id = CURRENT_KEY_ID
+    db.commit()
+    return len(workspaces)
+
+
+# ---------------------------------------------------------------------------
+# invalidation on commit
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_deleted_workspaces(session: Session, flush_context) -> None:
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, Workspace) and obj.id is not None}
+    if not deleted:
+        return
+    session.info.setdefault("deleted_workspace_ids", set()).update(deleted)
+    for workspace_id in deleted:
+        publish(session, "workspace_key", str(workspace_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_deleted_workspaces(session: Session) -> None:
+    for workspace_id in session.info.pop("deleted_workspace_ids", ()):
+        forget_data_key(workspace_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_deleted_workspaces(session: Session) -> None:
+    session.info.pop("deleted_workspace_ids", None)
+
+
+register("workspace_key", lambda payload: forget_data_key(int(payload)), _forget_all)
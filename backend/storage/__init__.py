@@ -0,0 +1,39 @@
+"""Pluggable blob storage.
+
+``get_backend`` returns the backend a blob row names, ``default_backend`` the
+one new uploads are written to (``STORAGE_BACKEND``).
+"""
+from functools import lru_cache
+
+from core import config
+from storage.base import BlobLocation, StorageBackend
+from storage.local import LocalStorage
+
+LEGACY_BACKEND = "legacy"
+
+__all__ = ["BlobLocation", "StorageBackend", "LEGACY_BACKEND", "get_backend", "default_backend"]
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: str) -> StorageBackend:
+    if name == LEGACY_BACKEND:
+        return LocalStorage(LEGACY_BACKEND, config.FILES_DIR, sharded=False)
+    if name == "local":
+        return LocalStorage("local", config.STORAGE_LOCAL_ROOT)
+    if name == "s3":
+        from storage.s3 import S3Storage
+
+        return S3Storage(
+            "s3",
+            config.S3_BUCKET,
+            endpoint_url=config.S3_ENDPOINT_URL,
+            region=config.S3_REGION,
+            access_key_id=config.S3_ACCESS_KEY_ID,
+            secret_access_key=config.S3_SECRET_ACCESS_KEY,
+            read_ahead=config.S3_READ_AHEAD,
+        )
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+def default_backend() -> StorageBackend:
+    return get_backend(config.STORAGE_BACKEND)
@@ -0,0 +1,66 @@
+import uuid
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, NamedTuple
+
+
+class BlobLocation(NamedTuple):
+    """Where a stored blob lives: the backend name and the key inside it."""
+
+    backend: str
+    key: str
+
+
+class StorageBackend(ABC):
+    """Storage for encrypted blobs, addressed by opaque keys.
+
+    Backends only move bytes around; encryption, hashing and reference counting
+    happen above this layer.
+    """
+
+    name: str
+    # whether ``iter_keys`` yields keys in ascending byte order
+    keys_sorted: bool = False
+
+    def new_key(self) -> str:
+        return f"{uuid.uuid4().hex}.enc"
+
+    @abstractmethod
+    def put_file(self, src_path: str, key: str) -> None:
+        """Store a local file under ``key``, consuming (removing) ``src_path``."""
+
+    @abstractmethod
+    def put_stream(self, src: BinaryIO, key: str) -> None:
+        """Store the contents of an open file object under ``key``."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open ``key`` for seekable binary reading.
+
+        Raises FileNotFoundError when the key does not exist.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key``; missing keys are ignored."""
+
+    def delete_many(self, keys: list[str]) -> dict[str, str]:
+        """Remove several keys; returns an error message for each key that failed."""
+        errors = {}
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception as exc:
+                errors[key] = str(exc) or type(exc).__name__
+        return errors
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def modified_at(self, key: str) -> float | None:
+        """Last modification time of ``key`` as a Unix timestamp, None if missing."""
+
+    @abstractmethod
+    def iter_keys(self) -> Iterator[str]:
+        """Yield every stored key, lazily (stores may hold millions)."""
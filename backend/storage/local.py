@@ -0,0 +1,85 @@
+import os
+import shutil
+from typing import BinaryIO, Iterator
+
+from storage.base import StorageBackend
+
+
+class LocalStorage(StorageBackend):
+    """Blobs on the local filesystem.
+
+    With ``sharded=True`` keys are spread over two levels of directories named
+    after the leading characters of the key (``ab/cd/abcd....enc``) so no single
+    directory grows to millions of entries. The flat layout is only used to
+    read files written before the storage layer existed.
+    """
+
+    def __init__(self, name: str, root: str, sharded: bool = True):
+        self.name = name
+        self.root = root
+        self.sharded = sharded
+        # shard directories are named after key prefixes, so a sorted walk
+        # yields keys in order; the flat layout is listed unsorted
+        self.keys_sorted = sharded
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        if os.path.basename(key) != key or key.startswith("."):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        if self.sharded:
+            return os.path.join(self.root, key[0:2], key[2:4], key)
+        return os.path.join(self.root, key)
+
+    def put_file(self, src_path: str, key: str) -> None:
+        dest = self.path_for(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.replace(src_path, dest)
+        except OSError:
+            # staging dir on another filesystem
+            shutil.move(src_path, dest)
+
+    def put_stream(self, src: BinaryIO, key: str) -> None:
+        dest = self.path_for(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = dest + ".part"
+        try:
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(src, out)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path_for(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path_for(key))
+
+    def modified_at(self, key: str) -> float | None:
+        try:
+            return os.stat(self.path_for(key)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def iter_keys(self) -> Iterator[str]:
+        if not self.sharded:
+            # scandir streams the directory instead of listing it at once
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".enc") and entry.is_file():
+                        yield entry.name
+            return
+
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                if fn.endswith(".enc"):
+                    yield fn